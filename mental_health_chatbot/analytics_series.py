@@ -0,0 +1,130 @@
+import json
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database import MoodEntry, DEFAULT_USER_ID
+
+WEEKDAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def fetch_mood_rows(db: Session, start_date: datetime, end_date: datetime,
+                    user_id: str = DEFAULT_USER_ID) -> List[Dict[str, Any]]:
+    """Load one user's mood entries of a date window as plain, picklable rows"""
+    entries = db.query(MoodEntry.date, MoodEntry.mood_rating, MoodEntry.detected_emotions).filter(
+        MoodEntry.user_id == user_id,
+        MoodEntry.date >= start_date,
+        MoodEntry.date <= end_date
+    ).order_by(MoodEntry.date).all()
+    return [
+        {"date": date, "mood_rating": mood_rating, "detected_emotions": detected_emotions}
+        for date, mood_rating, detected_emotions in entries
+    ]
+
+
+def parse_emotions(detected_emotions) -> Dict[str, float]:
+    if not detected_emotions:
+        return {}
+    return json.loads(detected_emotions) if isinstance(detected_emotions, str) else detected_emotions
+
+
+def mood_trend_series(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Daily mood points: average, min, max and entry count per calendar day"""
+    days: Dict[str, List[int]] = {}
+    for row in rows:
+        if row["mood_rating"] is not None:
+            days.setdefault(row["date"].date().isoformat(), []).append(row["mood_rating"])
+    return [
+        {
+            "date": day,
+            "average": round(sum(ratings) / len(ratings), 2),
+            "min": min(ratings),
+            "max": max(ratings),
+            "count": len(ratings),
+        }
+        for day, ratings in sorted(days.items())
+    ]
+
+
+def weekly_heatmap_series(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Weekday x ISO-week matrix of average mood; None where there is no entry"""
+    cells: Dict[tuple, List[int]] = {}
+    weeks = set()
+    for row in rows:
+        if row["mood_rating"] is None:
+            continue
+        iso_year, iso_week, iso_weekday = row["date"].isocalendar()
+        week = f"{iso_year}-W{iso_week:02d}"
+        weeks.add(week)
+        cells.setdefault((iso_weekday - 1, week), []).append(row["mood_rating"])
+
+    week_labels = sorted(weeks)
+    matrix = [
+        [
+            round(sum(cells[(weekday, week)]) / len(cells[(weekday, week)]), 2) if (weekday, week) in cells else None
+            for week in week_labels
+        ]
+        for weekday in range(7)
+    ]
+    return {"weekdays": WEEKDAY_ORDER, "weeks": week_labels, "matrix": matrix}
+
+
+def emotion_totals_series(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Summed emotion scores, largest first"""
+    totals: Dict[str, float] = {}
+    for row in rows:
+        for emotion, score in parse_emotions(row["detected_emotions"]).items():
+            totals[emotion] = totals.get(emotion, 0) + score
+    return [
+        {"emotion": emotion, "total": round(total, 4)}
+        for emotion, total in sorted(totals.items(), key=lambda x: x[1], reverse=True)
+    ]
+
+
+def _variance(values: List[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+
+
+def _pearson(xs: List[Optional[float]], ys: List[Optional[float]]) -> Optional[float]:
+    """Correlation over rows where both values are present"""
+    pairs = [(x, y) for x, y in zip(xs, ys) if x is not None and y is not None]
+    if len(pairs) < 2:
+        return None
+    mean_x = sum(p[0] for p in pairs) / len(pairs)
+    mean_y = sum(p[1] for p in pairs) / len(pairs)
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in pairs)
+    var_x = sum((x - mean_x) ** 2 for x, _ in pairs)
+    var_y = sum((y - mean_y) ** 2 for _, y in pairs)
+    if var_x == 0 or var_y == 0:
+        return None
+    return round(cov / math.sqrt(var_x * var_y), 4)
+
+
+def correlation_series(rows: List[Dict[str, Any]], top_n: int = 6) -> Dict[str, Any]:
+    """Correlation matrix of mood rating and the most variable emotions"""
+    parsed = [(row["mood_rating"], parse_emotions(row["detected_emotions"])) for row in rows if row["detected_emotions"]]
+    columns: Dict[str, List[Optional[float]]] = {"mood_rating": [rating for rating, _ in parsed]}
+    emotion_names = sorted({name for _, emotions in parsed for name in emotions})
+    for name in emotion_names:
+        columns[name] = [emotions.get(name) for _, emotions in parsed]
+
+    top_emotions = sorted(
+        emotion_names,
+        key=lambda name: _variance([v for v in columns[name] if v is not None]),
+        reverse=True
+    )[:top_n]
+    labels = ["mood_rating"] + top_emotions
+    matrix = [[_pearson(columns[a], columns[b]) for b in labels] for a in labels]
+    return {"labels": labels, "matrix": matrix, "samples": len(parsed)}
+
+
+def to_columnar(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Turn a list of records into one array per field"""
+    if not records:
+        return {}
+    return {key: [record[key] for record in records] for key in records[0]}
@@ -0,0 +1,160 @@
+import threading
+import queue
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from execution import ServiceOverloadedError
+from metrics import QUEUE_DEPTH
+
+
+class MicroBatcher:
+    """Collect items submitted by concurrent callers and process them in batches
+
+    process_batch returns one result per item; returning an exception instance fails only that item.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 16,
+                 max_wait_ms: float = 10.0, max_pending: int = 0, name: str = "micro-batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.max_pending = max(0, int(max_pending))  # 0 means unbounded
+        self.name = name
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._depth = QUEUE_DEPTH.labels(name)
+        self.reset_stats()
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item and return a future resolved with its result"""
+        depth = self._queue.qsize()
+        self._depth.observe(depth)
+        if self.max_pending and depth >= self.max_pending:
+            with self._stats_lock:
+                self._rejected += 1
+            raise ServiceOverloadedError(self.name)
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def pending(self) -> int:
+        """Number of items waiting to be picked up by the worker"""
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 5):
+        """Ask the worker thread to exit once the queued items are processed"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self) -> Optional[List[tuple]]:
+        """Block for the first item, then gather more until the batch is full or the window closes"""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Put the stop marker back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+
+            # Skip callers that gave up while waiting
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            dequeued_at = time.perf_counter()
+            items = [entry[0] for entry in batch]
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: expected {len(items)} results, got {len(results)}")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._record_batch([dequeued_at - entry[2] for entry in batch], time.perf_counter() - dequeued_at)
+
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _record_batch(self, waits: List[float], process_seconds: float):
+        with self._stats_lock:
+            size = len(waits)
+            self._batches += 1
+            self._items += size
+            self._max_batch_size_seen = max(self._max_batch_size_seen, size)
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+            self._total_wait += sum(waits)
+            self._max_wait = max(self._max_wait, max(waits))
+            self._total_process += process_seconds
+            self._max_process = max(self._max_process, process_seconds)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._batches = 0
+            self._items = 0
+            self._max_batch_size_seen = 0
+            self._batch_size_counts: Dict[int, int] = {}
+            self._total_wait = 0.0
+            self._max_wait = 0.0
+            self._total_process = 0.0
+            self._max_process = 0.0
+            self._rejected = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch size and queue wait metrics since the last reset"""
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": batches,
+                "items": items,
+                "pending": self.pending(),
+                "rejected": self._rejected,
+                "avg_batch_size": round(items / batches, 2) if batches else 0,
+                "largest_batch": self._max_batch_size_seen,
+                "batch_size_counts": dict(sorted(self._batch_size_counts.items())),
+                "avg_queue_wait_ms": round(self._total_wait / items * 1000, 3) if items else 0,
+                "max_queue_wait_ms": round(self._max_wait * 1000, 3),
+                "avg_batch_process_ms": round(self._total_process / batches * 1000, 3) if batches else 0,
+                "max_batch_process_ms": round(self._max_process * 1000, 3),
+            }
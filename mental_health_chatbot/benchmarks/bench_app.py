@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark App Launcher
+Serves chatbot_api with real models, or with stub emotion and Whisper models so a load test measures
+the API itself rather than model inference
+
+Usage:
+    python benchmarks/bench_app.py --port 8100 --models stub --stub-transcribe-ms 300
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+
+import emotion_detection
+import transcription
+
+
+class StubTranscriptionService(transcription.TranscriptionService):
+    """Same queueing and accounting as the real service, with a fixed delay instead of Whisper"""
+
+    def __init__(self, delay_ms: float):
+        super().__init__(workers=transcription.TRANSCRIBE_WORKERS)
+        self.model_size = "stub"
+        self.delay_ms = delay_ms
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stub-whisper")
+
+    def load(self):
+        self._loaded = True
+
+    def _get_pool(self):
+        return self._executor
+
+    def _submit(self, func, *args):
+        return super()._submit(self._stub_transcribe, *args)
+
+    def _stub_transcribe(self, audio, *_):
+        time.sleep(self.delay_ms / 1000)
+        # Live-streaming windows arrive as decoded arrays, uploads as raw bytes
+        if not isinstance(audio, (bytes, bytearray)):
+            return "stub transcript"
+        return {"text": "stub transcript", "audio_seconds": 1.0,
+                "processing_seconds": round(self.delay_ms / 1000, 3), "real_time_factor": None}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def install_stubs(transcribe_ms: float):
+    """Replace the models before chatbot_api binds them at import"""
+    # With no model loaded, emotion detection uses its keyword fallback
+    emotion_detection.emotion_detector.load_model = lambda: None
+    transcription.transcription_service = StubTranscriptionService(transcribe_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve chatbot_api for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--stub-transcribe-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    if args.models == "stub":
+        install_stubs(args.stub_transcribe_ms)
+
+    from chatbot_api import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Emotion Backend Benchmark
+Compares latency, memory and score parity of the emotion detection backends.
+Each backend, the fp32 reference included, is loaded in a fresh interpreter, so every memory delta
+starts from the same baseline.
+
+Usage:
+    python benchmarks/bench_emotion_backends.py --backends torch torch_int8 onnx onnx_int8
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_backends import BACKEND_NAMES, compare_scores, load_backend, predict_probabilities
+from emotion_detection import EmotionDetector
+
+SAMPLE_TEXTS = [
+    "I'm feeling anxious about my presentation tomorrow",
+    "How can I manage stress better?",
+    "I had a great day today!",
+    "I'm feeling overwhelmed with work and I don't know where to start",
+    "Can you suggest some breathing exercises?",
+    "I accomplished my goals this week and I'm proud of myself",
+    "I'm worried about my family, things have been tense at home lately",
+    "What are some ways to boost my mood?",
+    "I feel grateful for my friends",
+    "How do I deal with negative thoughts that keep coming back at night?",
+    "I'm excited about my vacation",
+    "I feel stuck in my career",
+    "Can you help me with sleep issues?",
+    "I'm proud of how far I've come",
+    "I need help with time management",
+    "Feeling a bit lonely lately",
+]
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "mean_ms": round(statistics.mean(samples), 2),
+    }
+
+
+def measure(name: str, model_name: str, iterations: int, batch_size: int):
+    """Load one backend into this process and time it; run in a fresh interpreter by run_isolated()"""
+    from transformers import AutoTokenizer
+
+    # The tokenizer is loaded first so the memory delta covers the model alone
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    batch = (SAMPLE_TEXTS * (batch_size // len(SAMPLE_TEXTS) + 1))[:batch_size]
+    gc.collect()
+    before = rss_mb()
+    started = time.perf_counter()
+    backend = load_backend(name, model_name)
+    load_seconds = time.perf_counter() - started
+    after = rss_mb()
+
+    # Warm up kernels before timing
+    predict_probabilities(backend, tokenizer, SAMPLE_TEXTS[:2])
+
+    result = {
+        "backend": name,
+        "loaded_backend": backend.name,
+        "load_seconds": round(load_seconds, 2),
+        "rss_delta_mb": round(after - before, 1),
+        "rss_total_mb": round(after, 1),
+        "single_text": time_calls(lambda: predict_probabilities(backend, tokenizer, SAMPLE_TEXTS[:1]), iterations),
+        f"batch_{batch_size}": time_calls(lambda: predict_probabilities(backend, tokenizer, batch), max(5, iterations // 5)),
+        "probabilities": predict_probabilities(backend, tokenizer, SAMPLE_TEXTS).tolist(),
+    }
+    model_path = getattr(backend, "model_path", None)
+    if model_path:
+        result["model_file_mb"] = round(os.path.getsize(model_path) / (1024 * 1024), 1)
+    return result
+
+
+def run_isolated(name: str, args):
+    """Measure a backend in a child interpreter and return its result"""
+    command = [sys.executable, os.path.abspath(__file__), "--measure", name,
+               "--iterations", str(args.iterations), "--batch-size", str(args.batch_size)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark of the '{name}' backend failed:\n{completed.stderr}")
+    # Loading may print progress; the result is the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=BACKEND_NAMES, choices=BACKEND_NAMES)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Max allowed score difference vs fp32")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--measure", choices=BACKEND_NAMES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    detector = EmotionDetector(batching=False)
+    if args.measure:
+        print(json.dumps(measure(args.measure, detector.model_name, args.iterations, args.batch_size)))
+        return
+
+    print("Measuring the fp32 reference backend...")
+    reference = run_isolated("torch", args)
+
+    results = []
+    for name in args.backends:
+        measured = reference if name == "torch" else run_isolated(name, args)
+        result = {key: value for key, value in measured.items() if key != "probabilities"}
+        result["parity"] = compare_scores(reference["probabilities"], measured["probabilities"],
+                                          detector.emotion_labels, args.tolerance, "torch", name)
+        results.append(result)
+
+        parity = result["parity"]
+        print(f"{name:>11}: load +{result['rss_delta_mb']}MB RSS, single p50 {result['single_text']['p50_ms']}ms, "
+              f"batch p50 {result[f'batch_{args.batch_size}']['p50_ms']}ms, "
+              f"max diff {parity['max_abs_diff']}, top-label agreement {parity['top_label_agreement']}, "
+              f"{'PASS' if parity['passed'] else 'FAIL'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
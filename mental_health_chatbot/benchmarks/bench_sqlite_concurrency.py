@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+SQLite Concurrency Benchmark
+Runs mixed mood-entry writes and analytics reads from many threads against the default
+rollback-journal engine and the tuned WAL engine, and reports throughput, latency and lock errors
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py --writers 8 --readers 8 --seconds 10
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from analytics_series import fetch_mood_rows
+from database import Base, MoodEntry, create_db_engine
+
+USERS = 50
+SEED_ROWS = 20000
+
+
+def build_engines(path: str, mode: str):
+    url = f"sqlite:///{path}"
+    if mode == "baseline":
+        # What database.py used to do: one engine, default journal, default pool
+        baseline = create_engine(url, connect_args={"check_same_thread": False})
+        return baseline, baseline
+    return create_db_engine(url), create_db_engine(url, read_only=True)
+
+
+def seed(engine, rng: random.Random):
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(MoodEntry.__table__), [
+            {
+                "user_id": f"user_{rng.randrange(USERS)}",
+                "date": now - timedelta(seconds=rng.randrange(90 * 86400)),
+                "mood_text": "seed entry",
+                "mood_rating": rng.randint(1, 10),
+                "detected_emotions": {"joy": round(rng.random(), 3)},
+            }
+            for _ in range(SEED_ROWS)
+        ])
+
+
+def run_mode(mode: str, writers: int, readers: int, seconds: float, seed_value: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        write_engine, read_engine = build_engines(os.path.join(tmp, "bench.db"), mode)
+        Base.metadata.create_all(bind=write_engine)
+        seed(write_engine, random.Random(seed_value))
+        write_sessions = sessionmaker(bind=write_engine)
+        read_sessions = sessionmaker(bind=read_engine)
+
+        latencies = {"write": [], "read": []}
+        errors = {"write": 0, "read": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def writer(worker_id: int):
+            rng = random.Random(seed_value + worker_id)
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    with write_sessions() as db:
+                        db.add(MoodEntry(user_id=f"user_{rng.randrange(USERS)}", mood_text="bench",
+                                         mood_rating=rng.randint(1, 10), detected_emotions={"joy": rng.random()}))
+                        db.commit()
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        latencies["write"].append(elapsed)
+                except OperationalError:
+                    with lock:
+                        errors["write"] += 1
+
+        def reader(worker_id: int):
+            rng = random.Random(seed_value + 1000 + worker_id)
+            while time.monotonic() < deadline:
+                end_date = datetime.now()
+                start = time.perf_counter()
+                try:
+                    with read_sessions() as db:
+                        fetch_mood_rows(db, end_date - timedelta(days=30), end_date, f"user_{rng.randrange(USERS)}")
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        latencies["read"].append(elapsed)
+                except OperationalError:
+                    with lock:
+                        errors["read"] += 1
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        write_engine.dispose()
+        if read_engine is not write_engine:
+            read_engine.dispose()
+
+    result = {"mode": mode}
+    for kind in ("write", "read"):
+        values = sorted(latencies[kind])
+        result[kind] = {
+            "ops_per_second": round(len(values) / seconds, 1),
+            "median_ms": round(statistics.median(values), 3) if values else None,
+            "p99_ms": round(values[max(0, int(len(values) * 0.99) - 1)], 3) if values else None,
+            "lock_errors": errors[kind],
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite under mixed read/write load")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--modes", nargs="+", default=["baseline", "tuned"], choices=["baseline", "tuned"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        result = run_mode(mode, args.writers, args.readers, args.seconds, args.seed)
+        results.append(result)
+        for kind in ("write", "read"):
+            stats = result[kind]
+            print(f"{mode:>8} {kind:>5}: {stats['ops_per_second']:>8} ops/s, median {stats['median_ms']} ms, "
+                  f"p99 {stats['p99_ms']} ms, {stats['lock_errors']} lock errors")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"writers": args.writers, "readers": args.readers, "seconds": args.seconds,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
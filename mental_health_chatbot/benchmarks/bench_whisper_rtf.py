@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Whisper Real-Time Factor Benchmark
+Measures load time and real-time factor (processing time / audio duration) per model size and thread count
+
+Usage:
+    python benchmarks/bench_whisper_rtf.py --audio sample.wav --sizes tiny base small --threads 2 4
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streaming_stt import WHISPER_SAMPLE_RATE
+from voice_processing import WHISPER_MODEL_SIZES, VoiceProcessor, decode_audio
+
+
+def load_clips(paths):
+    clips = []
+    for path in paths:
+        with open(path, "rb") as f:
+            audio = decode_audio(f.read(), os.path.splitext(path)[1].lstrip(".") or "wav")
+        clips.append((os.path.basename(path), audio))
+        print(f"{os.path.basename(path)}: {len(audio) / WHISPER_SAMPLE_RATE:.1f}s of audio")
+    return clips
+
+
+def bench_size(size: str, threads: int, clips, repeats: int) -> dict:
+    processor = VoiceProcessor(model_size=size, num_threads=threads)
+    start = time.perf_counter()
+    processor.load_whisper_model()
+    load_seconds = time.perf_counter() - start
+    if not processor.is_loaded:
+        return {"size": size, "threads": threads, "error": "model failed to load"}
+
+    # First call pays for lazy kernel setup
+    processor.transcribe_array(clips[0][1][:WHISPER_SAMPLE_RATE * 5])
+
+    factors = []
+    for _ in range(repeats):
+        for _, audio in clips:
+            started = time.perf_counter()
+            processor.transcribe_array(audio)
+            factors.append((time.perf_counter() - started) / (len(audio) / WHISPER_SAMPLE_RATE))
+    return {
+        "size": size,
+        "threads": threads,
+        "load_seconds": round(load_seconds, 2),
+        "rtf_median": round(statistics.median(factors), 3),
+        "rtf_max": round(max(factors), 3),
+        "runs": len(factors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper real-time factor per model size")
+    parser.add_argument("--audio", nargs="+", required=True, help="Speech recordings to transcribe")
+    parser.add_argument("--sizes", nargs="+", default=list(WHISPER_MODEL_SIZES), choices=WHISPER_MODEL_SIZES)
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1],
+                        help="torch thread counts to try for each size")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    clips = load_clips(args.audio)
+    results = []
+    for size in args.sizes:
+        for threads in args.threads:
+            result = bench_size(size, threads, clips, args.repeats)
+            results.append(result)
+            if "error" in result:
+                print(f"{size:>6} x{threads:<3} {result['error']}")
+            else:
+                print(f"{size:>6} x{threads:<3} load {result['load_seconds']:.2f}s, "
+                      f"RTF median {result['rtf_median']:.3f}, max {result['rtf_max']:.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"clips": [name for name, _ in clips], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
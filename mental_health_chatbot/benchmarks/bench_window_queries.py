@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Window Query Benchmark
+Times a single user's 30-day mood window while the mood table grows, with and without the composite index
+
+Usage:
+    python benchmarks/bench_window_queries.py --scales 10000 100000 1000000 --users 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the backend directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from analytics_series import fetch_mood_rows
+from database import Base, MoodEntry
+
+INSERT_CHUNK = 10000
+HISTORY_DAYS = 365
+
+
+def grow_table(engine, target_rows: int, current_rows: int, users: int, rng: random.Random) -> int:
+    """Insert rows spread over users and the last year until the table holds target_rows"""
+    now = datetime.now()
+    table = MoodEntry.__table__
+    with engine.begin() as conn:
+        while current_rows < target_rows:
+            batch = min(INSERT_CHUNK, target_rows - current_rows)
+            conn.execute(insert(table), [
+                {
+                    "user_id": f"user_{rng.randrange(users)}",
+                    "date": now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400)),
+                    "mood_text": "benchmark entry",
+                    "mood_rating": rng.randint(1, 10),
+                    "detected_emotions": {"joy": round(rng.random(), 3), "sadness": round(rng.random(), 3)},
+                    "entry_type": "text",
+                }
+                for _ in range(batch)
+            ])
+            current_rows += batch
+    return current_rows
+
+
+def time_window(session_factory, users: int, repeats: int, rng: random.Random) -> dict:
+    """Median and p95 latency of fetch_mood_rows over random users"""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=30)
+    timings = []
+    rows_returned = 0
+    with session_factory() as db:
+        for _ in range(repeats):
+            user_id = f"user_{rng.randrange(users)}"
+            start = time.perf_counter()
+            rows_returned += len(fetch_mood_rows(db, start_date, end_date, user_id))
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "avg_rows": round(rows_returned / repeats, 1),
+    }
+
+
+def query_plan(engine) -> list:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT date, mood_rating, detected_emotions FROM mood_entries "
+            "WHERE user_id = :user_id AND date >= :start AND date <= :end ORDER BY date"
+        ), {"user_id": "user_0", "start": datetime.now() - timedelta(days=30), "end": datetime.now()}).fetchall()
+    return [row[-1] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-user mood window queries")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Total mood_entries row counts to measure at")
+    parser.add_argument("--users", type=int, default=1000, help="Number of distinct users")
+    parser.add_argument("--repeats", type=int, default=200, help="Window queries per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-index", action="store_true",
+                        help="Drop the composite index to measure the full-scan baseline")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        if args.no_index:
+            with engine.begin() as conn:
+                conn.execute(text("DROP INDEX IF EXISTS ix_mood_entries_user_date"))
+        session_factory = sessionmaker(bind=engine)
+
+        print(f"Query plan: {query_plan(engine)}")
+        results = []
+        rows = 0
+        for scale in sorted(args.scales):
+            start = time.perf_counter()
+            rows = grow_table(engine, scale, rows, args.users, rng)
+            load_seconds = time.perf_counter() - start
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+
+            result = {"rows": rows, "load_seconds": round(load_seconds, 2),
+                      **time_window(session_factory, args.users, args.repeats, rng)}
+            results.append(result)
+            print(f"{rows:>10} rows: median {result['median_ms']:.3f} ms, p95 {result['p95_ms']:.3f} ms, "
+                  f"{result['avg_rows']} rows/window")
+        engine.dispose()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"indexed": not args.no_index, "users": args.users, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+API Load Test
+Starts a mock OpenRouter server and the API (stub or real models), drives a mixed concurrent workload of
+chat, mood entry, analytics and voice requests, and reports throughput and latency percentiles per endpoint.
+Results can be saved as a named baseline and later runs compared against it.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 32 --seconds 60 --save-baseline main
+    python benchmarks/load_test.py --concurrency 32 --seconds 60 --compare main
+    python benchmarks/load_test.py --target http://127.0.0.1:8000 --mix chat=1   # existing server
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+DEFAULT_MIX = "chat=40,mood=25,analytics=25,voice=10"
+
+CHAT_MESSAGES = [
+    "I'm feeling anxious about my presentation tomorrow",
+    "How can I manage stress better?",
+    "Can you suggest some breathing exercises?",
+    "I'm feeling overwhelmed with work",
+    "How do I deal with negative thoughts?",
+    "Can you help me with sleep issues?",
+    "I had a great day today!",
+    "I feel stuck in my career",
+]
+MOOD_TEXTS = [
+    "Had a great day at work, feeling accomplished",
+    "Feeling okay, bit tired from the week",
+    "Stressed about upcoming deadlines",
+    "Feeling overwhelmed with responsibilities",
+    "Spent quality time with family",
+]
+ANALYTICS_PATHS = [
+    "/analytics/mood-trends?days=30",
+    "/analytics/weekly-patterns",
+    "/weekly-summary",
+    "/stats/overview",
+    "/mood-entries?limit=20",
+    "/analytics/series/mood_trend?days=30",
+]
+
+
+def make_wav(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    """A spoken-level tone with a little noise, enough to pass voice activity checks"""
+    rng = random.Random(0)
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        sample = 0.3 * math.sin(2 * math.pi * 220 * i / rate) + 0.02 * rng.uniform(-1, 1)
+        frames += int(sample * 32767).to_bytes(2, "little", signed=True)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in WORKLOADS:
+            raise ValueError(f"Unknown workload '{name}'")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class Recorder:
+    """Latency samples per endpoint label"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    def record(self, label: str, elapsed_ms: float, status: Optional[int]):
+        if not self.recording:
+            return
+        self.latencies[label].append(elapsed_ms)
+        self.statuses[label][status or 0] += 1
+        if status is None or status >= 400:
+            self.errors[label] += 1
+
+
+async def timed(recorder: Recorder, label: str, request):
+    start = time.perf_counter()
+    try:
+        response = await request
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    recorder.record(label, (time.perf_counter() - start) * 1000, status)
+
+
+async def chat(client: httpx.AsyncClient, rng: random.Random, recorder: Recorder, headers: Dict[str, str]):
+    body = {"message": rng.choice(CHAT_MESSAGES)}
+    if rng.random() < 0.5:
+        await timed(recorder, "POST /chat", client.post("/chat", json=body, headers=headers))
+        return
+
+    label = "POST /chat/stream"
+    start = time.perf_counter()
+    status = None
+    try:
+        async with client.stream("POST", "/chat/stream", json=body, headers=headers) as response:
+            first = True
+            async for _ in response.aiter_bytes():
+                if first:
+                    recorder.record(f"{label} (first byte)", (time.perf_counter() - start) * 1000, response.status_code)
+                    first = False
+            status = response.status_code
+    except httpx.HTTPError:
+        pass
+    recorder.record(label, (time.perf_counter() - start) * 1000, status)
+
+
+async def mood(client: httpx.AsyncClient, rng: random.Random, recorder: Recorder, headers: Dict[str, str]):
+    body = {"mood_text": rng.choice(MOOD_TEXTS), "mood_rating": rng.randint(1, 10)}
+    await timed(recorder, "POST /mood-entry", client.post("/mood-entry", json=body, headers=headers))
+
+
+async def analytics(client: httpx.AsyncClient, rng: random.Random, recorder: Recorder, headers: Dict[str, str]):
+    path = rng.choice(ANALYTICS_PATHS)
+    await timed(recorder, f"GET {path.split('?')[0]}", client.get(path, headers=headers))
+
+
+async def voice(client: httpx.AsyncClient, rng: random.Random, recorder: Recorder, headers: Dict[str, str]):
+    files = {"audio": ("speech.wav", VOICE_SAMPLE, "audio/wav")}
+    await timed(recorder, "POST /voice_to_text", client.post("/voice_to_text", files=files, headers=headers))
+
+
+VOICE_SAMPLE = make_wav()
+WORKLOADS = {"chat": chat, "mood": mood, "analytics": analytics, "voice": voice}
+
+
+async def drive(base_url: str, mix: Dict[str, float], concurrency: int, users: int, warmup_seconds: float,
+                seconds: float, seed: int) -> Tuple[Recorder, float]:
+    """Closed-loop workers: each sends its next request as soon as the previous one finishes"""
+    recorder = Recorder()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        stop_at = time.monotonic() + warmup_seconds + seconds
+
+        async def worker(worker_id: int):
+            rng = random.Random(seed + worker_id)
+            while time.monotonic() < stop_at:
+                name = rng.choices(names, weights)[0]
+                headers = {"X-User-Id": f"bench_user_{rng.randrange(users)}"}
+                await WORKLOADS[name](client, rng, recorder, headers)
+
+        tasks = [asyncio.create_task(worker(i)) for i in range(concurrency)]
+        await asyncio.sleep(warmup_seconds)
+        recorder.recording = True
+        measure_start = time.monotonic()
+        await asyncio.gather(*tasks)
+        recorder.recording = False
+        # Requests still in flight at the deadline finish inside the measured window
+        return recorder, time.monotonic() - measure_start
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, float]]:
+    results = {}
+    everything = []
+    for label, samples in sorted(recorder.latencies.items()):
+        values = sorted(samples)
+        if not label.endswith("(first byte)"):
+            everything.extend(values)
+        results[label] = _stats(values, elapsed, recorder.errors[label])
+        results[label]["statuses"] = dict(recorder.statuses[label])
+    if everything:
+        errors = sum(count for label, count in recorder.errors.items() if not label.endswith("(first byte)"))
+        results["TOTAL"] = _stats(sorted(everything), elapsed, errors)
+    return results
+
+
+def _stats(values: List[float], elapsed: float, errors: int) -> Dict[str, float]:
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2),
+        "mean_ms": round(sum(values) / len(values), 2),
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+    }
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    print(f"{'endpoint':<42} {'reqs':>7} {'errs':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, stats in results.items():
+        print(f"{label:<42} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict, tolerance: float) -> bool:
+    """Print changes against a baseline; True if any endpoint got slower or lost throughput beyond tolerance"""
+    regressed = False
+    print(f"\nCompared with baseline '{baseline['name']}' ({baseline.get('git_commit') or 'unknown commit'}, "
+          f"{baseline['created_at']}):")
+    for label, stats in results.items():
+        before = baseline["results"].get(label)
+        if before is None:
+            continue
+        p95_change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0
+        rps_change = (stats["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0
+        flag = ""
+        if p95_change > tolerance or rps_change < -tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{label:<42} p95 {before['p95_ms']:>9} -> {stats['p95_ms']:<9} ({p95_change:+.1%})  "
+              f"rps {before['rps']:>8} -> {stats['rps']:<8} ({rps_change:+.1%}){flag}")
+    return regressed
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_until_started(base_url: str, process: Optional[subprocess.Popen], timeout: float):
+    """Wait until warm-up has finished; stub runs never become ready because no emotion model loads"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"API process exited with code {process.returncode}")
+        try:
+            status = httpx.get(f"{base_url}/readyz", timeout=2).json()
+            if status.get("finished"):
+                return status
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"API at {base_url} did not finish warming up within {timeout}s")
+
+
+def start_servers(args, workdir: str) -> List[subprocess.Popen]:
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "mock_openrouter.py"), "--port", str(args.mock_port),
+        "--latency-ms", str(args.mock_latency_ms), "--jitter-ms", str(args.mock_jitter_ms),
+        "--token-ms", str(args.mock_token_ms), "--error-rate", str(args.mock_error_rate)
+    ])
+    env = dict(os.environ)
+    env.update({
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.mock_port}/api/v1",
+        "OPENROUTER_API_KEY": "mock",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+    })
+    api = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "bench_app.py"), "--port", str(args.port),
+        "--models", args.models, "--stub-transcribe-ms", str(args.stub_transcribe_ms)
+    ], cwd=BACKEND_DIR, env=env)
+    return [mock, api]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with a mixed concurrent workload")
+    parser.add_argument("--target", help="Base URL of an already running API; nothing is started")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Workload weights, e.g. chat=40,mood=25,analytics=25,voice=10")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--warmup-seconds", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--stub-transcribe-ms", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--mock-latency-ms", type=float, default=400)
+    parser.add_argument("--mock-jitter-ms", type=float, default=100)
+    parser.add_argument("--mock-token-ms", type=float, default=20)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--save-baseline", metavar="NAME", help="Store results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare with a saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p95 increase / rps decrease")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    processes: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.target:
+                base_url = args.target.rstrip("/")
+                wait_until_started(base_url, None, args.startup_timeout)
+            else:
+                base_url = f"http://127.0.0.1:{args.port}"
+                processes = start_servers(args, workdir)
+                status = wait_until_started(base_url, processes[1], args.startup_timeout)
+                print(f"API warmed up in {status['seconds_to_ready']}s ({args.models} models)")
+
+            print(f"Running {args.mix} with {args.concurrency} workers for {args.seconds}s "
+                  f"after {args.warmup_seconds}s warm-up")
+            recorder, elapsed = asyncio.run(drive(base_url, mix, args.concurrency, args.users,
+                                                  args.warmup_seconds, args.seconds, args.seed))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    results = summarize(recorder, elapsed)
+    print_results(results)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("save_baseline", "compare", "output", "tolerance")},
+        "elapsed_seconds": round(elapsed, 2),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as f:
+            json.dump({"name": args.save_baseline, **report}, f, indent=2)
+        print(f"Saved baseline to {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if baseline["config"] != report["config"]:
+            print("Warning: baseline was recorded with different settings")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Mock OpenRouter Server
+Local chat-completions endpoint with configurable latency, streaming speed and error rate, so the API
+can be load-tested without network access or token spend
+
+Usage:
+    python benchmarks/mock_openrouter.py --port 9100 --latency-ms 400 --token-ms 20
+    OPENROUTER_BASE_URL=http://127.0.0.1:9100/api/v1 uvicorn chatbot_api:app
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "It sounds like you are carrying a lot right now, and it makes sense to feel that way. "
+    "One thing that can help is a short breathing exercise: breathe in for four counts, hold for four, "
+    "and breathe out for six. Would you like to talk about what is weighing on you the most?"
+)
+
+
+def create_app(latency_ms: float, jitter_ms: float, token_ms: float, error_rate: float,
+               reply: str = REPLY, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Mock OpenRouter")
+    rng = random.Random(seed)
+    tokens = [word + " " for word in reply.split()]
+    stats = {"requests": 0, "streams": 0, "errors": 0}
+
+    def usage(messages):
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 1 for m in messages)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens)}
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        stats["requests"] += 1
+        # Time to first token, as seen by the client
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "mock upstream overloaded"}})
+
+        completion_id = f"mock-{stats['requests']}"
+        if not payload.get("stream"):
+            # A non-streamed reply still takes as long as generating every token
+            await asyncio.sleep(token_ms * len(tokens) / 1000)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": usage(payload.get("messages", [])),
+            }
+
+        stats["streams"] += 1
+
+        async def events():
+            for token in tokens:
+                chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_ms / 1000)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock OpenRouter chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=400, help="Delay before the first token")
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.token_ms, args.error_rate, seed=args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Tuple
+
+from database import DEFAULT_USER_ID, mood_data_version
+
+# Rendered charts kept in memory. Data versions are per process, so with several API workers a write
+# handled by another worker only shows up once the TTL expires
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "128"))
+CHART_CACHE_TTL_SECONDS = float(os.getenv("CHART_CACHE_TTL_SECONDS", "3600"))
+
+
+class ChartCache:
+    """Cache rendered charts keyed by chart type, parameters and the user's mood data version
+
+    Every chart is of one user's data (params["user_id"]), so only that user's commits invalidate it.
+    """
+
+    def __init__(self, max_entries: int = CHART_CACHE_SIZE, ttl_seconds: float = CHART_CACHE_TTL_SECONDS):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def make_key(self, chart_type: str, params: Dict[str, Any]) -> Tuple:
+        user_id = params.get("user_id", DEFAULT_USER_ID)
+        # Date windows are relative to today, so a new day also invalidates the chart
+        return (chart_type, tuple(sorted(params.items())), user_id, mood_data_version.value(user_id),
+                date.today().isoformat())
+
+    def get_or_render(self, chart_type: str, params: Dict[str, Any], render: Callable[[], Any]) -> Any:
+        """Return the cached chart for the current data version, rendering it on a miss"""
+        key = self.make_key(chart_type, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+
+        chart = render()
+
+        with self._lock:
+            self._entries[key] = (chart, time.monotonic())
+            self._entries.move_to_end(key)
+            # Entries for older versions of this user's data can never hit again
+            stale = [k for k in self._entries if k[2] == key[2] and k[3] < key[3]]
+            for k in stale:
+                del self._entries[k]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return chart
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        stats["data_versions_bumped"] = mood_data_version.total()
+        return stats
+
+# Global chart cache instance
+chart_cache = ChartCache()
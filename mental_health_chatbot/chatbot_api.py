@@ -1,22 +1,41 @@
-from fastapi import FastAPI, Request, Depends, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Request, Depends, UploadFile, File, Form, HTTPException, Query, Header, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-import requests
 from collections import deque
 import re
 from datetime import datetime, timedelta
 import json
 import base64
+import os
+import sys
+import asyncio
+import time
 
 # Import our new modules
-from database import get_db, MoodEntry, ChatMessage, SelfHelpActivity
+from database import (get_read_db, get_async_read_db, get_pool_stats,
+                      dispose_engines, dispose_async_engines, MoodEntry, ChatMessage, SelfHelpActivity, DEFAULT_USER_ID)
 from emotion_detection import emotion_detector
 from voice_processing import voice_processor
 from self_help_toolkit import self_help_toolkit
-from data_visualization import data_visualizer
+from execution import ServiceOverloadedError, execution_pools
+from llm_client import LLMClient, LLMError, CircuitOpenError
+from warmup import warmup_manager
+from chart_cache import chart_cache
+from response_encoding import compact_json_response
+from write_behind import write_behind
+from conversation_context import conversation_context
+from semantic_cache import semantic_cache
+from metrics import metrics, MetricsMiddleware, STAGE_SECONDS, stage_timer
+import analytics_series
+import rollups
+import data_export
+from streaming_stt import StreamingTranscriber, WHISPER_SAMPLE_RATE
+from transcription import transcription_service, TRANSCRIBE_SYNC_MAX_BYTES
 
 app = FastAPI(title="Mental Health Assistant API", version="2.0.0")
 
@@ -26,14 +45,110 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors and validators must be readable from browser clients
+    expose_headers=["ETag", "X-Next-After-Id", "X-Next-Before-Date", "X-Next-Before-Id"],
 )
+app.add_middleware(MetricsMiddleware)
+
+# Current depth of every internal queue, read when /metrics is scraped
+metrics.gauge("chatbot_queue_depth_current", "Items queued or running right now", ["queue"], callback=lambda: {
+    ("emotion_batcher",): emotion_detector.batcher.pending() if emotion_detector.batcher else 0,
+    ("write_behind",): write_behind.pending(),
+    ("cpu_pool",): execution_pools.cpu.get_stats()["in_flight"],
+    ("io_pool",): execution_pools.io.get_stats()["in_flight"],
+    ("transcription",): transcription_service.get_stats()["in_flight"],
+})
+
+@app.exception_handler(ServiceOverloadedError)
+async def service_overloaded_handler(request: Request, exc: ServiceOverloadedError):
+    """Shed load with a 503 instead of queueing without bound"""
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+def get_data_visualizer():
+    """Import the plotting stack on first use instead of at startup"""
+    from data_visualization import data_visualizer
+    return data_visualizer
+
+# Heavy components load in the background after the port is bound
+warmup_manager.register("emotion_model", emotion_detector.load_model, is_loaded=lambda: emotion_detector.is_loaded,
+                        fallback="keyword emotion detection")
+warmup_manager.register("whisper_workers", transcription_service.load, is_loaded=lambda: transcription_service.is_loaded)
+warmup_manager.register("data_visualizer", get_data_visualizer, required=False)
+if semantic_cache.enabled:
+    warmup_manager.register("semantic_cache_model", semantic_cache.load_model, required=False,
+                            is_loaded=lambda: semantic_cache.is_loaded)
+
+@app.on_event("startup")
+async def start_warmup():
+    warmup_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await llm_client.aclose()
+    execution_pools.shutdown()
+    if "data_visualization" in sys.modules:
+        get_data_visualizer().shutdown()
+    transcription_service.shutdown()
+    # Queued inserts must reach the database before the engines go away; the flush may take a while
+    await asyncio.to_thread(write_behind.stop)
+    dispose_engines()
+    await dispose_async_engines()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Latency, payload size, queue depth and model inference histograms in Prometheus text format"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "ok", "uptime_seconds": warmup_manager.get_status()["uptime_seconds"]}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: required models have loaded or fallen back; "degraded" lists the fallbacks in use"""
+    status = warmup_manager.get_status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+USER_ID_PATTERN = re.compile(r"[A-Za-z0-9_.@-]{1,64}")
+
+def get_user_id(x_user_id: Optional[str] = Header(None)) -> str:
+    """Identify the caller from the X-User-Id header; requests without it act as the default user"""
+    if not x_user_id:
+        return DEFAULT_USER_ID
+    user_id = x_user_id.strip()
+    if not USER_ID_PATTERN.fullmatch(user_id):
+        raise HTTPException(status_code=400, detail="Invalid X-User-Id header")
+    return user_id
 
 # Keep the original chat history for backward compatibility
 chat_history = deque(maxlen=100)
 
-# Model details
-API_Key = "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"
+# Model details; the key is only ever read from the environment
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 Model = "mistralai/mistral-7b-instruct"
+MISSING_API_KEY_ERROR = "OPENROUTER_API_KEY is not set; the chat model is unavailable."
+
+# Shared upstream client; keeps connections alive between chat turns
+llm_client = LLMClient(api_key=OPENROUTER_API_KEY)
+
+def _check_api_key():
+    """Readiness check: without a key every chat request would fail upstream"""
+    if not OPENROUTER_API_KEY:
+        raise RuntimeError(MISSING_API_KEY_ERROR)
+
+warmup_manager.register("openrouter_api_key", _check_api_key)
+
+def _missing_api_key_response() -> Optional[JSONResponse]:
+    if OPENROUTER_API_KEY:
+        return None
+    return JSONResponse(status_code=503, content={"error": MISSING_API_KEY_ERROR})
 
 SYSTEM_PROMPT = """
 You are a compassionate, non-judgmental mental health assistant trained in Cognitive Behavioral Therapy (CBT).
@@ -46,6 +161,29 @@ Your goals:
 - Provide practical coping strategies and self-care suggestions.
 """
 
+SUMMARY_PROMPT = """
+Summarize this conversation between a user and a supportive mental health assistant.
+Keep what matters for continuing it: the user's situation, feelings, concerns and any coping strategies already discussed.
+Write in the third person, in plain prose, in at most {max_words} words.
+"""
+
+async def _summarize_conversation(summary: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """Fold older turns into the running summary that replaces them in later prompts"""
+    transcript = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+    if summary:
+        transcript = f"Summary so far: {summary}\n\n{transcript}"
+    result = await llm_client.chat_completion(
+        [
+            {"role": "system", "content": SUMMARY_PROMPT.format(max_words=max(20, max_tokens * 3 // 4))},
+            {"role": "user", "content": transcript}
+        ],
+        model=Model,
+        max_tokens=max_tokens
+    )
+    return result["choices"][0]["message"]["content"]
+
+conversation_context.set_summarizer(_summarize_conversation)
+
 # Pydantic models
 class ChatRequest(BaseModel):
     message: str
@@ -64,74 +202,89 @@ class SelfHelpRequest(BaseModel):
 
 
 @app.post("/chat")
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(request: ChatRequest, user_id: str = Depends(get_user_id)):
     user_message = request.message.strip()
     if not user_message:
         return JSONResponse(
             status_code=422,
             content={"error": "Missing or empty 'message' field in request body."}
         )
+    missing_key = _missing_api_key_response()
+    if missing_key is not None:
+        return missing_key
 
     # Detect emotions in user message
-    emotions = emotion_detector.detect_emotions(user_message)
+    with stage_timer("emotion_detection"):
+        emotions = await emotion_detector.detect_emotions_async(user_message)
     dominant_emotion = emotion_detector.get_dominant_emotion(emotions)
 
-    # Save user message to database
-    user_chat = ChatMessage(
-        role="user",
-        content=user_message,
-        detected_emotions=emotions,
-        timestamp=datetime.utcnow()
-    )
-    db.add(user_chat)
+    # Generic self-care questions on the allowlist may be answered from the semantic cache
+    cache_vector = None
+    cached_reply = None
+    if semantic_cache.is_loaded and semantic_cache.is_cacheable(user_message, emotions):
+        with stage_timer("semantic_cache"):
+            vector = await execution_pools.run_cpu(semantic_cache.embed, user_message)
+            if semantic_cache.match_intent(vector):
+                cache_vector = vector
+                cached_reply = semantic_cache.lookup(cache_vector, user_id)
 
-    payload = {
-        "model": Model,
-        "messages": [
+    if cache_vector is not None:
+        # Replies that get cached are generated without history so they fit anyone who asks
+        messages = [
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_message}
         ]
-    }
+    else:
+        # Assemble the prompt before queueing the message, so a history load cannot pick it up twice
+        with stage_timer("context_build"):
+            messages = await conversation_context.build_messages(user_id, SYSTEM_PROMPT, user_message)
 
-    headers = {
-        "Authorization": f"Bearer {API_Key}",
-        "Content-Type": "application/json"
-    }
+    # Queue the user message now so it is kept even if the model call fails
+    write_behind.enqueue(
+        ChatMessage,
+        user_id=user_id,
+        role="user",
+        content=user_message,
+        detected_emotions=emotions,
+        timestamp=datetime.utcnow()
+    )
 
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            json=payload,
-            headers=headers
-        )
-        response.raise_for_status()
-        result = response.json()
+        if cached_reply is not None:
+            result = {"choices": [{"message": {"content": cached_reply}}]}
+        else:
+            with stage_timer("llm_completion"):
+                result = await llm_client.chat_completion(messages, model=Model)
 
         if "choices" in result and result["choices"]:
             assistant_reply = result["choices"][0]["message"]["content"]
+            if cache_vector is not None and cached_reply is None:
+                semantic_cache.store(cache_vector, user_id, assistant_reply)
             
             # Save bot response to database
-            bot_chat = ChatMessage(
+            write_behind.enqueue(
+                ChatMessage,
+                user_id=user_id,
                 role="bot",
                 content=assistant_reply,
                 timestamp=datetime.utcnow()
             )
-            db.add(bot_chat)
-            db.commit()
             
+            conversation_context.record_turn(user_id, user_message, assistant_reply)
             # Keep backward compatibility with chat_history
-            chat_history.append({"role": "user", "content": user_message})
-            chat_history.append({"role": "bot", "content": assistant_reply})
+            chat_history.append({"role": "user", "content": user_message, "user_id": user_id})
+            chat_history.append({"role": "bot", "content": assistant_reply, "user_id": user_id})
             
             response_data = {
                 "response": assistant_reply,
                 "detected_emotions": emotions,
-                "dominant_emotion": dominant_emotion
+                "dominant_emotion": dominant_emotion,
+                "cached": cached_reply is not None
             }
             
             # Add voice response if requested
             if request.voice_response:
-                audio_base64 = voice_processor.text_to_speech(assistant_reply)
+                audio_base64 = await execution_pools.run_io(voice_processor.text_to_speech, assistant_reply)
                 if audio_base64:
                     response_data["audio"] = audio_base64
             
@@ -142,10 +295,18 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
                 content={"error": "Model did not return any message."}
             )
 
-    except requests.exceptions.RequestException as e:
+    except ServiceOverloadedError:
+        raise
+    except CircuitOpenError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(e)},
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except LLMError as e:
         return JSONResponse(
             status_code=500,
-            content={"error": f"Error contacting model: {str(e)}"}
+            content={"error": str(e)}
         )
     except Exception as e:
         return JSONResponse(
@@ -153,25 +314,120 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
             content={"error": f"Unexpected error: {str(e)}"}
         )
 
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one Server-Sent Events message"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+# Emotion tasks that queue a streamed chat's user message; held here so they finish after the stream is gone
+_user_message_tasks = set()
+
+def _queue_user_message(user_id: str, user_message: str, received_at: datetime, emotion_task: asyncio.Task):
+    """Queue the user side of a streamed chat once its emotions are known, whatever became of the stream"""
+    if emotion_task not in _user_message_tasks:
+        return  # Already queued
+    _user_message_tasks.discard(emotion_task)
+    if emotion_task.cancelled() or emotion_task.exception() is not None:
+        emotions = emotion_detector._fallback_emotion_detection(user_message)
+    else:
+        emotions = emotion_task.result()
+    write_behind.enqueue(ChatMessage, user_id=user_id, role="user", content=user_message,
+                         detected_emotions=emotions, timestamp=received_at)
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, user_id: str = Depends(get_user_id)):
+    """Stream the assistant reply token by token as Server-Sent Events"""
+    user_message = request.message.strip()
+    if not user_message:
+        return JSONResponse(
+            status_code=422,
+            content={"error": "Missing or empty 'message' field in request body."}
+        )
+    missing_key = _missing_api_key_response()
+    if missing_key is not None:
+        return missing_key
+
+    with stage_timer("context_build"):
+        messages = await conversation_context.build_messages(user_id, SYSTEM_PROMPT, user_message)
+
+    # Emotion detection runs while the model is generating. The user message is queued as soon as it
+    # finishes, before any bot row, so it is kept even if the stream fails, is empty or the client goes away
+    received_at = datetime.utcnow()
+    emotion_task = asyncio.create_task(emotion_detector.detect_emotions_async(user_message))
+    _user_message_tasks.add(emotion_task)
+    emotion_task.add_done_callback(
+        lambda task: _queue_user_message(user_id, user_message, received_at, task)
+    )
+
+    async def event_stream():
+        reply_parts = []
+        started = time.perf_counter()
+        try:
+            async for token in llm_client.stream_chat_completion(messages, model=Model):
+                if not reply_parts:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, "llm_first_token")
+                reply_parts.append(token)
+                yield _sse_event({"token": token})
+            STAGE_SECONDS.observe(time.perf_counter() - started, "llm_stream")
+        except LLMError as e:
+            yield _sse_event({"error": str(e)}, event="error")
+            return
+
+        assistant_reply = "".join(reply_parts)
+        if not assistant_reply:
+            yield _sse_event({"error": "Model did not return any message."}, event="error")
+            return
+
+        try:
+            emotions = await emotion_task
+        except Exception:
+            emotions = emotion_detector._fallback_emotion_detection(user_message)
+        dominant_emotion = emotion_detector.get_dominant_emotion(emotions)
+
+        # Only a completed reply is saved. The task's done callback may not have run yet, so queue the user
+        # message here first (a no-op if it already is) to keep it ahead of the reply
+        _queue_user_message(user_id, user_message, received_at, emotion_task)
+        write_behind.enqueue(ChatMessage, user_id=user_id, role="bot", content=assistant_reply,
+                             timestamp=datetime.utcnow())
+        conversation_context.record_turn(user_id, user_message, assistant_reply)
+        chat_history.append({"role": "user", "content": user_message, "user_id": user_id})
+        chat_history.append({"role": "bot", "content": assistant_reply, "user_id": user_id})
+
+        done_data = {
+            "response": assistant_reply,
+            "detected_emotions": emotions,
+            "dominant_emotion": dominant_emotion
+        }
+        if request.voice_response:
+            audio_base64 = await execution_pools.run_io(voice_processor.text_to_speech, assistant_reply)
+            if audio_base64:
+                done_data["audio"] = audio_base64
+        yield _sse_event(done_data, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Weekly mental health summary endpoint
 @app.get("/weekly_summary")
-def get_weekly_summary(db: Session = Depends(get_db)):
-    # Enhanced summary using database
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=7)
+def get_weekly_summary(db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
+    # Enhanced summary using the daily rollups
+    start_day, end_day = rollups.recent_days(7)
     
-    # Get mood entries from database
-    mood_entries = db.query(MoodEntry).filter(
-        MoodEntry.date >= start_date,
-        MoodEntry.date <= end_date
-    ).all()
+    # Get daily mood aggregates from database
+    mood_days = db.execute(rollups.mood_days_query(user_id, start_day, end_day)).all()
     
-    if not mood_entries:
+    if not mood_days:
         # Fallback to old method for backward compatibility
-        if not chat_history:
+        user_messages = [
+            msg["content"] for msg in chat_history
+            if msg["role"] == "user" and msg.get("user_id", DEFAULT_USER_ID) == user_id
+        ]
+        if not user_messages:
             return {"summary": "No chat history available for this week."}
 
-        user_messages = [msg["content"] for msg in chat_history if msg["role"] == "user"]
         emotional_keywords = {
             "anxious": 0, "overwhelmed": 0, "sad": 0, "lonely": 0,
             "hopeful": 0, "calm": 0, "better": 0, "happy": 0
@@ -197,18 +453,13 @@ def get_weekly_summary(db: Session = Depends(get_db)):
         return {"summary": summary_text}
     
     # Generate enhanced summary from database
-    avg_mood = sum(entry.mood_rating for entry in mood_entries) / len(mood_entries)
-    
-    # Aggregate emotions
-    emotion_totals = {}
-    for entry in mood_entries:
-        if entry.detected_emotions:
-            emotions = entry.detected_emotions if isinstance(entry.detected_emotions, dict) else json.loads(entry.detected_emotions)
-            for emotion, score in emotions.items():
-                emotion_totals[emotion] = emotion_totals.get(emotion, 0) + score
+    avg_mood = rollups.summarize_days(mood_days)["average"]
     
     # Get top emotions
-    top_emotions = sorted(emotion_totals.items(), key=lambda x: x[1], reverse=True)[:3]
+    top_emotions = [
+        (row.emotion, row.score_sum)
+        for row in db.execute(rollups.emotion_totals_query(user_id, start_day, end_day).limit(3))
+    ]
     
     summary_text = f"This week, your average mood was {avg_mood:.1f}/10. "
     if top_emotions:
@@ -227,13 +478,15 @@ def get_weekly_summary(db: Session = Depends(get_db)):
 
 # New endpoints for additional features
 @app.post("/mood_entry")
-async def create_mood_entry(request: MoodEntryRequest, db: Session = Depends(get_db)):
+async def create_mood_entry(request: MoodEntryRequest, user_id: str = Depends(get_user_id)):
     """Create a new mood journal entry"""
     # Detect emotions in the mood text
-    emotions = emotion_detector.detect_emotions(request.mood_text)
+    emotions = await emotion_detector.detect_emotions_async(request.mood_text)
     
-    # Create mood entry
-    mood_entry = MoodEntry(
+    # Create mood entry; waiting for the group commit keeps the entry visible to the next analytics read
+    entry_id = await write_behind.write(
+        MoodEntry,
+        user_id=user_id,
         mood_text=request.mood_text,
         mood_rating=request.mood_rating,
         detected_emotions=emotions,
@@ -241,16 +494,12 @@ async def create_mood_entry(request: MoodEntryRequest, db: Session = Depends(get
         date=datetime.utcnow()
     )
     
-    db.add(mood_entry)
-    db.commit()
-    db.refresh(mood_entry)
-    
     # Generate personalized self-help recommendations
     dominant_emotion = emotion_detector.get_dominant_emotion(emotions)
     recommendations = self_help_toolkit.create_personalized_plan(request.mood_rating, dominant_emotion)
     
     return {
-        "entry_id": mood_entry.id,
+        "entry_id": entry_id,
         "detected_emotions": emotions,
         "dominant_emotion": dominant_emotion,
         "recommendations": recommendations,
@@ -258,41 +507,175 @@ async def create_mood_entry(request: MoodEntryRequest, db: Session = Depends(get
     }
 
 @app.post("/mood-entry")
-async def create_mood_entry_hyphenated(request: MoodEntryRequest, db: Session = Depends(get_db)):
+async def create_mood_entry_hyphenated(request: MoodEntryRequest, user_id: str = Depends(get_user_id)):
     """Create mood entry with hyphenated URL"""
-    return await create_mood_entry(request, db)
+    return await create_mood_entry(request, user_id)
+
+def _speech_model_unavailable() -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Speech recognition model is not loaded yet"},
+        headers={"Retry-After": "5"}
+    )
+
+def _queue_transcription(audio_data: bytes, file_format: str, user_id: str) -> JSONResponse:
+    job_id = transcription_service.submit_job(audio_data, file_format, user_id)
+    status_url = f"/transcriptions/{job_id}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "queued", "status_url": status_url},
+        headers={"Location": status_url}
+    )
 
 @app.post("/voice_to_text")
-async def voice_to_text(audio: UploadFile = File(...)):
-    """Convert uploaded audio to text"""
+async def voice_to_text(audio: UploadFile = File(...), user_id: str = Depends(get_user_id)):
+    """Convert uploaded audio to text; long recordings are queued as a job to poll"""
+    if not transcription_service.is_loaded:
+        return _speech_model_unavailable()
     try:
         audio_data = await audio.read()
-        transcribed_text = voice_processor.process_audio_upload(audio_data, audio.filename.split('.')[-1])
-        
-        if transcribed_text:
-            return {"text": transcribed_text}
-        else:
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Failed to transcribe audio"}
-            )
+        file_format = audio.filename.split('.')[-1]
+        if len(audio_data) > TRANSCRIBE_SYNC_MAX_BYTES:
+            return _queue_transcription(audio_data, file_format, user_id)
+
+        with stage_timer("transcription"):
+            result = await transcription_service.transcribe(audio_data, file_format)
+        return {"text": result["text"]}
+    except ServiceOverloadedError:
+        raise
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"error": f"Error processing audio: {str(e)}"}
         )
 
+@app.post("/transcriptions")
+async def create_transcription_job(audio: UploadFile = File(...), user_id: str = Depends(get_user_id)):
+    """Queue an upload for background transcription; poll the returned status URL"""
+    if not transcription_service.is_loaded:
+        return _speech_model_unavailable()
+    audio_data = await audio.read()
+    return _queue_transcription(audio_data, audio.filename.split('.')[-1], user_id)
+
+@app.get("/transcriptions/{job_id}")
+async def get_transcription_job(job_id: str, user_id: str = Depends(get_user_id)):
+    """Get the status of a transcription job, with the text once it has completed"""
+    job = transcription_service.get_job(job_id, user_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown transcription job '{job_id}'"})
+    return job
+
+@app.websocket("/ws/voice_to_text")
+async def voice_to_text_stream(websocket: WebSocket, sample_rate: int = WHISPER_SAMPLE_RATE,
+                               encoding: str = "pcm16"):
+    """Transcribe live audio: binary frames of mono PCM in, partial and final transcripts out
+
+    Send {"event": "end"} as a text frame to flush the last utterance and close the stream.
+    """
+    await websocket.accept()
+    if not transcription_service.is_loaded:
+        await websocket.send_json({"type": "error", "error": "Speech recognition model is not loaded yet"})
+        await websocket.close(code=1013)
+        return
+    try:
+        transcriber = StreamingTranscriber(sample_rate=sample_rate, encoding=encoding)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1003)
+        return
+
+    send_lock = asyncio.Lock()
+    partial_task: Optional[asyncio.Task] = None
+    finals: List[str] = []
+
+    async def send(message: Dict[str, Any]):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def send_partial(audio):
+        try:
+            text = await transcription_service.transcribe_window(audio, " ".join(finals[-2:]) or None)
+        except ServiceOverloadedError:
+            return  # Partials are best effort; the final transcript still comes
+        except Exception as e:
+            print(f"Partial transcript failed: {e}")
+            return
+        if text:
+            await send({"type": "partial", "text": text})
+
+    async def send_final(audio):
+        nonlocal partial_task
+        # A partial still decoding would only show outdated text after the final one
+        if partial_task is not None and not partial_task.done():
+            partial_task.cancel()
+        try:
+            text = await transcription_service.transcribe_window(audio, " ".join(finals[-2:]) or None)
+        except ServiceOverloadedError as e:
+            await send({"type": "error", "error": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            # e.g. a crashed worker; the client hears about it and the stream stays open
+            await send({"type": "error", "error": f"Transcription failed: {e}"})
+            return
+        if text:
+            finals.append(text)
+            await send({"type": "final", "text": text, "segment": len(finals)})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            ended = False
+            events = []
+            if message.get("bytes"):
+                events = transcriber.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    ended = json.loads(message["text"]).get("event") == "end"
+                except (ValueError, AttributeError):
+                    await send({"type": "error", "error": "Text frames must be JSON like {\"event\": \"end\"}"})
+                if ended:
+                    audio = transcriber.finish()
+                    if audio is not None:
+                        events.append(("final", audio))
+
+            for kind, audio in events:
+                if kind == "final":
+                    await send_final(audio)
+                elif partial_task is None or partial_task.done():
+                    # Skip partial windows while the previous one is still decoding
+                    partial_task = asyncio.create_task(send_partial(audio))
+
+            if ended:
+                await send({"type": "end", "text": " ".join(finals),
+                            "audio_seconds": round(transcriber.received_seconds, 2)})
+                await websocket.close()
+                break
+    finally:
+        if partial_task is not None and not partial_task.done():
+            partial_task.cancel()
+
+TTS_RESPONSE_FORMATS = ("base64", "binary")
+
 @app.post("/text_to_speech")
-async def text_to_speech(text: str = Form(...)):
-    """Convert text to speech"""
-    audio_base64 = voice_processor.text_to_speech(text)
-    if audio_base64:
-        return {"audio": audio_base64}
-    else:
+async def text_to_speech(text: str = Form(...), response_format: str = Form("base64")):
+    """Convert text to speech; response_format=binary returns the raw MP3 instead of base64 JSON"""
+    if response_format not in TTS_RESPONSE_FORMATS:
+        return JSONResponse(
+            status_code=422,
+            content={"error": f"Unknown response_format '{response_format}', expected one of {list(TTS_RESPONSE_FORMATS)}"}
+        )
+    audio_data = await execution_pools.run_io(voice_processor.text_to_speech_bytes, text)
+    if not audio_data:
         return JSONResponse(
             status_code=500,
             content={"error": "Failed to generate speech"}
         )
+    if response_format == "binary":
+        return Response(content=audio_data, media_type="audio/mpeg")
+    return {"audio": base64.b64encode(audio_data).decode()}
 
 @app.get("/self_help/exercises")
 async def get_self_help_exercises():
@@ -317,98 +700,208 @@ async def get_cbt_exercise(exercise_name: str):
     return exercise
 
 @app.post("/self_help/complete")
-async def complete_self_help_activity(request: SelfHelpRequest, db: Session = Depends(get_db)):
+async def complete_self_help_activity(request: SelfHelpRequest, user_id: str = Depends(get_user_id)):
     """Record completion of a self-help activity"""
-    activity = SelfHelpActivity(
+    activity_id = await write_behind.write(
+        SelfHelpActivity,
+        user_id=user_id,
         activity_type=request.activity_type,
         duration_seconds=request.duration_seconds,
         completion_rating=request.completion_rating,
         timestamp=datetime.utcnow()
     )
     
-    db.add(activity)
-    db.commit()
-    
-    return {"message": "Activity completion recorded!", "activity_id": activity.id}
+    return {"message": "Activity completion recorded!", "activity_id": activity_id}
 
 @app.get("/visualizations/mood_trend")
-async def get_mood_trend_chart(days: int = 30, db: Session = Depends(get_db)):
+def get_mood_trend_chart(days: int = 30, db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
     """Get mood trend visualization"""
-    chart_base64 = data_visualizer.create_mood_trend_chart(db, days)
+    chart_base64 = get_data_visualizer().create_mood_trend_chart(db, days, user_id=user_id)
     return {"chart": chart_base64, "type": "mood_trend"}
 
 @app.get("/visualizations/weekly_heatmap")
-async def get_weekly_heatmap(weeks: int = 12, db: Session = Depends(get_db)):
+def get_weekly_heatmap(weeks: int = 12, db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
     """Get weekly mood heatmap"""
-    chart_base64 = data_visualizer.create_weekly_mood_heatmap(db, weeks)
+    chart_base64 = get_data_visualizer().create_weekly_mood_heatmap(db, weeks, user_id=user_id)
     return {"chart": chart_base64, "type": "weekly_heatmap"}
 
 @app.get("/visualizations/comprehensive_report")
-async def get_comprehensive_report(days: int = 30, db: Session = Depends(get_db)):
-    """Get comprehensive visual report"""
-    report = data_visualizer.generate_comprehensive_report(db, days)
+async def get_comprehensive_report(days: int = 30, quality: str = "full", db: Session = Depends(get_read_db),
+                                   user_id: str = Depends(get_user_id)):
+    """Get comprehensive visual report; quality=preview renders at lower DPI"""
+    if quality not in ("full", "preview"):
+        return JSONResponse(
+            status_code=422,
+            content={"error": "quality must be 'full' or 'preview'"}
+        )
+    # Rendering happens in worker processes; wait for it without blocking the event loop
+    report = await execution_pools.run_io(
+        get_data_visualizer().generate_comprehensive_report, db, days, quality, user_id=user_id
+    )
     return report
 
+# Columns a mood entry listing can be projected to with fields=
+MOOD_ENTRY_FIELDS = {
+    "id": MoodEntry.id,
+    "date": MoodEntry.date,
+    "mood_text": MoodEntry.mood_text,
+    "mood_rating": MoodEntry.mood_rating,
+    "detected_emotions": MoodEntry.detected_emotions,
+    "entry_type": MoodEntry.entry_type,
+}
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    """Requested mood entry fields in their canonical order; raises ValueError on unknown names"""
+    if not fields:
+        return list(MOOD_ENTRY_FIELDS)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(MOOD_ENTRY_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields {sorted(unknown)}, expected any of {list(MOOD_ENTRY_FIELDS)}")
+    return [name for name in MOOD_ENTRY_FIELDS if name in requested]
+
+async def _list_mood_entries(request: Request, db: AsyncSession, user_id: str, fields: Optional[str],
+                             limit: Optional[int], after_id: Optional[int], before_date: Optional[datetime],
+                             before_id: Optional[int], start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None):
+    """Keyset-paginated, column-projected mood entry listing with ETag revalidation
+
+    after_id lists entries newer than a sync point by ascending id; otherwise entries come
+    newest first and before_date (with before_id to break ties) continues from the last one; entries
+    without a date cannot carry that cursor and only appear in the after_id sync.
+    Cursors for the next page are returned in X-Next-* headers so the body stays a plain list.
+    """
+    try:
+        names = _parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"error": str(e)})
+
+    # id and date are always fetched so the next-page cursors can be built
+    selected = list(dict.fromkeys(["id", "date"] + names))
+    stmt = select(*(MOOD_ENTRY_FIELDS[name] for name in selected)).where(MoodEntry.user_id == user_id)
+    if start_date is not None:
+        stmt = stmt.where(MoodEntry.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(MoodEntry.date <= end_date)
+    if after_id is not None:
+        stmt = stmt.where(MoodEntry.id > after_id)
+    if before_date is not None:
+        if before_id is not None:
+            stmt = stmt.where(tuple_(MoodEntry.date, MoodEntry.id) < tuple_(before_date, before_id))
+        else:
+            stmt = stmt.where(MoodEntry.date < before_date)
+    if after_id is not None:
+        stmt = stmt.order_by(MoodEntry.id)
+    else:
+        # Dialects place NULLs at different ends of the order, and no cursor can point past one
+        stmt = stmt.where(MoodEntry.date.isnot(None)).order_by(MoodEntry.date.desc(), MoodEntry.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    rows = (await db.execute(stmt)).mappings().all()
+    entries = [
+        {name: row[name].isoformat() if name == "date" and row[name] is not None else row[name] for name in names}
+        for row in rows
+    ]
+
+    headers = {"Cache-Control": "private, no-cache"}
+    if rows:
+        headers["X-Next-After-Id"] = str(max(row["id"] for row in rows))
+        if limit is not None and len(rows) == limit and after_id is None:
+            headers["X-Next-Before-Date"] = rows[-1]["date"].isoformat()
+            headers["X-Next-Before-Id"] = str(rows[-1]["id"])
+    return compact_json_response(request, entries, headers=headers, etag=True)
+
 @app.get("/mood_entries")
-async def get_mood_entries(days: int = 30, db: Session = Depends(get_db)):
+async def get_mood_entries(request: Request, days: int = 30, fields: Optional[str] = None,
+                           limit: Optional[int] = Query(None, ge=1), after_id: Optional[int] = None,
+                           before_date: Optional[datetime] = None, before_id: Optional[int] = None,
+                           db: AsyncSession = Depends(get_async_read_db), user_id: str = Depends(get_user_id)):
     """Get recent mood entries"""
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
-    
-    entries = db.query(MoodEntry).filter(
-        MoodEntry.date >= start_date,
-        MoodEntry.date <= end_date
-    ).order_by(MoodEntry.date.desc()).all()
-    
-    return [
-        {
-            "id": entry.id,
-            "date": entry.date.isoformat(),
-            "mood_text": entry.mood_text,
-            "mood_rating": entry.mood_rating,
-            "detected_emotions": entry.detected_emotions,
-            "entry_type": entry.entry_type
-        }
-        for entry in entries
-    ]
+    return await _list_mood_entries(request, db, user_id, fields, limit, after_id, before_date, before_id,
+                                    start_date=start_date, end_date=end_date)
 
 @app.get("/stats/overview")
-async def get_stats_overview(db: Session = Depends(get_db)):
+async def get_stats_overview(db: AsyncSession = Depends(get_async_read_db), user_id: str = Depends(get_user_id)):
     """Get overview statistics"""
     # Count entries
-    total_mood_entries = db.query(MoodEntry).count()
-    total_chat_messages = db.query(ChatMessage).count()
-    total_activities = db.query(SelfHelpActivity).count()
+    total_mood_entries = await db.scalar(rollups.total_entries_query(user_id))
+    total_chat_messages = await db.scalar(select(func.count()).select_from(ChatMessage).where(ChatMessage.user_id == user_id))
+    total_activities = await db.scalar(select(func.count()).select_from(SelfHelpActivity).where(SelfHelpActivity.user_id == user_id))
     
     # Recent mood average (last 7 days)
-    week_ago = datetime.now() - timedelta(days=7)
-    recent_moods = db.query(MoodEntry).filter(MoodEntry.date >= week_ago).all()
-    recent_avg = sum(entry.mood_rating for entry in recent_moods) / len(recent_moods) if recent_moods else 0
+    start_day, end_day = rollups.recent_days(7)
+    recent = rollups.summarize_days((await db.execute(rollups.mood_days_query(user_id, start_day, end_day))).all())
     
     return {
         "total_mood_entries": total_mood_entries,
         "total_chat_messages": total_chat_messages,
         "total_self_help_activities": total_activities,
-        "recent_average_mood": round(recent_avg, 1),
-        "streak_days": len(recent_moods)  # Simplified streak calculation
+        "recent_average_mood": round(recent["average"], 1),
+        "streak_days": recent["entries"]  # Simplified streak calculation
     }
 
+@app.get("/stats/emotion_batching")
+async def get_emotion_batching_stats():
+    """Get batch size and queue wait metrics for emotion detection"""
+    return emotion_detector.get_batching_stats()
+
+@app.get("/stats/emotion_cache")
+async def get_emotion_cache_stats():
+    """Get hit/miss counters for the emotion result cache"""
+    return emotion_detector.get_cache_stats()
+
+@app.get("/stats/chart_cache")
+async def get_chart_cache_stats():
+    """Get hit/miss counters and the number of per-user data version bumps for rendered charts"""
+    return chart_cache.get_stats()
+
+@app.get("/stats/execution_pools")
+async def get_execution_pool_stats():
+    """Get occupancy of the CPU and I/O worker pools"""
+    return execution_pools.get_stats()
+
+@app.get("/stats/database")
+async def get_database_stats():
+    """Get occupancy of the write and read-only connection pools"""
+    return get_pool_stats()
+
+@app.get("/stats/write_behind")
+async def get_write_behind_stats():
+    """Get queue depth and flush latency of the buffered database writes"""
+    return write_behind.get_stats()
+
+@app.get("/stats/transcription")
+async def get_transcription_stats():
+    """Get queue depth, failures and real-time factor of the Whisper workers"""
+    return transcription_service.get_stats()
+
+@app.get("/stats/conversation_context")
+async def get_conversation_context_stats():
+    """Get hit rate, prompt sizes and summary activity of the per-user conversation cache"""
+    return conversation_context.get_stats()
+
+@app.get("/stats/semantic_cache")
+async def get_semantic_cache_stats():
+    """Get hit rate, eligibility rejections and similarity of the semantic response cache"""
+    return semantic_cache.get_stats()
+
+@app.get("/stats/llm_client")
+async def get_llm_client_stats():
+    """Get retry, failure and circuit breaker state for the model client"""
+    return llm_client.get_stats()
+
 # Additional endpoints with hyphenated URLs for frontend compatibility
 @app.get("/mood-entries")
-async def get_mood_entries_hyphenated(limit: int = 10, db: Session = Depends(get_db)):
+async def get_mood_entries_hyphenated(request: Request, limit: int = Query(10, ge=1), fields: Optional[str] = None,
+                                      after_id: Optional[int] = None, before_date: Optional[datetime] = None,
+                                      before_id: Optional[int] = None,
+                                      db: AsyncSession = Depends(get_async_read_db),
+                                      user_id: str = Depends(get_user_id)):
     """Get mood entries with hyphenated URL"""
-    mood_entries = db.query(MoodEntry).order_by(MoodEntry.date.desc()).limit(limit).all()
-    return [
-        {
-            "id": entry.id,
-            "date": entry.date.isoformat(),
-            "mood_rating": entry.mood_rating,
-            "mood_text": entry.mood_text,
-            "detected_emotions": entry.detected_emotions,
-            "entry_type": entry.entry_type
-        }
-        for entry in mood_entries
-    ]
+    return await _list_mood_entries(request, db, user_id, fields, limit, after_id, before_date, before_id)
 
 @app.get("/self-help-recommendations")
 async def get_self_help_recommendations():
@@ -431,17 +924,85 @@ async def get_affirmations():
     toolkit = SelfHelpToolkit()
     return {"affirmation": toolkit.get_daily_affirmation()}
 
+# Raw chart series so clients can draw charts locally instead of downloading PNGs
+SERIES_FORMATS = ("records", "columnar")
+
+def _series_rows(db: Session, days: int, user_id: str) -> List[Dict[str, Any]]:
+    end_date = datetime.now()
+    return analytics_series.fetch_mood_rows(db, end_date - timedelta(days=days), end_date, user_id)
+
+def _encode_records(records: List[Dict[str, Any]], fmt: str):
+    return analytics_series.to_columnar(records) if fmt == "columnar" else records
+
+def _series_response(request: Request, series_type: str, params: Dict[str, Any], fmt: str, build):
+    if fmt not in SERIES_FORMATS:
+        return JSONResponse(
+            status_code=422,
+            content={"error": f"format must be one of {list(SERIES_FORMATS)}"}
+        )
+    data = chart_cache.get_or_render(f"series:{series_type}", {**params, "format": fmt}, build)
+    # The weak ETag lets clients revalidate a chart they already drew and get a bodiless 304
+    return compact_json_response(request, {"type": series_type, **params, "format": fmt, "data": data}, etag=True)
+
+@app.get("/analytics/series/mood_trend")
+def get_mood_trend_series(request: Request, days: int = 30, fmt: str = Query("columnar", alias="format"),
+                          db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
+    """Get daily mood points (average, min, max, count) behind the mood trend chart"""
+    return _series_response(request, "mood_trend", {"days": days, "user_id": user_id}, fmt, lambda: _encode_records(
+        analytics_series.mood_trend_series(_series_rows(db, days, user_id)), fmt
+    ))
+
+@app.get("/analytics/series/weekly_heatmap")
+def get_weekly_heatmap_series(request: Request, weeks: int = 12, fmt: str = Query("columnar", alias="format"),
+                              db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
+    """Get the weekday x ISO-week average mood matrix behind the heatmap"""
+    return _series_response(request, "weekly_heatmap", {"weeks": weeks, "user_id": user_id}, fmt, lambda: (
+        analytics_series.weekly_heatmap_series(_series_rows(db, weeks * 7, user_id))
+    ))
+
+@app.get("/analytics/series/emotion_distribution")
+def get_emotion_distribution_series(request: Request, days: int = 30, fmt: str = Query("columnar", alias="format"),
+                                    db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
+    """Get summed emotion scores behind the emotion distribution chart"""
+    return _series_response(request, "emotion_distribution", {"days": days, "user_id": user_id}, fmt, lambda: _encode_records(
+        analytics_series.emotion_totals_series(_series_rows(db, days, user_id)), fmt
+    ))
+
+@app.get("/analytics/series/mood_emotion_correlation")
+def get_correlation_series(request: Request, days: int = 30, fmt: str = Query("columnar", alias="format"),
+                           db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
+    """Get the mood/emotion correlation matrix"""
+    return _series_response(request, "mood_emotion_correlation", {"days": days, "user_id": user_id}, fmt, lambda: (
+        analytics_series.correlation_series(_series_rows(db, days, user_id))
+    ))
+
+@app.get("/analytics/series/report")
+def get_report_series(request: Request, days: int = 30, fmt: str = Query("columnar", alias="format"),
+                      db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
+    """Get all four chart series from a single query"""
+    def build():
+        rows = _series_rows(db, days, user_id)
+        weeks = min(days // 7, 12)
+        heatmap_start = datetime.now() - timedelta(weeks=weeks)
+        return {
+            "mood_trend": _encode_records(analytics_series.mood_trend_series(rows), fmt),
+            "emotion_distribution": _encode_records(analytics_series.emotion_totals_series(rows), fmt),
+            "weekly_heatmap": analytics_series.weekly_heatmap_series([r for r in rows if r["date"] >= heatmap_start]),
+            "mood_emotion_correlation": analytics_series.correlation_series(rows),
+        }
+    return _series_response(request, "report", {"days": days, "user_id": user_id}, fmt, build)
+
 @app.get("/analytics/mood-trends")
-async def get_mood_trends_analytics(days: int = 30, db: Session = Depends(get_db)):
+def get_mood_trends_analytics(days: int = 30, db: Session = Depends(get_read_db), user_id: str = Depends(get_user_id)):
     """Get mood trends analytics"""
-    from data_visualization import DataVisualizer
-    visualizer = DataVisualizer()
     try:
-        chart_data = visualizer.create_mood_trend_chart(db, days)
+        chart_data = get_data_visualizer().create_mood_trend_chart(db, days, user_id=user_id)
         return {"chart": chart_data, "type": "mood_trends", "days": days}
     except Exception as e:
         # Return simple data if visualization fails
-        mood_entries = db.query(MoodEntry).order_by(MoodEntry.date.desc()).limit(days).all()
+        mood_entries = db.query(MoodEntry).filter(
+            MoodEntry.user_id == user_id
+        ).order_by(MoodEntry.date.desc()).limit(days).all()
         if not mood_entries:
             return {"message": "No mood data available", "data": []}
         
@@ -456,14 +1017,13 @@ async def get_mood_trends_analytics(days: int = 30, db: Session = Depends(get_db
         return {"data": trend_data, "error": str(e)}
 
 @app.get("/analytics/weekly-patterns")
-async def get_weekly_patterns_analytics(db: Session = Depends(get_db)):
+async def get_weekly_patterns_analytics(db: AsyncSession = Depends(get_async_read_db),
+                                        user_id: str = Depends(get_user_id)):
     """Get weekly patterns analytics"""
-    from datetime import datetime, timedelta
-    
-    # Get all mood entries
-    mood_entries = db.query(MoodEntry).all()
+    # One aggregate row per day the user has entries on
+    mood_days = (await db.execute(rollups.mood_days_query(user_id))).all()
     
-    if not mood_entries:
+    if not mood_days:
         return {
             "data": {
                 "most_active_day": "No data",
@@ -480,42 +1040,35 @@ async def get_weekly_patterns_analytics(db: Session = Depends(get_db)):
     
     # Initialize weekly data
     for day in weekdays:
-        weekly_data[day] = {"ratings": [], "count": 0, "average": 0}
+        weekly_data[day] = {"rating_sum": 0, "rating_count": 0, "count": 0, "average": 0}
     
-    # Process entries - use timestamp if date attribute doesn't exist
-    for entry in mood_entries:
-        try:
-            # Try using date attribute first, fallback to timestamp
-            entry_date = entry.date if hasattr(entry, 'date') and entry.date else entry.timestamp.date()
-            week_day = entry_date.strftime("%A")
-        except:
-            # Fallback to timestamp weekday
-            week_day = weekdays[entry.timestamp.weekday()]
-            
-        if week_day in weekly_data:
-            if entry.mood_rating:
-                weekly_data[week_day]["ratings"].append(entry.mood_rating)
-            weekly_data[week_day]["count"] += 1
+    # Fold daily aggregates into their weekday
+    for row in mood_days:
+        week_day = weekdays[row.day.weekday()]
+        weekly_data[week_day]["rating_sum"] += row.rating_sum
+        weekly_data[week_day]["rating_count"] += row.rating_count
+        weekly_data[week_day]["count"] += row.entry_count
     
     # Calculate averages and statistics
     weekday_averages = {}
     for day in weekdays:
-        if weekly_data[day]["ratings"]:
+        if weekly_data[day]["rating_count"]:
             weekly_data[day]["average"] = round(
-                sum(weekly_data[day]["ratings"]) / len(weekly_data[day]["ratings"]), 1
+                weekly_data[day]["rating_sum"] / weekly_data[day]["rating_count"], 1
             )
             weekday_averages[day] = weekly_data[day]["average"]
         else:
             weekday_averages[day] = 0
-        # Remove raw ratings for cleaner response
-        del weekly_data[day]["ratings"]
+        # Remove raw sums for cleaner response
+        del weekly_data[day]["rating_sum"]
+        del weekly_data[day]["rating_count"]
     
     # Find most active day
+    total_entries = sum(row.entry_count for row in mood_days)
     most_active_day = max(weekdays, key=lambda day: weekly_data[day]["count"])
-    avg_daily_entries = len(mood_entries) / 7
+    avg_daily_entries = total_entries / 7
     
     # Calculate consistency score
-    total_entries = len(mood_entries)
     ideal_per_day = total_entries / 7
     variance = sum((weekly_data[day]["count"] - ideal_per_day) ** 2 for day in weekdays) / 7
     consistency_score = max(0, 100 - (variance / ideal_per_day * 100)) if ideal_per_day > 0 else 0
@@ -528,22 +1081,23 @@ async def get_weekly_patterns_analytics(db: Session = Depends(get_db)):
             "weekday_averages": weekday_averages,
             "weekly_breakdown": weekly_data
         },
-        "total_entries": len(mood_entries),
+        "total_entries": total_entries,
         "days_with_data": len([day for day in weekly_data if weekly_data[day]["count"] > 0])
     }
 
 @app.get("/weekly-summary")
-async def get_weekly_summary_hyphenated(db: Session = Depends(get_db)):
+async def get_weekly_summary_hyphenated(db: AsyncSession = Depends(get_async_read_db),
+                                        user_id: str = Depends(get_user_id)):
     """Get weekly summary with hyphenated URL"""
-    week_ago = datetime.now() - timedelta(days=7)
+    start_day, end_day = rollups.recent_days(7)
     
-    # Get mood entries from last week
-    mood_entries = db.query(MoodEntry).filter(MoodEntry.date >= week_ago.date()).all()
+    # Get daily mood aggregates from last week
+    mood_days = (await db.execute(rollups.mood_days_query(user_id, start_day, end_day))).all()
     
-    if not mood_entries:
+    if not mood_days:
         return {
-            "week_start": week_ago.strftime("%Y-%m-%d"),
-            "week_end": datetime.now().strftime("%Y-%m-%d"),
+            "week_start": start_day.isoformat(),
+            "week_end": end_day.isoformat(),
             "average_mood": 0,
             "total_entries": 0,
             "mood_trend": "No data",
@@ -552,33 +1106,22 @@ async def get_weekly_summary_hyphenated(db: Session = Depends(get_db)):
         }
     
     # Calculate statistics
-    avg_mood = sum(entry.mood_rating for entry in mood_entries) / len(mood_entries)
-    
-    # Extract emotions from detected_emotions JSON field
-    emotions = []
-    for entry in mood_entries:
-        if entry.detected_emotions:
-            if isinstance(entry.detected_emotions, list):
-                emotions.extend(entry.detected_emotions)
-            elif isinstance(entry.detected_emotions, dict):
-                emotions.extend(entry.detected_emotions.keys())
-            elif isinstance(entry.detected_emotions, str):
-                emotions.append(entry.detected_emotions)
+    summary = rollups.summarize_days(mood_days)
+    avg_mood = summary["average"]
     
-    # Find dominant emotion
-    emotion_counts = {}
-    for emotion in emotions:
-        emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
+    # Find dominant emotion: the one detected in the most entries
+    emotion_counts = {
+        row.emotion: row.entry_count
+        for row in (await db.execute(rollups.emotion_totals_query(user_id, start_day, end_day))).all()
+    }
     
     dominant_emotion = max(emotion_counts.items(), key=lambda x: x[1])[0] if emotion_counts else "neutral"
     
-    # Determine trend
-    if len(mood_entries) >= 2:
-        first_half = mood_entries[:len(mood_entries)//2]
-        second_half = mood_entries[len(mood_entries)//2:]
-        
-        first_avg = sum(entry.mood_rating for entry in first_half) / len(first_half)
-        second_avg = sum(entry.mood_rating for entry in second_half) / len(second_half)
+    # Determine trend by comparing the earlier and later days of the week
+    halves = rollups.split_halves(mood_days)
+    if halves:
+        first_avg = rollups.summarize_days(halves[0])["average"]
+        second_avg = rollups.summarize_days(halves[1])["average"]
         
         if second_avg > first_avg + 0.5:
             trend = "Improving"
@@ -604,59 +1147,46 @@ async def get_weekly_summary_hyphenated(db: Session = Depends(get_db)):
         insights.append(f"You experienced {dominant_emotion} frequently. Consider relaxation techniques.")
     
     return {
-        "week_start": week_ago.strftime("%Y-%m-%d"),
-        "week_end": datetime.now().strftime("%Y-%m-%d"),
+        "week_start": start_day.isoformat(),
+        "week_end": end_day.isoformat(),
         "average_mood": round(avg_mood, 1),
-        "total_entries": len(mood_entries),
+        "mood_std_dev": round(summary["std_dev"], 2),
+        "total_entries": summary["entries"],
         "mood_trend": trend,
         "dominant_emotion": dominant_emotion,
         "insights": insights
     }
 
+EXPORT_COMPRESSIONS = ("none", "gzip")
+
 @app.get("/export-data")
-async def export_data(db: Session = Depends(get_db)):
-    """Export all user data"""
-    mood_entries = db.query(MoodEntry).all()
-    chat_messages = db.query(ChatMessage).all()
-    activities = db.query(SelfHelpActivity).all()
-    
-    export_data = {
-        "mood_entries": [
-            {
-                "id": entry.id,
-                "date": entry.date.isoformat(),
-                "mood_rating": entry.mood_rating,
-                "mood_text": entry.mood_text,
-                "detected_emotions": entry.detected_emotions,
-                "entry_type": entry.entry_type
-            }
-            for entry in mood_entries
-        ],
-        "chat_messages": [
-            {
-                "id": msg.id,
-                "timestamp": msg.timestamp.isoformat(),
-                "role": msg.role,
-                "content": msg.content,
-                "detected_emotions": msg.detected_emotions
-            }
-            for msg in chat_messages
-        ],
-        "self_help_activities": [
-            {
-                "id": activity.id,
-                "timestamp": activity.timestamp.isoformat(),
-                "activity_type": activity.activity_type,
-                "duration_seconds": activity.duration_seconds,
-                "completion_rating": activity.completion_rating
-            }
-            for activity in activities
-        ],
-        "export_timestamp": datetime.now().isoformat(),
-        "total_records": len(mood_entries) + len(chat_messages) + len(activities)
-    }
-    
-    return export_data
+async def export_data(since: Optional[datetime] = None, cursor: Optional[str] = None,
+                      limit: Optional[int] = Query(None, ge=1), compression: str = "none",
+                      user_id: str = Depends(get_user_id)):
+    """Stream all user data as NDJSON, optionally from a cursor, since a time, or gzip-compressed"""
+    if compression not in EXPORT_COMPRESSIONS:
+        return JSONResponse(
+            status_code=422,
+            content={"error": f"Unknown compression '{compression}', expected one of {list(EXPORT_COMPRESSIONS)}"}
+        )
+    if cursor:
+        try:
+            data_export.parse_cursor(cursor)
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": f"Invalid export cursor '{cursor}'"})
+
+    body = data_export.ndjson_export(user_id, since, cursor, limit)
+    filename = f"export-{user_id}.ndjson"
+    media_type = "application/x-ndjson"
+    if compression == "gzip":
+        body = data_export.gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # Server startup
 if __name__ == "__main__":
@@ -664,4 +1194,6 @@ if __name__ == "__main__":
     print("Starting Mental Health Assistant API server...")
     print("Server will be available at: http://127.0.0.1:8000")
     print("API Documentation at: http://127.0.0.1:8000/docs")
+    # Spawned Whisper workers re-import the launch script, i.e. this whole module and its database setup
+    print("Note: prefer 'uvicorn chatbot_api:app'; every Whisper worker process re-imports this script")
     uvicorn.run(app, host="127.0.0.1", port=8000)
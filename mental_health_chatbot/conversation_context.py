@@ -0,0 +1,276 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select
+
+from database import ChatMessage, get_async_sessionmaker
+from write_behind import write_behind
+
+# Prompt tokens for summary plus history; the system prompt and the new message come on top
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+# Messages kept per user and read back from chat_messages on a cache miss
+CHAT_CONTEXT_MAX_MESSAGES = int(os.getenv("CHAT_CONTEXT_MAX_MESSAGES", "40"))
+CHAT_CONTEXT_CACHE_USERS = int(os.getenv("CHAT_CONTEXT_CACHE_USERS", "1000"))
+# Cached conversations are reloaded after this long, to pick up turns handled by other API processes; 0 never reloads
+CHAT_CONTEXT_REFRESH_SECONDS = float(os.getenv("CHAT_CONTEXT_REFRESH_SECONDS", "60"))
+# Share of the budget the running summary may take, and how much evicted text triggers a new one
+CHAT_SUMMARY_TOKEN_SHARE = float(os.getenv("CHAT_SUMMARY_TOKEN_SHARE", "0.25"))
+CHAT_SUMMARY_TRIGGER_TOKENS = int(os.getenv("CHAT_SUMMARY_TRIGGER_TOKENS", "400"))
+CHAT_SUMMARY_ENABLED = os.getenv("CHAT_SUMMARY_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Chat format overhead per message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Summarizer = Callable[[str, List[Dict[str, str]], int], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English); no tokenizer round-trip"""
+    return len(text) // 4 + 1
+
+
+def _message(role: str, content: str) -> Dict[str, Any]:
+    # The database stores replies as "bot"; the chat-completions API calls them "assistant"
+    role = "assistant" if role == "bot" else role
+    return {"role": role, "content": content, "tokens": estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS}
+
+
+class _Conversation:
+    """Recent messages of one user, newest last, plus a summary of what scrolled out"""
+
+    def __init__(self, max_messages: int):
+        self.messages: deque = deque(maxlen=max_messages)
+        self.summary = ""
+        self.summary_tokens = 0
+        self.unsummarized: List[Dict[str, Any]] = []
+        self.summarizing = False
+        self.loaded_at = time.monotonic()
+
+    def history_tokens(self) -> int:
+        return sum(message["tokens"] for message in self.messages)
+
+    def unsummarized_tokens(self) -> int:
+        return sum(message["tokens"] for message in self.unsummarized)
+
+
+class ConversationContext:
+    """Per-user hot cache of recent chat turns that assembles prompts within a token budget"""
+
+    def __init__(self, token_budget: int = CHAT_CONTEXT_TOKEN_BUDGET, max_messages: int = CHAT_CONTEXT_MAX_MESSAGES,
+                 max_users: int = CHAT_CONTEXT_CACHE_USERS, summary_share: float = CHAT_SUMMARY_TOKEN_SHARE,
+                 summary_trigger_tokens: int = CHAT_SUMMARY_TRIGGER_TOKENS,
+                 summaries_enabled: bool = CHAT_SUMMARY_ENABLED,
+                 refresh_seconds: float = CHAT_CONTEXT_REFRESH_SECONDS):
+        self.token_budget = max(1, token_budget)
+        self.max_messages = max(2, max_messages)
+        self.max_users = max(1, max_users)
+        self.summary_max_tokens = int(self.token_budget * summary_share) if summaries_enabled else 0
+        self.summary_trigger_tokens = summary_trigger_tokens
+        self.refresh_seconds = refresh_seconds
+        self.summarizer: Optional[Summarizer] = None
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._stats = {"hits": 0, "misses": 0, "refreshes": 0, "load_failures": 0, "evictions": 0, "prompts": 0,
+                       "prompt_tokens": 0, "max_prompt_tokens": 0, "dropped_messages": 0,
+                       "summaries": 0, "summary_failures": 0}
+
+    def set_summarizer(self, summarizer: Summarizer):
+        """Register the coroutine that folds (summary, messages, max_tokens) into a new summary"""
+        self.summarizer = summarizer
+
+    @property
+    def history_budget(self) -> int:
+        return self.token_budget - self.summary_max_tokens
+
+    def _is_stale(self, conversation: _Conversation) -> bool:
+        # A summary in flight writes into this object, so it is kept until that finishes
+        return (self.refresh_seconds > 0 and not conversation.summarizing
+                and time.monotonic() - conversation.loaded_at >= self.refresh_seconds)
+
+    async def _get(self, user_id: str) -> _Conversation:
+        with self._lock:
+            cached = self._conversations.get(user_id)
+            if cached is not None and not self._is_stale(cached):
+                self._conversations.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return cached
+            self._stats["refreshes" if cached is not None else "misses"] += 1
+
+        try:
+            rows = await self._load_recent(user_id)
+        except Exception as e:
+            print(f"Could not load chat history for {user_id}: {e}")
+            with self._lock:
+                self._stats["load_failures"] += 1
+            if cached is not None:
+                return cached
+            rows = []
+
+        loaded = _Conversation(self.max_messages)
+        with self._lock:
+            for role, content in rows:
+                self._append(loaded, _message(role, content))
+            if cached is not None:
+                # The reloaded ring supersedes the cached one; what it pushed out is already covered by the summary
+                loaded.summary = cached.summary
+                loaded.summary_tokens = cached.summary_tokens
+                loaded.unsummarized = cached.unsummarized
+            # A concurrent request may have loaded the same user meanwhile
+            conversation = self._conversations.get(user_id)
+            if conversation is None or conversation is cached:
+                conversation = self._conversations[user_id] = loaded
+            self._conversations.move_to_end(user_id)
+            while len(self._conversations) > self.max_users:
+                self._conversations.popitem(last=False)
+                self._stats["evictions"] += 1
+        self._maybe_summarize(conversation)
+        return conversation
+
+    async def _load_recent(self, user_id: str) -> List[tuple]:
+        """Latest messages from chat_messages plus those still queued in the write-behind buffer"""
+        # Read the queue first: a row committed in between then shows up in both and is de-duplicated
+        queued = write_behind.unflushed_rows(ChatMessage, user_id=user_id)
+        stmt = (
+            select(ChatMessage.role, ChatMessage.content, ChatMessage.timestamp)
+            .where(ChatMessage.user_id == user_id)
+            .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+            .limit(self.max_messages)
+        )
+        async with get_async_sessionmaker(read_only=True)() as db:
+            rows = [tuple(row) for row in (await db.execute(stmt)).all()]
+        rows.reverse()
+
+        stored = set(rows)
+        for values in queued:
+            row = (values.get("role"), values.get("content"), values.get("timestamp") or datetime.utcnow())
+            if row not in stored:
+                rows.append(row)
+        # Python's sort is stable, so rows with equal timestamps keep their insertion order
+        rows.sort(key=lambda row: row[2] or datetime.min)
+        return [(role, content) for role, content, _ in rows[-self.max_messages:] if content]
+
+    def _append(self, conversation: _Conversation, message: Dict[str, Any]):
+        """Add a message, moving whatever no longer fits the ring or the budget to the summary queue"""
+        if len(conversation.messages) == conversation.messages.maxlen:
+            conversation.unsummarized.append(conversation.messages.popleft())
+        conversation.messages.append(message)
+        while len(conversation.messages) > 1 and conversation.history_tokens() > self.history_budget:
+            conversation.unsummarized.append(conversation.messages.popleft())
+
+        if not self.summary_max_tokens:
+            conversation.unsummarized.clear()
+            return
+        # Bound the backlog if the summarizer keeps failing or is not configured
+        while conversation.unsummarized and conversation.unsummarized_tokens() > 4 * self.history_budget:
+            conversation.unsummarized.pop(0)
+            self._stats["dropped_messages"] += 1
+
+    async def build_messages(self, user_id: str, system_prompt: str, user_message: str) -> List[Dict[str, str]]:
+        """System prompt, running summary and as many recent turns as the budget allows, then the new message"""
+        conversation = await self._get(user_id)
+        with self._lock:
+            summary = conversation.summary
+            history = list(conversation.messages)
+
+        budget = self.token_budget
+        prefix = [{"role": "system", "content": system_prompt}]
+        if summary:
+            prefix.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+            budget -= conversation.summary_tokens
+
+        # Walk back from the newest turn; a long new message pushes older turns out of this prompt
+        budget -= estimate_tokens(user_message) + MESSAGE_OVERHEAD_TOKENS
+        included = []
+        for message in reversed(history):
+            if message["tokens"] > budget:
+                break
+            budget -= message["tokens"]
+            included.append({"role": message["role"], "content": message["content"]})
+        included.reverse()
+        # Start the history on a user turn so the model never sees an orphaned reply first
+        while included and included[0]["role"] != "user":
+            included.pop(0)
+
+        messages = prefix + included + [{"role": "user", "content": user_message}]
+        prompt_tokens = sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+        with self._lock:
+            self._stats["prompts"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["max_prompt_tokens"] = max(self._stats["max_prompt_tokens"], prompt_tokens)
+        return messages
+
+    def record_turn(self, user_id: str, user_message: str, assistant_reply: str):
+        """Append a completed exchange to the user's cached conversation"""
+        with self._lock:
+            conversation = self._conversations.get(user_id)
+            if conversation is None:
+                # Evicted while the model was answering; the next request reloads it from the database
+                return
+            self._append(conversation, _message("user", user_message))
+            self._append(conversation, _message("assistant", assistant_reply))
+        self._maybe_summarize(conversation)
+
+    def _maybe_summarize(self, conversation: _Conversation):
+        with self._lock:
+            if (self.summarizer is None or conversation.summarizing
+                    or conversation.unsummarized_tokens() < self.summary_trigger_tokens):
+                return
+            conversation.summarizing = True
+            pending = conversation.unsummarized
+            conversation.unsummarized = []
+        task = asyncio.get_running_loop().create_task(self._summarize(conversation, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, conversation: _Conversation, pending: List[Dict[str, Any]]):
+        """Fold evicted messages into the running summary off the request path"""
+        messages = [{"role": m["role"], "content": m["content"]} for m in pending]
+        try:
+            summary = (await self.summarizer(conversation.summary, messages, self.summary_max_tokens)).strip()
+        except Exception as e:
+            print(f"Conversation summary failed: {e}")
+            with self._lock:
+                # Keep the messages for the next attempt
+                conversation.unsummarized = pending + conversation.unsummarized
+                conversation.summarizing = False
+                self._stats["summary_failures"] += 1
+            return
+
+        tokens = estimate_tokens(summary)
+        if tokens > self.summary_max_tokens:
+            summary = summary[:self.summary_max_tokens * 4]
+            tokens = estimate_tokens(summary)
+        with self._lock:
+            conversation.summary = summary
+            conversation.summary_tokens = tokens + MESSAGE_OVERHEAD_TOKENS
+            conversation.summarizing = False
+            self._stats["summaries"] += 1
+
+    def forget(self, user_id: str):
+        with self._lock:
+            self._conversations.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_users"] = len(self._conversations)
+            stats["summaries_in_flight"] = len(self._tasks)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        stats["avg_prompt_tokens"] = round(stats["prompt_tokens"] / stats["prompts"], 1) if stats["prompts"] else 0
+        stats.update({
+            "token_budget": self.token_budget,
+            "summary_max_tokens": self.summary_max_tokens,
+            "max_messages": self.max_messages,
+            "max_users": self.max_users,
+        })
+        return stats
+
+# Global conversation context cache
+conversation_context = ConversationContext()
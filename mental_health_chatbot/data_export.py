@@ -0,0 +1,180 @@
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+
+from database import MoodEntry, ChatMessage, SelfHelpActivity, get_async_sessionmaker
+
+# Rows fetched per query; each chunk uses its own short read transaction
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+# Serialized bytes buffered before handing a piece to the response
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _mood_entry(entry: MoodEntry) -> Dict[str, Any]:
+    return {
+        "id": entry.id,
+        "date": _isoformat(entry.date),
+        "mood_rating": entry.mood_rating,
+        "mood_text": entry.mood_text,
+        "detected_emotions": entry.detected_emotions,
+        "entry_type": entry.entry_type
+    }
+
+
+def _chat_message(msg: ChatMessage) -> Dict[str, Any]:
+    return {
+        "id": msg.id,
+        "timestamp": _isoformat(msg.timestamp),
+        "role": msg.role,
+        "content": msg.content,
+        "detected_emotions": msg.detected_emotions
+    }
+
+
+def _self_help_activity(activity: SelfHelpActivity) -> Dict[str, Any]:
+    return {
+        "id": activity.id,
+        "timestamp": _isoformat(activity.timestamp),
+        "activity_type": activity.activity_type,
+        "duration_seconds": activity.duration_seconds,
+        "completion_rating": activity.completion_rating
+    }
+
+
+# Exported in this order; each table is walked by (time, id), which its (user_id, time) index serves
+EXPORT_TABLES = [
+    ("mood_entry", MoodEntry, "date", _mood_entry),
+    ("chat_message", ChatMessage, "timestamp", _chat_message),
+    ("self_help_activity", SelfHelpActivity, "timestamp", _self_help_activity),
+]
+RECORD_TYPES = [table[0] for table in EXPORT_TABLES]
+
+
+# Cursor time of rows without a timestamp; those are exported first, ordered by id
+NULL_CURSOR_TIME = "null"
+
+
+def make_cursor(record_type: str, time_value: Optional[str], record_id: int) -> str:
+    return f"{record_type}:{time_value if time_value is not None else NULL_CURSOR_TIME}:{record_id}"
+
+
+def parse_cursor(cursor: str) -> Tuple[int, Optional[datetime], int]:
+    """Split '<type>:<iso time or null>:<id>' into table index, time and id; raises ValueError when malformed"""
+    record_type, _, rest = cursor.partition(":")
+    time_value, _, record_id = rest.rpartition(":")
+    if record_type not in RECORD_TYPES or not time_value:
+        raise ValueError(f"Invalid export cursor '{cursor}'")
+    after_time = None if time_value == NULL_CURSOR_TIME else datetime.fromisoformat(time_value)
+    return RECORD_TYPES.index(record_type), after_time, int(record_id)
+
+
+async def iter_export_records(user_id: str, since: Optional[datetime] = None, cursor: Optional[str] = None,
+                              limit: Optional[int] = None,
+                              chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the user's records table by table, resuming after cursor and stopping after limit records"""
+    start_table, after_time, after_id = parse_cursor(cursor) if cursor else (0, None, None)
+    session_factory = get_async_sessionmaker(read_only=True)
+    emitted = 0
+
+    for index in range(start_table, len(EXPORT_TABLES)):
+        record_type, model, time_attr, serialize = EXPORT_TABLES[index]
+        time_column = getattr(model, time_attr)
+        resuming = index == start_table and cursor is not None
+        # Legacy rows without a time cannot take part in a (time, id) comparison, so they go first by id;
+        # a since filter excludes them anyway
+        null_phase = since is None and not (resuming and after_time is not None)
+        position = (after_time, after_id) if resuming and (null_phase or after_time is not None) else None
+
+        while True:
+            size = chunk_size if limit is None else min(chunk_size, limit - emitted)
+            if size <= 0:
+                return
+            stmt = select(model).where(model.user_id == user_id)
+            if null_phase:
+                stmt = stmt.where(time_column.is_(None))
+                if position is not None:
+                    stmt = stmt.where(model.id > position[1])
+                stmt = stmt.order_by(model.id)
+            else:
+                stmt = stmt.where(time_column.isnot(None))
+                if since is not None:
+                    stmt = stmt.where(time_column >= since)
+                if position is not None:
+                    stmt = stmt.where(tuple_(time_column, model.id) > tuple_(*position))
+                stmt = stmt.order_by(time_column, model.id)
+            async with session_factory() as db:
+                rows = (await db.scalars(stmt.limit(size))).all()
+
+            for row in rows:
+                record = serialize(row)
+                record["type"] = record_type
+                yield record
+            emitted += len(rows)
+            if len(rows) < size:
+                if not null_phase:
+                    break
+                null_phase = False
+                position = None
+                continue
+            position = (getattr(rows[-1], time_attr), rows[-1].id)
+
+
+async def ndjson_export(user_id: str, since: Optional[datetime] = None, cursor: Optional[str] = None,
+                        limit: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Header line, one line per record, then a trailer carrying the cursor for the next page"""
+    header = {
+        "type": "export",
+        "user_id": user_id,
+        "since": _isoformat(since),
+        "cursor": cursor,
+        "export_timestamp": datetime.now().isoformat()
+    }
+    buffer = [json.dumps(header)]
+    size = 0
+    total = 0
+    last = None
+    complete = True
+
+    # One record past the page tells whether another page exists
+    records = iter_export_records(user_id, since, cursor, None if limit is None else limit + 1)
+    try:
+        async for record in records:
+            if limit is not None and total == limit:
+                complete = False
+                break
+            line = json.dumps(record, default=str)
+            buffer.append(line)
+            size += len(line)
+            total += 1
+            last = record
+            if size >= EXPORT_FLUSH_BYTES:
+                yield ("\n".join(buffer) + "\n").encode("utf-8")
+                buffer, size = [], 0
+    finally:
+        await records.aclose()
+
+    next_cursor = None
+    if not complete and last is not None:
+        time_attr = EXPORT_TABLES[RECORD_TYPES.index(last["type"])][2]
+        next_cursor = make_cursor(last["type"], last[time_attr], last["id"])
+    buffer.append(json.dumps({"type": "end", "total_records": total, "complete": complete,
+                              "next_cursor": next_cursor}))
+    yield ("\n".join(buffer) + "\n").encode("utf-8")
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a byte stream into a single gzip member as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
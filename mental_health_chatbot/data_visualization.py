@@ -1,3 +1,5 @@
+import matplotlib
+matplotlib.use("Agg")  # Non-interactive backend; charts are only rendered to PNG
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
@@ -5,239 +7,335 @@ import numpy as np
 from datetime import datetime, timedelta
 import base64
 import io
-from typing import List, Dict, Tuple
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Dict, Tuple
 from sqlalchemy.orm import Session
-from database import MoodEntry, ChatMessage
+from database import MoodEntry, ChatMessage, DEFAULT_USER_ID
+from chart_cache import chart_cache
+from analytics_series import WEEKDAY_ORDER, fetch_mood_rows, parse_emotions
+from metrics import metrics
 import json
 
+# Report rendering settings
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+CHART_DPI = {"full": 300, "preview": int(os.getenv("CHART_PREVIEW_DPI", "100"))}
+
+# pyplot keeps the current figure in global state; charts rendered in request threads take turns
+_pyplot_lock = threading.Lock()
+
+# Cache misses only; cached charts never reach the renderer
+CHART_RENDER_SECONDS = metrics.histogram(
+    "chatbot_chart_render_seconds", "Time to render a chart or report, excluding the database query", ["chart"]
+)
+
+
+def _apply_style():
+    plt.style.use('seaborn-v0_8')
+    sns.set_palette("husl")
+
+
+def render_mood_trend(rows: List[Dict[str, Any]], days: int, dpi: int = 300) -> str:
+    """Render mood trend line chart from mood rows ordered by date"""
+    if not rows:
+        return render_no_data("No mood data available for the selected period", dpi)
+
+    # Prepare data
+    dates = [row["date"].date() for row in rows]
+    ratings = [row["mood_rating"] for row in rows]
+
+    # Create figure
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    # Plot mood trend
+    ax.plot(dates, ratings, marker='o', linewidth=2, markersize=6)
+    ax.fill_between(dates, ratings, alpha=0.3)
+
+    # Customize chart
+    ax.set_title(f'Mood Trend - Last {days} Days', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Mood Rating (1-10)', fontsize=12)
+    ax.set_ylim(1, 10)
+    ax.grid(True, alpha=0.3)
+
+    # Rotate x-axis labels
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+    return figure_to_base64(fig, dpi)
+
+
+def render_emotion_distribution(rows: List[Dict[str, Any]], days: int, dpi: int = 300) -> str:
+    """Render emotion distribution pie chart from mood rows"""
+    rows = [row for row in rows if row["detected_emotions"] is not None]
+    if not rows:
+        return render_no_data("No emotion data available", dpi)
+
+    # Aggregate emotions
+    emotion_totals = {}
+    for row in rows:
+        for emotion, score in parse_emotions(row["detected_emotions"]).items():
+            emotion_totals[emotion] = emotion_totals.get(emotion, 0) + score
+
+    # Get top 8 emotions
+    top_emotions = dict(sorted(emotion_totals.items(), key=lambda x: x[1], reverse=True)[:8])
+
+    if not top_emotions:
+        return render_no_data("No emotion data to display", dpi)
+
+    # Create pie chart
+    fig, ax = plt.subplots(figsize=(10, 8))
+
+    colors = plt.cm.Set3(np.linspace(0, 1, len(top_emotions)))
+    wedges, texts, autotexts = ax.pie(
+        top_emotions.values(),
+        labels=top_emotions.keys(),
+        autopct='%1.1f%%',
+        colors=colors,
+        startangle=90
+    )
+
+    ax.set_title(f'Emotion Distribution - Last {days} Days', fontsize=16, fontweight='bold')
+
+    # Improve text readability
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+
+    plt.tight_layout()
+    return figure_to_base64(fig, dpi)
+
+
+def render_weekly_heatmap(rows: List[Dict[str, Any]], weeks: int, dpi: int = 300) -> str:
+    """Render weekday x week heatmap of average mood from mood rows"""
+    if not rows:
+        return render_no_data("No mood data available for heatmap", dpi)
+
+    # Create DataFrame
+    df = pd.DataFrame([
+        {
+            'date': row["date"].date(),
+            'weekday': row["date"].strftime('%A'),
+            'week': row["date"].isocalendar()[1],
+            'mood': row["mood_rating"]
+        }
+        for row in rows
+    ])
+
+    # Pivot for heatmap
+    heatmap_data = df.pivot_table(
+        values='mood',
+        index='weekday',
+        columns='week',
+        aggfunc='mean'
+    )
+
+    # Reorder weekdays
+    heatmap_data = heatmap_data.reindex(WEEKDAY_ORDER)
+
+    # Create heatmap
+    fig, ax = plt.subplots(figsize=(14, 6))
+
+    sns.heatmap(
+        heatmap_data,
+        annot=True,
+        cmap='RdYlGn',
+        center=5.5,
+        vmin=1,
+        vmax=10,
+        ax=ax,
+        cbar_kws={'label': 'Average Mood Rating'}
+    )
+
+    ax.set_title(f'Weekly Mood Heatmap - Last {weeks} Weeks', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Week Number', fontsize=12)
+    ax.set_ylabel('Day of Week', fontsize=12)
+
+    plt.tight_layout()
+    return figure_to_base64(fig, dpi)
+
+
+def render_mood_emotion_correlation(rows: List[Dict[str, Any]], dpi: int = 300) -> str:
+    """Render correlation matrix between mood ratings and emotions from mood rows"""
+    rows = [row for row in rows if row["detected_emotions"] is not None]
+    if not rows:
+        return render_no_data("No data available for correlation analysis", dpi)
+
+    # Prepare data
+    data_for_correlation = []
+    for row in rows:
+        data = {'mood_rating': row["mood_rating"]}
+        data.update(parse_emotions(row["detected_emotions"]))
+        data_for_correlation.append(data)
+
+    df = pd.DataFrame(data_for_correlation)
+
+    # Select top emotions by variance
+    emotion_cols = [col for col in df.columns if col != 'mood_rating']
+    emotion_variances = df[emotion_cols].var().sort_values(ascending=False)
+    top_emotions = emotion_variances.head(6).index.tolist()
+
+    # Create correlation matrix
+    correlation_data = df[['mood_rating'] + top_emotions].corr()
+
+    # Create heatmap
+    fig, ax = plt.subplots(figsize=(10, 8))
+
+    sns.heatmap(
+        correlation_data,
+        annot=True,
+        cmap='coolwarm',
+        center=0,
+        ax=ax,
+        square=True
+    )
+
+    ax.set_title('Mood-Emotion Correlation Matrix', fontsize=16, fontweight='bold')
+    plt.tight_layout()
+
+    return figure_to_base64(fig, dpi)
+
+
+def render_no_data(message: str, dpi: int = 300) -> str:
+    """Render a chart showing no data message"""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.text(0.5, 0.5, message, fontsize=16, ha='center', va='center', transform=ax.transAxes)
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.axis('off')
+    return figure_to_base64(fig, dpi)
+
+
+def figure_to_base64(fig, dpi: int = 300) -> str:
+    """Convert matplotlib figure to base64 string"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    buffer.seek(0)
+    image_base64 = base64.b64encode(buffer.getvalue()).decode()
+    plt.close(fig)  # Close figure to free memory
+    return image_base64
+
+
+def _render_report_chart(chart: str, rows: List[Dict[str, Any]], days: int, weeks: int, dpi: int) -> str:
+    """Render one report chart; module-level so it can run in a worker process"""
+    if chart == "mood_trend":
+        return render_mood_trend(rows, days, dpi)
+    if chart == "emotion_distribution":
+        return render_emotion_distribution(rows, days, dpi)
+    if chart == "weekly_heatmap":
+        return render_weekly_heatmap(rows, weeks, dpi)
+    return render_mood_emotion_correlation(rows, dpi)
+
+
 class DataVisualizer:
     def __init__(self):
         # Set style
-        plt.style.use('seaborn-v0_8')
-        sns.set_palette("husl")
-        
-    def create_mood_trend_chart(self, db: Session, days: int = 30) -> str:
+        _apply_style()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def create_mood_trend_chart(self, db: Session, days: int = 30, user_id: str = DEFAULT_USER_ID) -> str:
         """Create mood trend chart for the last N days"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Query mood entries
-        mood_entries = db.query(MoodEntry).filter(
-            MoodEntry.date >= start_date,
-            MoodEntry.date <= end_date
-        ).order_by(MoodEntry.date).all()
-        
-        if not mood_entries:
-            return self._create_no_data_chart("No mood data available for the selected period")
-        
-        # Prepare data
-        dates = [entry.date.date() for entry in mood_entries]
-        ratings = [entry.mood_rating for entry in mood_entries]
-        
-        # Create figure
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        # Plot mood trend
-        ax.plot(dates, ratings, marker='o', linewidth=2, markersize=6)
-        ax.fill_between(dates, ratings, alpha=0.3)
-        
-        # Customize chart
-        ax.set_title(f'Mood Trend - Last {days} Days', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Date', fontsize=12)
-        ax.set_ylabel('Mood Rating (1-10)', fontsize=12)
-        ax.set_ylim(1, 10)
-        ax.grid(True, alpha=0.3)
-        
-        # Rotate x-axis labels
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        return self._save_plot_as_base64(fig)
-    
-    def create_emotion_distribution_chart(self, db: Session, days: int = 30) -> str:
+        return chart_cache.get_or_render(
+            "mood_trend", {"days": days, "user_id": user_id},
+            lambda: self._render("mood_trend", render_mood_trend, self._fetch_days(db, days, user_id), days)
+        )
+
+    def create_emotion_distribution_chart(self, db: Session, days: int = 30, user_id: str = DEFAULT_USER_ID) -> str:
         """Create emotion distribution pie chart"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Query entries with emotions
-        entries = db.query(MoodEntry).filter(
-            MoodEntry.date >= start_date,
-            MoodEntry.date <= end_date,
-            MoodEntry.detected_emotions.isnot(None)
-        ).all()
-        
-        if not entries:
-            return self._create_no_data_chart("No emotion data available")
-        
-        # Aggregate emotions
-        emotion_totals = {}
-        for entry in entries:
-            if entry.detected_emotions:
-                emotions = json.loads(entry.detected_emotions) if isinstance(entry.detected_emotions, str) else entry.detected_emotions
-                for emotion, score in emotions.items():
-                    emotion_totals[emotion] = emotion_totals.get(emotion, 0) + score
-        
-        # Get top 8 emotions
-        top_emotions = dict(sorted(emotion_totals.items(), key=lambda x: x[1], reverse=True)[:8])
-        
-        if not top_emotions:
-            return self._create_no_data_chart("No emotion data to display")
-        
-        # Create pie chart
-        fig, ax = plt.subplots(figsize=(10, 8))
-        
-        colors = plt.cm.Set3(np.linspace(0, 1, len(top_emotions)))
-        wedges, texts, autotexts = ax.pie(
-            top_emotions.values(), 
-            labels=top_emotions.keys(),
-            autopct='%1.1f%%',
-            colors=colors,
-            startangle=90
+        return chart_cache.get_or_render(
+            "emotion_distribution", {"days": days, "user_id": user_id},
+            lambda: self._render("emotion_distribution", render_emotion_distribution,
+                                 self._fetch_days(db, days, user_id), days)
         )
-        
-        ax.set_title(f'Emotion Distribution - Last {days} Days', fontsize=16, fontweight='bold')
-        
-        # Improve text readability
-        for autotext in autotexts:
-            autotext.set_color('white')
-            autotext.set_fontweight('bold')
-        
-        plt.tight_layout()
-        return self._save_plot_as_base64(fig)
-    
-    def create_weekly_mood_heatmap(self, db: Session, weeks: int = 12) -> str:
+
+    def create_weekly_mood_heatmap(self, db: Session, weeks: int = 12, user_id: str = DEFAULT_USER_ID) -> str:
         """Create weekly mood heatmap"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(weeks=weeks)
-        
-        # Query mood entries
-        mood_entries = db.query(MoodEntry).filter(
-            MoodEntry.date >= start_date,
-            MoodEntry.date <= end_date
-        ).all()
-        
-        if not mood_entries:
-            return self._create_no_data_chart("No mood data available for heatmap")
-        
-        # Create DataFrame
-        df = pd.DataFrame([
-            {
-                'date': entry.date.date(),
-                'weekday': entry.date.strftime('%A'),
-                'week': entry.date.isocalendar()[1],
-                'mood': entry.mood_rating
-            }
-            for entry in mood_entries
-        ])
-        
-        # Pivot for heatmap
-        heatmap_data = df.pivot_table(
-            values='mood', 
-            index='weekday', 
-            columns='week', 
-            aggfunc='mean'
+        return chart_cache.get_or_render(
+            "weekly_heatmap", {"weeks": weeks, "user_id": user_id},
+            lambda: self._render("weekly_heatmap", render_weekly_heatmap,
+                                 self._fetch_days(db, weeks * 7, user_id), weeks)
         )
-        
-        # Reorder weekdays
-        weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        heatmap_data = heatmap_data.reindex(weekday_order)
-        
-        # Create heatmap
-        fig, ax = plt.subplots(figsize=(14, 6))
-        
-        sns.heatmap(
-            heatmap_data, 
-            annot=True, 
-            cmap='RdYlGn', 
-            center=5.5,
-            vmin=1, 
-            vmax=10,
-            ax=ax,
-            cbar_kws={'label': 'Average Mood Rating'}
-        )
-        
-        ax.set_title(f'Weekly Mood Heatmap - Last {weeks} Weeks', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Week Number', fontsize=12)
-        ax.set_ylabel('Day of Week', fontsize=12)
-        
-        plt.tight_layout()
-        return self._save_plot_as_base64(fig)
-    
-    def create_mood_emotion_correlation(self, db: Session, days: int = 30) -> str:
+
+    def create_mood_emotion_correlation(self, db: Session, days: int = 30, user_id: str = DEFAULT_USER_ID) -> str:
         """Create correlation chart between mood ratings and emotions"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        entries = db.query(MoodEntry).filter(
-            MoodEntry.date >= start_date,
-            MoodEntry.date <= end_date,
-            MoodEntry.detected_emotions.isnot(None)
-        ).all()
-        
-        if not entries:
-            return self._create_no_data_chart("No data available for correlation analysis")
-        
-        # Prepare data
-        data_for_correlation = []
-        for entry in entries:
-            emotions = json.loads(entry.detected_emotions) if isinstance(entry.detected_emotions, str) else entry.detected_emotions
-            row = {'mood_rating': entry.mood_rating}
-            row.update(emotions)
-            data_for_correlation.append(row)
-        
-        df = pd.DataFrame(data_for_correlation)
-        
-        # Select top emotions by variance
-        emotion_cols = [col for col in df.columns if col != 'mood_rating']
-        emotion_variances = df[emotion_cols].var().sort_values(ascending=False)
-        top_emotions = emotion_variances.head(6).index.tolist()
-        
-        # Create correlation matrix
-        correlation_data = df[['mood_rating'] + top_emotions].corr()
-        
-        # Create heatmap
-        fig, ax = plt.subplots(figsize=(10, 8))
-        
-        sns.heatmap(
-            correlation_data,
-            annot=True,
-            cmap='coolwarm',
-            center=0,
-            ax=ax,
-            square=True
+        return chart_cache.get_or_render(
+            "mood_emotion_correlation", {"days": days, "user_id": user_id},
+            lambda: self._render("mood_emotion_correlation", render_mood_emotion_correlation,
+                                 self._fetch_days(db, days, user_id))
         )
-        
-        ax.set_title('Mood-Emotion Correlation Matrix', fontsize=16, fontweight='bold')
-        plt.tight_layout()
-        
-        return self._save_plot_as_base64(fig)
-    
-    def _create_no_data_chart(self, message: str) -> str:
-        """Create a chart showing no data message"""
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.text(0.5, 0.5, message, fontsize=16, ha='center', va='center', transform=ax.transAxes)
-        ax.set_xlim(0, 1)
-        ax.set_ylim(0, 1)
-        ax.axis('off')
-        return self._save_plot_as_base64(fig)
-    
-    def _save_plot_as_base64(self, fig) -> str:
-        """Convert matplotlib figure to base64 string"""
-        buffer = io.BytesIO()
-        fig.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close(fig)  # Close figure to free memory
-        return image_base64
-    
-    def generate_comprehensive_report(self, db: Session, days: int = 30) -> Dict[str, str]:
+
+    def _render(self, chart: str, render, *args) -> str:
+        with _pyplot_lock, CHART_RENDER_SECONDS.time(chart):
+            return render(*args)
+
+    def _fetch_days(self, db: Session, days: int, user_id: str) -> List[Dict[str, Any]]:
+        end_date = datetime.now()
+        return fetch_mood_rows(db, end_date - timedelta(days=days), end_date, user_id)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn keeps workers independent of the server's threads on every platform
+                self._pool = ProcessPoolExecutor(
+                    max_workers=REPORT_RENDER_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_apply_style
+                )
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def generate_comprehensive_report(self, db: Session, days: int = 30, quality: str = "full",
+                                      user_id: str = DEFAULT_USER_ID) -> Dict[str, str]:
         """Generate comprehensive visual report"""
-        return {
-            "mood_trend": self.create_mood_trend_chart(db, days),
-            "emotion_distribution": self.create_emotion_distribution_chart(db, days),
-            "weekly_heatmap": self.create_weekly_mood_heatmap(db, min(days//7, 12)),
-            "mood_emotion_correlation": self.create_mood_emotion_correlation(db, days)
+        if quality not in CHART_DPI:
+            raise ValueError(f"Unknown report quality '{quality}', expected one of {list(CHART_DPI)}")
+        return chart_cache.get_or_render(
+            "comprehensive_report", {"days": days, "quality": quality, "user_id": user_id},
+            lambda: self._render_comprehensive_report(db, days, CHART_DPI[quality], user_id)
+        )
+
+    def _render_comprehensive_report(self, db: Session, days: int, dpi: int, user_id: str) -> Dict[str, str]:
+        """Fetch the window once and render the four charts in parallel worker processes"""
+        end_date = datetime.now()
+        weeks = min(days // 7, 12)
+        rows = fetch_mood_rows(db, end_date - timedelta(days=days), end_date, user_id)
+        with CHART_RENDER_SECONDS.time("comprehensive_report"):
+            return self._render_report_charts(rows, end_date, days, weeks, dpi)
+
+    def _render_report_charts(self, rows: List[Dict[str, Any]], end_date: datetime, days: int, weeks: int,
+                              dpi: int) -> Dict[str, str]:
+        heatmap_start = end_date - timedelta(weeks=weeks)
+        chart_rows = {
+            "mood_trend": rows,
+            "emotion_distribution": rows,
+            "weekly_heatmap": [row for row in rows if row["date"] >= heatmap_start],
+            "mood_emotion_correlation": rows,
         }
 
+        try:
+            pool = self._get_pool()
+            futures = {
+                chart: pool.submit(_render_report_chart, chart, chart_rows[chart], days, weeks, dpi)
+                for chart in chart_rows
+            }
+            return {chart: future.result() for chart, future in futures.items()}
+        except Exception as e:
+            # A broken worker pool should not take the analytics page down
+            print(f"Parallel report rendering failed, rendering inline: {e}")
+            self.shutdown()
+            with _pyplot_lock:
+                return {
+                    chart: _render_report_chart(chart, chart_rows[chart], days, weeks, dpi)
+                    for chart in chart_rows
+                }
+
 # Global visualizer instance
 data_visualizer = DataVisualizer()
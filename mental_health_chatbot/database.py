@@ -1,49 +1,461 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, JSON
+from sqlalchemy import (create_engine, event, update, delete, select, inspect, func, and_, or_, true,
+                        Column, Integer, String, Text, Date, DateTime, Float, JSON, Index)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.orm import column_property, sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from datetime import date, datetime, timedelta
 import json
+import os
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
 
 # Database setup
 SQLITE_DATABASE_URL = "sqlite:///./mental_health.db"
-engine = create_engine(SQLITE_DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("DATABASE_URL", SQLITE_DATABASE_URL)
+# Async driver URL; derived from DATABASE_URL (aiosqlite / asyncpg) unless set explicitly
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+# Sync driver -> async driver used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+# Connection pools; the read pool serves analytics so long scans never hold a writer's connection
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# SQLite pragmas applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_file_sqlite(url: str) -> bool:
+    database = make_url(url).database
+    return is_sqlite(url) and bool(database) and database != ":memory:" and not database.startswith("file::memory:")
+
+
+def _sqlite_pragmas(read_only: bool = False):
+    """Connect-event hook that tunes each new SQLite connection"""
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        # journal_mode is persistent in the file, but setting it again is cheap and keeps fresh files right
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return apply
+
+
+def create_db_engine(url: str = DATABASE_URL, read_only: bool = False, pool_size: int = DB_POOL_SIZE):
+    """Build a pooled engine; SQLite file databases get WAL and the tuning pragmas"""
+    if not is_sqlite(url):
+        return create_engine(url, pool_size=pool_size, max_overflow=DB_MAX_OVERFLOW,
+                             pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    if not _is_file_sqlite(url):
+        # In-memory databases live in a single connection and cannot use WAL
+        return create_engine(url, connect_args={"check_same_thread": False})
+
+    db_engine = create_engine(
+        url,
+        # The driver's own lock wait; busy_timeout below covers the same for the pragma path
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=pool_size,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+    event.listen(db_engine, "connect", _sqlite_pragmas(read_only))
+    return db_engine
+
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver of a database URL for its asyncio counterpart"""
+    parsed = make_url(url)
+    if parsed.get_dialect().is_async:
+        return url
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{backend}'; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str, read_only: bool = False, pool_size: int = DB_POOL_SIZE):
+    """Async counterpart of create_db_engine with the same pooling and SQLite pragmas"""
+    if not is_sqlite(url):
+        return create_async_engine(url, pool_size=pool_size, max_overflow=DB_MAX_OVERFLOW,
+                                   pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    if not _is_file_sqlite(url):
+        return create_async_engine(url)
+
+    db_engine = create_async_engine(
+        url,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+    # Connection events fire on the sync facade of the async engine
+    event.listen(db_engine.sync_engine, "connect", _sqlite_pragmas(read_only))
+    return db_engine
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Read-only analytics sessions use their own pool; in WAL mode they read a snapshot without blocking writers
+read_engine = create_db_engine(read_only=True, pool_size=DB_READ_POOL_SIZE) if _is_file_sqlite(DATABASE_URL) else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
+# Emotion scores are plain JSON on SQLite and indexable binary JSON on PostgreSQL
+EmotionScores = JSON().with_variant(JSONB(), "postgresql")
+
+# Owner of rows written before multi-user support and of requests without a user header
+DEFAULT_USER_ID = "default_user"
+
 # Database Models
 class MoodEntry(Base):
     __tablename__ = "mood_entries"
-    
+    # Every window query filters by user first, then by date range
+    __table_args__ = (Index("ix_mood_entries_user_date", "user_id", "date"),)
+
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, default="default_user")  # For future multi-user support
-    date = Column(DateTime, default=datetime.utcnow)
+    # Old values are loaded before a change, even on expired objects, so rollups can fix the day an entry left
+    user_id = column_property(Column(String, default=DEFAULT_USER_ID, nullable=False), active_history=True)
+    date = column_property(Column(DateTime, default=datetime.utcnow), active_history=True)
     mood_text = Column(Text)
     mood_rating = Column(Integer)  # 1-10 scale
-    detected_emotions = Column(JSON)  # Store emotion detection results
+    detected_emotions = Column(EmotionScores)  # Store emotion detection results
     entry_type = Column(String, default="text")  # "text" or "voice"
     
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
-    
+    __table_args__ = (Index("ix_chat_messages_user_timestamp", "user_id", "timestamp"),)
+
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, default="default_user")
+    user_id = Column(String, default=DEFAULT_USER_ID, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
     role = Column(String)  # "user" or "bot"
     content = Column(Text)
-    detected_emotions = Column(JSON)
+    detected_emotions = Column(EmotionScores)
     
 class SelfHelpActivity(Base):
     __tablename__ = "self_help_activities"
-    
+    __table_args__ = (Index("ix_self_help_activities_user_timestamp", "user_id", "timestamp"),)
+
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, default="default_user")
+    user_id = Column(String, default=DEFAULT_USER_ID, nullable=False)
     activity_type = Column(String)  # "breathing", "affirmation", "cbt"
     timestamp = Column(DateTime, default=datetime.utcnow)
     duration_seconds = Column(Integer)
     completion_rating = Column(Integer)  # 1-5 how helpful it was
 
+class DailyMoodRollup(Base):
+    """Per-user, per-day mood aggregates kept in step with mood_entries"""
+    __tablename__ = "daily_mood_rollups"
+
+    user_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0)
+    rating_sq_sum = Column(Float, nullable=False, default=0)
+
+class DailyEmotionRollup(Base):
+    """Per-user, per-day sum of each detected emotion's score"""
+    __tablename__ = "daily_emotion_rollups"
+
+    user_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    emotion = Column(String, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)  # entries in which the emotion was detected
+    score_sum = Column(Float, nullable=False, default=0)
+
+# (user_id, day) -> [entry_count, rating_count, rating_sum, rating_sq_sum]
+MoodAggregates = Dict[Tuple[str, date], list]
+# (user_id, day, emotion) -> [entry_count, score_sum]
+EmotionAggregates = Dict[Tuple[str, date, str], list]
+
+def parse_emotion_scores(detected_emotions) -> Dict[str, float]:
+    """Emotion scores from any stored shape: dict, JSON string, or a bare list of names"""
+    if not detected_emotions:
+        return {}
+    if isinstance(detected_emotions, str):
+        try:
+            detected_emotions = json.loads(detected_emotions)
+        except ValueError:
+            return {detected_emotions: 0.0}
+    if isinstance(detected_emotions, list):
+        return {str(name): 0.0 for name in detected_emotions}
+    return {name: float(score or 0) for name, score in detected_emotions.items()}
+
+def aggregate_mood_rows(rows: Iterable[tuple]) -> Tuple[MoodAggregates, EmotionAggregates]:
+    """Fold (user_id, date, mood_rating, detected_emotions) rows into daily aggregates"""
+    moods: MoodAggregates = {}
+    emotions: EmotionAggregates = {}
+    for user_id, entry_date, rating, detected_emotions in rows:
+        if entry_date is None:
+            continue  # An entry without a date belongs to no day
+        day = entry_date.date() if isinstance(entry_date, datetime) else entry_date
+        mood = moods.setdefault((user_id, day), [0, 0, 0.0, 0.0])
+        mood[0] += 1
+        if rating is not None:
+            mood[1] += 1
+            mood[2] += rating
+            mood[3] += rating * rating
+        for emotion, score in parse_emotion_scores(detected_emotions).items():
+            totals = emotions.setdefault((user_id, day, emotion), [0, 0.0])
+            totals[0] += 1
+            totals[1] += score
+    return moods, emotions
+
+def _increment(conn, table, key_columns: Tuple[str, ...], value_columns: Tuple[str, ...], rows: list):
+    """Add rows onto existing rollup rows, inserting the ones that do not exist yet"""
+    if not rows:
+        return
+    dialect_insert = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}.get(conn.dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + stmt.excluded[column] for column in value_columns}
+        )
+        conn.execute(stmt, rows)
+        return
+    for row in rows:
+        where = and_(*(table.c[column] == row[column] for column in key_columns))
+        updated = conn.execute(
+            update(table).where(where).values({column: table.c[column] + row[column] for column in value_columns})
+        )
+        if updated.rowcount == 0:
+            conn.execute(table.insert().values(row))
+
+def add_to_rollups(conn, moods: MoodAggregates, emotions: EmotionAggregates):
+    _increment(conn, DailyMoodRollup.__table__, ("user_id", "day"),
+               ("entry_count", "rating_count", "rating_sum", "rating_sq_sum"), [
+        {"user_id": user_id, "day": day, "entry_count": v[0], "rating_count": v[1],
+         "rating_sum": v[2], "rating_sq_sum": v[3]}
+        for (user_id, day), v in moods.items()
+    ])
+    _increment(conn, DailyEmotionRollup.__table__, ("user_id", "day", "emotion"),
+               ("entry_count", "score_sum"), [
+        {"user_id": user_id, "day": day, "emotion": emotion, "entry_count": v[0], "score_sum": v[1]}
+        for (user_id, day, emotion), v in emotions.items()
+    ])
+
+def rebuild_rollups(conn, days: Optional[Set[Tuple[str, date]]] = None, user_id: Optional[str] = None,
+                    chunk_size: int = 5000) -> int:
+    """Recompute rollups from mood_entries for the given (user_id, day) pairs, one user, or everything"""
+    entries = MoodEntry.__table__
+    rollup_tables = (DailyMoodRollup.__table__, DailyEmotionRollup.__table__)
+    if days is not None:
+        if not days:
+            return 0
+        day_filter = lambda table: or_(*(and_(table.c.user_id == u, table.c.day == d) for u, d in days))
+        entry_filter = or_(*(
+            and_(entries.c.user_id == u, entries.c.date >= datetime.combine(d, datetime.min.time()),
+                 entries.c.date < datetime.combine(d + timedelta(days=1), datetime.min.time()))
+            for u, d in days
+        ))
+    elif user_id is not None:
+        day_filter = lambda table: table.c.user_id == user_id
+        entry_filter = entries.c.user_id == user_id
+    else:
+        day_filter = lambda table: true()
+        entry_filter = true()
+
+    for table in rollup_tables:
+        conn.execute(delete(table).where(day_filter(table)))
+
+    result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+        select(entries.c.user_id, entries.c.date, entries.c.mood_rating, entries.c.detected_emotions)
+        .where(entry_filter)
+        .order_by(entries.c.user_id, entries.c.date)
+    )
+    # Partial aggregates are added onto the emptied rollups, so memory stays at one chunk
+    processed = 0
+    for chunk in result.partitions():
+        processed += len(chunk)
+        add_to_rollups(conn, *aggregate_mood_rows(chunk))
+    return processed
+
+def migrate_schema(bind=None):
+    """Bring databases created before multi-user support up to date; safe to run repeatedly"""
+    bind = bind if bind is not None else engine
+    with bind.begin() as conn:
+        for model in (MoodEntry, ChatMessage, SelfHelpActivity):
+            # Rows from the single-user era belong to the default user
+            conn.execute(
+                update(model.__table__)
+                .where(model.__table__.c.user_id.is_(None))
+                .values(user_id=DEFAULT_USER_ID)
+            )
+            # create_all() does not add indexes to tables that already exist
+            for index in model.__table__.indexes:
+                index.create(conn, checkfirst=True)
+
+        # Databases that predate the rollup tables get them filled once
+        has_rollups = conn.execute(select(DailyMoodRollup.user_id).limit(1)).first() is not None
+        has_entries = conn.execute(select(MoodEntry.id).limit(1)).first() is not None
+        if has_entries and not has_rollups:
+            print("Backfilling daily mood rollups...")
+            print(f"Rolled up {rebuild_rollups(conn)} mood entries")
+
 # Create tables
 Base.metadata.create_all(bind=engine)
+migrate_schema()
+
+class DataVersion:
+    """Per-user counters advanced after every commit that changes a user's rows; used to invalidate derived caches
+
+    The counters live in this process only: commits made by other processes never advance them.
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self._values: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def value(self, user_id: str) -> int:
+        return self._values.get(user_id, 0)
+
+    def bump(self, user_ids: Iterable[str]):
+        with self._lock:
+            for user_id in user_ids:
+                self._values[user_id] = self._values.get(user_id, 0) + 1
+
+    def total(self) -> int:
+        """Commits seen across all users, for stats"""
+        with self._lock:
+            return sum(self._values.values())
+
+mood_data_version = DataVersion(MoodEntry.__tablename__)
+
+# Session.info key: users whose mood entries changed in the current transaction
+_MOOD_CHANGED = "mood_entries_changed"
+
+def _mark_changed(session, users: Iterable[str]):
+    session.info.setdefault(_MOOD_CHANGED, set()).update(user for user in users if user is not None)
+
+def _entry_users(entry: MoodEntry) -> Set[str]:
+    """Users an entry belongs to now and belonged to before this flush"""
+    return set(inspect(entry).attrs.user_id.history.deleted or ()) | {entry.user_id}
+
+@event.listens_for(Session, "after_flush")
+def _track_mood_entry_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, MoodEntry):
+            _mark_changed(session, _entry_users(obj))
+
+def _users_where(conn, criteria) -> Set[str]:
+    return set(conn.execute(select(MoodEntry.user_id).where(criteria).distinct()).scalars())
+
+def _users_of_ids(conn, ids: list, chunk_size: int = 500) -> Set[str]:
+    users: Set[str] = set()
+    for start in range(0, len(ids), chunk_size):
+        users |= _users_where(conn, MoodEntry.id.in_(ids[start:start + chunk_size]))
+    return users
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_mood_entry_bulk(orm_execute_state):
+    # Bulk query(...).update()/delete() and ORM insert()/update()/delete() statements skip the flush,
+    # so the rollups of every user they touch are recomputed here, in the same transaction
+    if orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not MoodEntry:
+        return
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+
+    conn = orm_execute_state.session.connection()
+    statement = orm_execute_state.statement
+    parameters = orm_execute_state.parameters
+    if orm_execute_state.is_insert:
+        # Rows with higher ids than any seen before are the inserted ones
+        last_id = conn.execute(select(func.max(MoodEntry.id))).scalar() or 0
+        result = orm_execute_state.invoke_statement()
+        users = _users_where(conn, MoodEntry.id > last_id)
+    else:
+        if isinstance(parameters, list) and parameters and all("id" in row for row in parameters):
+            # Bulk UPDATE by primary key: one parameter set per row, no WHERE clause
+            criteria = MoodEntry.id.in_([row["id"] for row in parameters])
+        else:
+            criteria = statement.whereclause
+        if criteria is None:
+            # Whole-table statements: rebuilding everything is one pass instead of one per user
+            users = _users_where(conn, true())
+            result = orm_execute_state.invoke_statement()
+            if orm_execute_state.is_update:
+                users |= _users_where(conn, true())
+            rebuild_rollups(conn)
+            _mark_changed(orm_execute_state.session, users)
+            return result
+        ids, users = [], set()
+        for entry_id, user_id in conn.execute(select(MoodEntry.id, MoodEntry.user_id).where(criteria)):
+            ids.append(entry_id)
+            users.add(user_id)
+        result = orm_execute_state.invoke_statement()
+        if orm_execute_state.is_update:
+            # The update may have moved entries to another user
+            users |= _users_of_ids(conn, ids)
+
+    for user_id in sorted(users):
+        rebuild_rollups(conn, user_id=user_id)
+    _mark_changed(orm_execute_state.session, users)
+    return result
+
+def _entry_days(entry: MoodEntry) -> Set[Tuple[str, date]]:
+    """(user_id, day) pairs an entry belongs to now and belonged to before this flush"""
+    state = inspect(entry)
+    users = set(state.attrs.user_id.history.deleted or ()) | {entry.user_id}
+    dates = set(state.attrs.date.history.deleted or ()) | {entry.date}
+    return {(user, value.date()) for user in users for value in dates if user is not None and value is not None}
+
+@event.listens_for(Session, "after_flush")
+def _maintain_daily_rollups(session, flush_context):
+    # Runs inside the flush transaction, so rollups commit or roll back together with the entries
+    new_entries = [obj for obj in session.new if isinstance(obj, MoodEntry)]
+    changed_days: Set[Tuple[str, date]] = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, MoodEntry) and (obj in session.deleted or session.is_modified(obj)):
+            changed_days |= _entry_days(obj)
+    if not new_entries and not changed_days:
+        return
+
+    conn = session.connection()
+    if new_entries:
+        add_to_rollups(conn, *aggregate_mood_rows(
+            (entry.user_id, entry.date, entry.mood_rating, entry.detected_emotions) for entry in new_entries
+        ))
+    if changed_days:
+        # Edits and deletes are rare; recomputing the touched days is simpler than reversing them
+        rebuild_rollups(conn, days=changed_days)
+
+@event.listens_for(Session, "after_commit")
+def _bump_mood_data_version(session):
+    # Bump only after commit so readers never cache a render of uncommitted data under the new version
+    mood_data_version.bump(session.info.pop(_MOOD_CHANGED, ()))
+
+@event.listens_for(Session, "after_rollback")
+def _discard_mood_changes(session):
+    session.info.pop(_MOOD_CHANGED, None)
 
 # Database dependency
 def get_db():
@@ -52,3 +464,63 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Session for endpoints that only read; never commit through it"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_pool_stats():
+    """Checked-out and idle connections of the write and read pools"""
+    stats = {"url": make_url(DATABASE_URL).render_as_string(hide_password=True)}
+    for name, db_engine in (("write", engine), ("read", read_engine)):
+        pool = db_engine.pool
+        stats[name] = {"status": pool.status()}
+        if hasattr(pool, "checkedout"):
+            stats[name].update({"checked_out": pool.checkedout(), "idle": pool.checkedin(), "size": pool.size()})
+    return stats
+
+def dispose_engines():
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+
+# Async engines are built on first use so the sync-only scripts never need an async driver installed
+_async_sessions: Dict[bool, async_sessionmaker] = {}
+_async_lock = threading.Lock()
+
+def get_async_sessionmaker(read_only: bool = False) -> async_sessionmaker:
+    # Only SQLite files get a dedicated read pool, matching the sync engines
+    read_only = read_only and _is_file_sqlite(DATABASE_URL)
+    with _async_lock:
+        if read_only not in _async_sessions:
+            url = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+            pool_size = DB_READ_POOL_SIZE if read_only else DB_POOL_SIZE
+            _async_sessions[read_only] = async_sessionmaker(
+                bind=create_async_db_engine(url, read_only=read_only, pool_size=pool_size),
+                class_=AsyncSession,
+                autoflush=False,
+                # Objects stay readable after commit without an implicit (awaitable) refresh
+                expire_on_commit=False
+            )
+        return _async_sessions[read_only]
+
+async def get_async_db():
+    """Async counterpart of get_db for async def endpoints"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+async def get_async_read_db():
+    """Async counterpart of get_read_db; never commit through it"""
+    async with get_async_sessionmaker(read_only=True)() as db:
+        yield db
+
+async def dispose_async_engines():
+    with _async_lock:
+        sessions = list(_async_sessions.values())
+        _async_sessions.clear()
+    for session_factory in sessions:
+        await session_factory.kw["bind"].dispose()
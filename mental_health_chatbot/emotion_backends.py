@@ -0,0 +1,173 @@
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Where exported ONNX graphs are kept between restarts
+EMOTION_ONNX_DIR = os.getenv("EMOTION_ONNX_DIR", "./models/emotion_onnx")
+EMOTION_NUM_THREADS = int(os.getenv("EMOTION_NUM_THREADS", "0"))  # 0 lets the runtime decide
+
+BACKEND_NAMES = ["torch", "torch_int8", "onnx", "onnx_int8"]
+# PyTorch backend with the same precision, used when onnxruntime is not installed
+ONNX_FALLBACKS = {"onnx": "torch", "onnx_int8": "torch_int8"}
+
+
+class TorchBackend:
+    """fp32 PyTorch inference"""
+
+    name = "torch"
+    tensor_type = "pt"
+
+    def __init__(self, model):
+        import torch
+
+        if EMOTION_NUM_THREADS:
+            torch.set_num_threads(EMOTION_NUM_THREADS)
+        self.model = model.eval()
+
+    def logits(self, inputs) -> np.ndarray:
+        import torch
+
+        with torch.no_grad():
+            return self.model(**inputs).logits.numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch inference with Linear layers dynamically quantized to int8"""
+
+    name = "torch_int8"
+
+    def __init__(self, model):
+        import torch
+
+        quantized = torch.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized)
+
+
+class OnnxBackend:
+    """ONNX Runtime inference on an exported (optionally int8-quantized) graph"""
+
+    tensor_type = "np"
+
+    def __init__(self, model_path: str):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if EMOTION_NUM_THREADS:
+            options.intra_op_num_threads = EMOTION_NUM_THREADS
+        self.model_path = model_path
+        self.name = "onnx_int8" if model_path.endswith(".int8.onnx") else "onnx"
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+    def logits(self, inputs) -> np.ndarray:
+        feed = {
+            "input_ids": np.asarray(inputs["input_ids"], dtype=np.int64),
+            "attention_mask": np.asarray(inputs["attention_mask"], dtype=np.int64),
+        }
+        return self.session.run(["logits"], feed)[0]
+
+
+def _onnx_paths(model_name: str) -> Dict[str, str]:
+    base = os.path.join(EMOTION_ONNX_DIR, model_name.replace("/", "__"))
+    return {"fp32": base + ".onnx", "int8": base + ".int8.onnx"}
+
+
+def export_onnx(model_name: str, quantize: bool = False) -> str:
+    """Export the model to ONNX once (and quantize it) and return the graph path"""
+    paths = _onnx_paths(model_name)
+    target = paths["int8"] if quantize else paths["fp32"]
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(EMOTION_ONNX_DIR, exist_ok=True)
+    if not os.path.exists(paths["fp32"]):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        sample = tokenizer(["export sample text"], return_tensors="pt")
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            paths["fp32"],
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=14,
+        )
+        print(f"Exported emotion model to {paths['fp32']}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(paths["fp32"], paths["int8"], weight_type=QuantType.QInt8)
+        print(f"Quantized emotion model to {paths['int8']}")
+    return target
+
+
+def load_backend(kind: str, model_name: str):
+    """Create an inference backend by name"""
+    if kind not in BACKEND_NAMES:
+        raise ValueError(f"Unknown emotion backend '{kind}', expected one of {BACKEND_NAMES}")
+
+    if kind in ONNX_FALLBACKS:
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            fallback = ONNX_FALLBACKS[kind]
+            print(f"onnxruntime is not installed; using the '{fallback}' emotion backend instead of '{kind}'")
+            return load_backend(fallback, model_name)
+        return OnnxBackend(export_onnx(model_name, quantize=kind == "onnx_int8"))
+
+    from transformers import AutoModelForSequenceClassification
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    if kind == "torch_int8":
+        return QuantizedTorchBackend(model)
+    return TorchBackend(model)
+
+
+def sigmoid(logits: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-logits))
+
+
+def predict_probabilities(backend, tokenizer, texts: List[str], max_length: int = 512) -> np.ndarray:
+    """Tokenize a batch with padding and return per-label probabilities"""
+    inputs = tokenizer(texts, return_tensors=backend.tensor_type, padding=True, truncation=True, max_length=max_length)
+    return sigmoid(backend.logits(inputs))
+
+
+def compare_scores(expected: np.ndarray, actual: np.ndarray, labels: List[str], tolerance: float = 0.05,
+                   reference: str = "reference", candidate: str = "candidate") -> Dict[str, Any]:
+    """Compare two backends' probabilities for the same texts, one row per text"""
+    expected = np.asarray(expected)
+    actual = np.asarray(actual)
+    diff = np.abs(expected - actual)
+    top_label_agreement = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+    max_abs_diff = float(diff.max())
+    return {
+        "reference": reference,
+        "candidate": candidate,
+        "texts": len(expected),
+        "max_abs_diff": round(max_abs_diff, 5),
+        "mean_abs_diff": round(float(diff.mean()), 5),
+        "per_label_max_abs_diff": {label: round(float(diff[:, i].max()), 5) for i, label in enumerate(labels)},
+        "top_label_agreement": round(top_label_agreement, 4),
+        "passed": max_abs_diff <= tolerance,
+    }
+
+
+def check_parity(reference, candidate, tokenizer, texts: List[str], labels: List[str],
+                 tolerance: float = 0.05) -> Dict[str, Any]:
+    """Compare a candidate backend's scores against a reference backend"""
+    return compare_scores(
+        predict_probabilities(reference, tokenizer, texts),
+        predict_probabilities(candidate, tokenizer, texts),
+        labels, tolerance, reference.name, candidate.name
+    )
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# In-process tier limits; set EMOTION_CACHE_DB to a file path to keep results across restarts
+EMOTION_CACHE_ENABLED = os.getenv("EMOTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMOTION_CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "10000"))
+EMOTION_CACHE_TTL_SECONDS = float(os.getenv("EMOTION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+EMOTION_CACHE_DB = os.getenv("EMOTION_CACHE_DB", "")
+
+
+def normalize_text(text: str) -> str:
+    """Fold Unicode forms, case and whitespace so trivially different inputs share an entry"""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class _SQLiteTier:
+    """Persistent key/value store for warm results"""
+
+    PRUNE_EVERY = 500
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS emotion_cache ("
+            "key TEXT PRIMARY KEY, emotions TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT emotions, created_at FROM emotion_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key: str, emotions: Dict[str, float]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO emotion_cache (key, emotions, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(emotions), time.time())
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM emotion_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM emotion_cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM emotion_cache")
+            self._conn.commit()
+
+
+class EmotionCache:
+    """Memoize emotion scores by normalized text, model name and model version"""
+
+    def __init__(self, namespace: str, max_entries: int = EMOTION_CACHE_SIZE,
+                 ttl_seconds: float = EMOTION_CACHE_TTL_SECONDS, db_path: str = EMOTION_CACHE_DB):
+        self.namespace = namespace
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SQLiteTier(db_path, ttl_seconds) if db_path else None
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def make_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, memory_only: bool = False) -> Optional[Dict[str, float]]:
+        """Look up a result; memory_only skips the blocking persistent tier, for callers on the event loop"""
+        key = self.make_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                emotions, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return dict(emotions)
+                del self._entries[key]
+                self._stats["expirations"] += 1
+            if self._disk is None:
+                self._stats["misses"] += 1
+                return None
+
+        if memory_only:
+            return None  # Counted once get_persistent() has looked in the persistent tier
+        return self._get_persistent(key)
+
+    def get_persistent(self, text: str) -> Optional[Dict[str, float]]:
+        """Finish a memory_only miss in the persistent tier; blocking, so keep it off the event loop"""
+        if self._disk is None:
+            return None
+        return self._get_persistent(self.make_key(text))
+
+    def _get_persistent(self, key: str) -> Optional[Dict[str, float]]:
+        emotions = self._disk.get(key)
+        if emotions is not None:
+            self._store(key, emotions)
+            with self._lock:
+                self._stats["hits"] += 1
+                self._stats["disk_hits"] += 1
+            return dict(emotions)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, text: str, emotions: Dict[str, float]):
+        """Store a result in both tiers; blocking when the persistent tier is enabled"""
+        key = self.make_key(text)
+        self._store(key, emotions)
+        if self._disk is not None:
+            self._disk.put(key, emotions)
+
+    def _store(self, key: str, emotions: Dict[str, float]):
+        with self._lock:
+            self._entries[key] = (dict(emotions), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["namespace"] = self.namespace
+        stats["persistent"] = self._disk is not None
+        if self._disk is not None:
+            stats["persistent_size"] = self._disk.count()
+        return stats
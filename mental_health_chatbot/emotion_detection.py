@@ -1,52 +1,201 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Any
 import logging
+import asyncio
+import os
+import threading
+
+from batching import MicroBatcher
+from execution import ServiceOverloadedError, execution_pools
+from emotion_backends import load_backend, predict_probabilities
+from emotion_cache import EmotionCache, EMOTION_CACHE_ENABLED
+from metrics import MODEL_INFERENCE_SECONDS, MODEL_BATCH_SIZE
+
+# Micro-batching settings for concurrent requests
+EMOTION_BATCHING_ENABLED = os.getenv("EMOTION_BATCHING_ENABLED", "true").lower() in ("1", "true", "yes")
+EMOTION_BATCH_MAX_SIZE = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "16"))
+EMOTION_BATCH_WAIT_MS = float(os.getenv("EMOTION_BATCH_WAIT_MS", "10"))
+EMOTION_BATCH_MAX_PENDING = int(os.getenv("EMOTION_BATCH_MAX_PENDING", "256"))
+
+# Inference backend: torch, torch_int8, onnx or onnx_int8
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "torch")
+# Bump to invalidate cached results after changing model weights
+EMOTION_MODEL_VERSION = os.getenv("EMOTION_MODEL_VERSION", "1")
 
 class EmotionDetector:
-    def __init__(self):
+    def __init__(self, batching: bool = EMOTION_BATCHING_ENABLED, max_batch_size: int = EMOTION_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMOTION_BATCH_WAIT_MS, backend: str = EMOTION_BACKEND):
         self.model_name = "cardiffnlp/twitter-roberta-base-emotion-multilabel-latest"
+        self.backend_name = backend
         self.tokenizer = None
-        self.model = None
+        self.backend = None
         self.emotion_labels = ["anger", "anticipation", "disgust", "fear", "joy", "love", "optimism", "pessimism", "sadness", "surprise", "trust"]
-        self.load_model()
-    
+        self.max_batch_size = max_batch_size
+        self.batcher = MicroBatcher(
+            self._resolve_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_pending=EMOTION_BATCH_MAX_PENDING,
+            name="emotion-batcher"
+        ) if batching else None
+        # Results are keyed by model and backend so switching either never serves stale scores
+        self.cache = EmotionCache(
+            namespace=f"{self.model_name}:{EMOTION_MODEL_VERSION}:{backend}"
+        ) if EMOTION_CACHE_ENABLED else None
+        # The model is loaded by the API warm-up task; until then the keyword fallback is used
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.backend is not None
+
     def load_model(self):
         """Load the emotion detection model"""
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
-            print("Emotion detection model loaded successfully")
-        except Exception as e:
-            print(f"Error loading emotion model: {e}")
-            print("Using fallback emotion detection...")
-            self.model = None
+        with self._load_lock:
+            if self.backend is not None:
+                return
+            try:
+                from transformers import AutoTokenizer
+
+                tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                backend = load_backend(self.backend_name, self.model_name)
+                self.tokenizer = tokenizer
+                self.backend = backend
+                if self.cache and backend.name != self.backend_name:
+                    # A fallback backend scores slightly differently; keep its results apart
+                    self.cache.namespace = f"{self.model_name}:{EMOTION_MODEL_VERSION}:{backend.name}"
+                print(f"Emotion detection model loaded successfully ({backend.name} backend)")
+            except Exception as e:
+                print(f"Error loading emotion model: {e}")
+                print("Using fallback emotion detection...")
+                self.backend = None
     
     def detect_emotions(self, text: str) -> Dict[str, float]:
         """Detect emotions in text and return probabilities"""
-        if not self.model or not text.strip():
+        if not self.is_loaded or not text.strip():
             return self._fallback_emotion_detection(text)
-        
+
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
+
         try:
-            # Tokenize and predict
-            inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                probabilities = torch.sigmoid(outputs.logits).squeeze().numpy()
-            
-            # Create emotion dictionary
-            emotions = {}
-            for i, label in enumerate(self.emotion_labels):
-                emotions[label] = float(probabilities[i])
-            
-            return emotions
-            
+            if self.batcher:
+                # Share a forward pass with other requests arriving in the same window
+                return self.batcher.submit(text).result()
+            return self._resolve_batch([text])[0]
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
             print(f"Error in emotion detection: {e}")
             return self._fallback_emotion_detection(text)
-    
+
+    async def detect_emotions_async(self, text: str) -> Dict[str, float]:
+        """Detect emotions without blocking the event loop while the batch is collected"""
+        if not self.is_loaded or not text.strip():
+            return self._fallback_emotion_detection(text)
+
+        if not self.batcher:
+            return await execution_pools.run_cpu(self.detect_emotions, text)
+
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
+
+        try:
+            # The batcher thread also does the persistent cache lookup and writes
+            return await asyncio.wrap_future(self.batcher.submit(text))
+        except ServiceOverloadedError:
+            raise
+        except Exception as e:
+            print(f"Error in emotion detection: {e}")
+            return self._fallback_emotion_detection(text)
+
+    def detect_emotions_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Detect emotions for several texts with padded forward passes"""
+        results: List[Dict[str, float]] = [None] * len(texts)
+
+        pending = []
+        for i, text in enumerate(texts):
+            if not self.is_loaded or not text.strip():
+                results[i] = self._fallback_emotion_detection(text)
+                continue
+            cached = self._cache_get(text)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
+
+        if pending:
+            try:
+                predictions = self._resolve_batch([texts[i] for i in pending])
+            except Exception as e:
+                print(f"Error in emotion detection: {e}")
+                for i in pending:
+                    results[i] = self._fallback_emotion_detection(texts[i])
+            else:
+                for i, emotions in zip(pending, predictions):
+                    results[i] = emotions
+
+        return results
+
+    def _resolve_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Finish memory-cache misses: persistent cache tier first, then the model; runs off the event loop"""
+        results: List[Dict[str, float]] = [self._cache_get_persistent(text) for text in texts]
+        pending = [i for i, emotions in enumerate(results) if emotions is None]
+        if pending:
+            for i, emotions in zip(pending, self._infer_batch([texts[i] for i in pending])):
+                results[i] = emotions
+                self._cache_put(texts[i], emotions)
+        return results
+
+    def _infer_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Run the model over texts in padded chunks; errors propagate to the caller"""
+        results: List[Dict[str, float]] = [None] * len(texts)
+
+        # Sort by length so each padded chunk wastes as little compute as possible
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.max_batch_size):
+            chunk = order[start:start + self.max_batch_size]
+            for i, emotions in zip(chunk, self._predict([texts[i] for i in chunk])):
+                results[i] = emotions
+
+        return results
+
+    def _cache_get(self, text: str):
+        # Memory tier only: callers may be on the event loop; _resolve_batch checks the persistent tier
+        return self.cache.get(text, memory_only=True) if self.cache else None
+
+    def _cache_get_persistent(self, text: str):
+        return self.cache.get_persistent(text) if self.cache else None
+
+    def _cache_put(self, text: str, emotions: Dict[str, float]):
+        if self.cache:
+            self.cache.put(text, emotions)
+
+    def _predict(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Run one padded forward pass over a chunk of texts"""
+        MODEL_BATCH_SIZE.observe(len(texts), "emotion")
+        with MODEL_INFERENCE_SECONDS.time("emotion"):
+            probabilities = predict_probabilities(self.backend, self.tokenizer, texts)
+
+        return [
+            {label: float(row[i]) for i, label in enumerate(self.emotion_labels)}
+            for row in probabilities
+        ]
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit and miss counters for the result cache"""
+        if not self.cache:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
+
+    def get_batching_stats(self) -> Dict[str, Any]:
+        """Batch size and queue wait metrics for the inference engine"""
+        if not self.batcher:
+            return {"enabled": False}
+        return {"enabled": True, **self.batcher.get_stats()}
+
     def _fallback_emotion_detection(self, text: str) -> Dict[str, float]:
         """Simple keyword-based emotion detection as fallback"""
         text_lower = text.lower()
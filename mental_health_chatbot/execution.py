@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Pool sizing; blocking work beyond workers + queue is rejected instead of piling up
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_POOL_QUEUE = int(os.getenv("CPU_POOL_QUEUE", "32"))
+IO_POOL_WORKERS = int(os.getenv("IO_POOL_WORKERS", "32"))
+IO_POOL_QUEUE = int(os.getenv("IO_POOL_QUEUE", "256"))
+
+
+class ServiceOverloadedError(Exception):
+    """Raised when a work queue is full and the request should be retried later"""
+
+    def __init__(self, pool_name: str, retry_after: int = 1):
+        super().__init__(f"The {pool_name} queue is full, please retry shortly")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """Thread pool with a cap on running plus queued tasks"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable in the pool and await its result"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ServiceOverloadedError(self.name)
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # Release the slot when the work finishes, even if the caller stops waiting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.max_workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExecutionPools:
+    """Separate pools for CPU-bound inference and blocking I/O"""
+
+    def __init__(self):
+        self.cpu = BoundedExecutor("cpu", CPU_POOL_WORKERS, CPU_POOL_QUEUE)
+        self.io = BoundedExecutor("io", IO_POOL_WORKERS, IO_POOL_QUEUE)
+
+    async def run_cpu(self, func: Callable, *args, **kwargs) -> Any:
+        """Run model inference or other CPU-heavy work off the event loop"""
+        return await self.cpu.run(func, *args, **kwargs)
+
+    async def run_io(self, func: Callable, *args, **kwargs) -> Any:
+        """Run blocking network or disk work off the event loop"""
+        return await self.io.run(func, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {"cpu": self.cpu.get_stats(), "io": self.io.get_stats()}
+
+    def shutdown(self):
+        self.cpu.shutdown()
+        self.io.shutdown()
+
+# Global execution pools instance
+execution_pools = ExecutionPools()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Synthetic Dataset Generator
+Creates a deterministic, production-sized history of mood entries, chat messages and self-help activities
+with bulk Core inserts, for benchmarking the analytics and query paths at scale
+
+Usage:
+    python generate_dataset.py --users 1000 --days 365                     # roughly 0.75M rows
+    python generate_dataset.py --users 20000 --days 365 --seed 7           # millions of rows
+    python generate_dataset.py --users 1000 --replace --skip-rollups       # rebuild rollups later
+"""
+
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, insert
+
+from database import MoodEntry, ChatMessage, SelfHelpActivity, DailyMoodRollup, DailyEmotionRollup, engine
+from rollups import backfill
+
+EMOTION_LABELS = ["anger", "anticipation", "disgust", "fear", "joy", "love", "optimism", "pessimism",
+                  "sadness", "surprise", "trust"]
+# Emotions that rise with a good mood and with a bad one
+POSITIVE_EMOTIONS = ("joy", "love", "optimism", "trust", "anticipation")
+NEGATIVE_EMOTIONS = ("sadness", "pessimism", "fear", "anger", "disgust")
+
+MOOD_TEXTS = {
+    "low": ["Feeling overwhelmed with responsibilities", "Stressed about upcoming deadlines",
+            "Feeling a bit lonely lately", "Couldn't sleep well, everything feels heavy",
+            "Difficult conversation with a colleague", "Worried about the future"],
+    "mid": ["Feeling okay, bit tired from the week", "Mixed day, some ups and downs",
+            "Regular day, nothing special", "Quiet day, did some reading"],
+    "high": ["Had a great day at work, feeling accomplished", "Spent quality time with family",
+             "Good workout session, feeling energized", "Beautiful weather, went for a long walk",
+             "Made progress on personal goals", "Had a good conversation with a friend"],
+}
+CHAT_OPENERS = {
+    "low": ["I'm feeling anxious about tomorrow", "I'm feeling overwhelmed with work",
+            "I can't stop worrying about my family", "I feel stuck in my career", "I've been feeling down all week"],
+    "mid": ["How can I manage stress better?", "Can you suggest some breathing exercises?",
+            "Can you help me with sleep issues?", "How do I deal with negative thoughts?",
+            "I need help with time management"],
+    "high": ["I had a great day today!", "I accomplished my goals this week", "I feel grateful for my friends",
+             "I'm proud of how far I've come"],
+}
+CHAT_FOLLOW_UPS = ["That makes sense, thank you", "Can you tell me more about that?", "I'll try that tonight",
+                   "What if it doesn't help?", "Yes, that's exactly how it feels", "Okay, what else can I do?"]
+BOT_REPLIES = [
+    "It's understandable to feel that way. Let's take a moment to breathe together: in for four, hold for four, out for six.",
+    "Thank you for sharing that. What thought tends to come up first when you feel like this?",
+    "That sounds like a lot to carry. Breaking it into one small next step can make it feel more manageable.",
+    "It's great to hear that! What do you think helped the most today?",
+    "Try writing the worry down and asking: what evidence supports it, and what evidence doesn't?",
+    "Sleep often improves with a regular wind-down routine. Would you like a short relaxation exercise?",
+]
+# (activity type, typical duration in seconds)
+ACTIVITIES = [("breathing", 240), ("affirmation", 60), ("cbt", 900)]
+
+# Entries are most often logged in the morning and the evening
+HOUR_WEIGHTS = [1, 0, 0, 0, 0, 1, 3, 6, 8, 6, 4, 3, 4, 3, 3, 3, 4, 5, 6, 8, 9, 8, 5, 2]
+
+
+class UserProfile:
+    """Stable traits of one synthetic user, drawn from a per-user seeded RNG"""
+
+    def __init__(self, rng: random.Random, days: int):
+        # Heavy-tailed engagement: most users log now and then, a few log every day
+        self.activity = min(0.95, rng.lognormvariate(math.log(0.35), 0.6))
+        self.entries_per_day = 1 + rng.expovariate(2.5)
+        self.baseline = min(8.5, max(3.0, rng.gauss(6.2, 1.2)))
+        self.volatility = rng.uniform(0.4, 1.4)
+        self.chattiness = rng.uniform(0.05, 0.6)
+        self.self_help_affinity = rng.uniform(0.02, 0.4)
+        self.voice_share = rng.uniform(0, 0.3)
+        # Users join at different times; later joiners have shorter histories
+        self.first_day = int(days * rng.random() ** 2)
+
+
+def _timestamp(rng: random.Random, day: datetime) -> datetime:
+    hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+    return day + timedelta(hours=hour, seconds=rng.randrange(3600))
+
+
+def _band(rating: float) -> str:
+    return "low" if rating < 4.5 else "high" if rating >= 7 else "mid"
+
+
+def _emotions(rng: random.Random, rating: float) -> Dict[str, float]:
+    """Multi-label scores shaped like the emotion model's output, leaning with the mood rating"""
+    valence = (rating - 5.5) / 4.5  # -1 (worst) .. 1 (best)
+    scores = {}
+    for label in EMOTION_LABELS:
+        if label in POSITIVE_EMOTIONS:
+            center = 0.35 + 0.4 * valence
+        elif label in NEGATIVE_EMOTIONS:
+            center = 0.35 - 0.4 * valence
+        else:
+            center = 0.15
+        scores[label] = round(min(0.99, max(0.01, rng.gauss(center, 0.12))), 3)
+    return scores
+
+
+def generate_user(user_id: str, seed: int, days: int, end: datetime) -> Dict[str, List[Dict[str, Any]]]:
+    """All rows of one user; seeded per user, so output does not depend on batch sizes or user order"""
+    rng = random.Random(f"{seed}:{user_id}")
+    profile = UserProfile(rng, days)
+    rows = {"mood": [], "chat": [], "activity": []}
+    mood = profile.baseline
+
+    for day_index in range(profile.first_day, days):
+        day = end - timedelta(days=days - day_index)
+        # Mood drifts day to day around the user's baseline, a little better at weekends
+        weekend = 0.4 if day.weekday() >= 5 else 0.0
+        mood = profile.baseline + 0.7 * (mood - profile.baseline) + rng.gauss(0, profile.volatility) + weekend
+
+        if rng.random() < profile.activity:
+            for _ in range(max(1, round(rng.gauss(profile.entries_per_day, 0.5)))):
+                rating = min(10, max(1, round(rng.gauss(mood, 0.8))))
+                rows["mood"].append({
+                    "user_id": user_id,
+                    "date": _timestamp(rng, day),
+                    "mood_text": rng.choice(MOOD_TEXTS[_band(rating)]),
+                    "mood_rating": rating,
+                    "detected_emotions": _emotions(rng, rating),
+                    "entry_type": "voice" if rng.random() < profile.voice_share else "text",
+                })
+
+        # Low days bring more conversations and more exercises
+        distress = max(0.0, (5.5 - mood) / 4.5)
+        if rng.random() < profile.chattiness * (1 + distress):
+            at = _timestamp(rng, day)
+            turns = min(20, 1 + int(rng.expovariate(1 / 3)))
+            for turn in range(turns):
+                content = rng.choice(CHAT_OPENERS[_band(mood)]) if turn == 0 else rng.choice(CHAT_FOLLOW_UPS)
+                rows["chat"].append({"user_id": user_id, "timestamp": at, "role": "user", "content": content,
+                                     "detected_emotions": _emotions(rng, mood)})
+                at += timedelta(seconds=rng.randint(2, 8))
+                rows["chat"].append({"user_id": user_id, "timestamp": at, "role": "bot",
+                                     "content": rng.choice(BOT_REPLIES), "detected_emotions": None})
+                at += timedelta(seconds=rng.randint(10, 180))
+
+        if rng.random() < profile.self_help_affinity * (1 + 2 * distress):
+            activity_type, duration = rng.choice(ACTIVITIES)
+            rows["activity"].append({
+                "user_id": user_id,
+                "activity_type": activity_type,
+                "timestamp": _timestamp(rng, day),
+                "duration_seconds": max(15, int(rng.gauss(duration, duration / 3))),
+                "completion_rating": min(5, max(1, round(rng.gauss(3.6 - distress, 1)))),
+            })
+    return rows
+
+
+def generate(users: int, days: int, seed: int, prefix: str, batch_size: int, rows_per_transaction: int,
+             end: datetime) -> Dict[str, int]:
+    """Insert every user's rows in multi-row Core inserts, committing every rows_per_transaction rows"""
+    tables = {"mood": MoodEntry.__table__, "chat": ChatMessage.__table__, "activity": SelfHelpActivity.__table__}
+    buffers = {name: [] for name in tables}
+    counts = {name: 0 for name in tables}
+    started = time.perf_counter()
+    uncommitted = 0
+    conn = engine.connect()
+    transaction = conn.begin()
+    try:
+        for index in range(users):
+            for name, rows in generate_user(f"{prefix}{index}", seed, days, end).items():
+                buffers[name].extend(rows)
+                if len(buffers[name]) < batch_size:
+                    continue
+                conn.execute(insert(tables[name]), buffers[name])
+                counts[name] += len(buffers[name])
+                uncommitted += len(buffers[name])
+                buffers[name] = []
+
+            if uncommitted >= rows_per_transaction:
+                transaction.commit()
+                transaction = conn.begin()
+                uncommitted = 0
+                total = sum(counts.values())
+                print(f"  {index + 1}/{users} users, {total:,} rows "
+                      f"({total / (time.perf_counter() - started):,.0f} rows/s)")
+
+        for name, rows in buffers.items():
+            if rows:
+                conn.execute(insert(tables[name]), rows)
+                counts[name] += len(rows)
+        transaction.commit()
+    except Exception:
+        transaction.rollback()
+        raise
+    finally:
+        conn.close()
+    return counts
+
+
+def remove_users(prefix: str) -> int:
+    """Delete earlier synthetic rows and their rollups, so a rerun with the same seed reproduces the same dataset"""
+    removed = 0
+    with engine.begin() as conn:
+        for model in (MoodEntry, ChatMessage, SelfHelpActivity):
+            removed += conn.execute(delete(model).where(model.user_id.startswith(prefix, autoescape=True))).rowcount
+        # Core deletes bypass the rollup hooks; drop the removed users' days with them
+        for model in (DailyMoodRollup, DailyEmotionRollup):
+            conn.execute(delete(model).where(model.user_id.startswith(prefix, autoescape=True)))
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-generate a deterministic synthetic dataset")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365, help="Days of history ending at --end-date")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", help="Last day of history (YYYY-MM-DD); defaults to today")
+    parser.add_argument("--user-prefix", default="synthetic_user_")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per multi-row INSERT")
+    parser.add_argument("--rows-per-transaction", type=int, default=200000)
+    parser.add_argument("--replace", action="store_true", help="Delete earlier rows of --user-prefix users first")
+    parser.add_argument("--skip-rollups", action="store_true", help="Leave the daily rollups for a later backfill")
+    args = parser.parse_args()
+
+    end_day = datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date else datetime.utcnow()
+    end = end_day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    if args.replace:
+        print(f"Removed {remove_users(args.user_prefix):,} existing rows of '{args.user_prefix}*' users")
+
+    print(f"Generating {args.days} days of history for {args.users:,} users (seed {args.seed})")
+    start = time.perf_counter()
+    counts = generate(args.users, args.days, args.seed, args.user_prefix, args.batch_size,
+                      args.rows_per_transaction, end)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"Inserted {counts['mood']:,} mood entries, {counts['chat']:,} chat messages and "
+          f"{counts['activity']:,} self-help activities in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    # Core inserts bypass the ORM hook that keeps the daily rollups current
+    if args.skip_rollups:
+        print(f"WARNING: daily rollups do not include the new '{args.user_prefix}*' rows; the summary and "
+              f"analytics endpoints report no data for these users until 'python rollups.py --backfill' runs")
+        return
+    start = time.perf_counter()
+    processed = backfill()
+    print(f"Rebuilt daily rollups from {processed:,} mood entries in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+# Upstream settings; point OPENROUTER_BASE_URL at a local mock for tests and benchmarks
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when the upstream model cannot produce a completion"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(LLMError):
+    """Raised without contacting upstream while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Model service is temporarily unavailable")
+        self.retry_after = retry_after
+
+
+class RetryBudget:
+    """Allow retries only up to a fraction of recent requests, across all callers"""
+
+    def __init__(self, ratio: float = LLM_RETRY_BUDGET_RATIO, min_retries_per_second: float = 1.0,
+                 window_seconds: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries_per_second * window_seconds
+        self.window_seconds = window_seconds
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        for timestamps in (self._requests, self._retries):
+            while timestamps and timestamps[0] < cutoff:
+                timestamps.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """Reserve one retry if the budget allows it"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {"window_requests": len(self._requests), "window_retries": len(self._retries)}
+
+
+class CircuitBreaker:
+    """Stop calling upstream after repeated failures and probe again after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = LLM_CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may go upstream now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            raise CircuitOpenError(retry_after=max(1.0, self.reset_seconds - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Let the next request probe again when one ended without a verdict on upstream health"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class LLMClient:
+    """Async chat-completions client with a persistent connection pool"""
+
+    def __init__(self, api_key: Optional[str], base_url: str = OPENROUTER_BASE_URL, max_retries: int = LLM_MAX_RETRIES):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.timeout = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        self.limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+        self.retry_budget = RetryBudget()
+        self.circuit_breaker = CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "retry_budget_exhausted": 0, "circuit_rejections": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=_http2_available(),
+            )
+        return self._client
+
+    async def aclose(self):
+        """Close pooled connections; call on application shutdown"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str, **params) -> Dict[str, Any]:
+        """Request a chat completion and return the decoded response body"""
+        payload = {"model": model, "messages": messages, **params}
+        response = await self._post_with_retries("/chat/completions", payload)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise LLMError(f"Invalid JSON from model: {e}", response.status_code)
+
+    async def stream_chat_completion(self, messages: List[Dict[str, str]], model: str, **params) -> AsyncIterator[str]:
+        """Request a streamed chat completion and yield content tokens as they arrive"""
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        # Retries only happen before the first byte; a broken stream is reported to the caller
+        response = await self._post_with_retries("/chat/completions", payload, stream=True)
+        try:
+            async for line in response.aiter_lines():
+                # Skip keep-alive comments and blank separators between events
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    continue
+                if "error" in chunk:
+                    # The headers counted as a success; an upstream failure mid-stream must still reach the breaker
+                    self.circuit_breaker.record_failure()
+                    raise LLMError(f"Model stream error: {chunk['error']}")
+                choices = chunk.get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    yield token
+        except httpx.TimeoutException as e:
+            self.circuit_breaker.record_failure()
+            raise LLMError(f"Model stream timed out: {type(e).__name__}")
+        except httpx.TransportError as e:
+            self.circuit_breaker.record_failure()
+            raise LLMError(f"Model stream interrupted: {e}")
+        finally:
+            await response.aclose()
+
+    async def _post_with_retries(self, path: str, payload: Dict[str, Any], stream: bool = False) -> httpx.Response:
+        try:
+            self.circuit_breaker.before_request()
+        except CircuitOpenError:
+            self._stats["circuit_rejections"] += 1
+            raise
+
+        self._stats["requests"] += 1
+        self.retry_budget.record_request()
+        attempt = 0
+        try:
+            while True:
+                outcome = await self._attempt(path, payload, stream)
+                if not isinstance(outcome, LLMError):
+                    self.circuit_breaker.record_success()
+                    return outcome
+
+                error = outcome
+                retryable = error.status_code is None or error.status_code in RETRYABLE_STATUS_CODES
+                if not retryable:
+                    # The request itself is bad; upstream is healthy
+                    self.circuit_breaker.record_success()
+                    raise error
+                if attempt >= self.max_retries or not self.retry_budget.try_spend():
+                    if attempt < self.max_retries:
+                        self._stats["retry_budget_exhausted"] += 1
+                    self._stats["failures"] += 1
+                    self.circuit_breaker.record_failure()
+                    raise error
+
+                attempt += 1
+                self._stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+        except LLMError:
+            # Already recorded above
+            raise
+        except asyncio.CancelledError:
+            # The caller went away; that says nothing about upstream, but a half-open probe must not stay claimed
+            self.circuit_breaker.release_probe()
+            raise
+        except BaseException:
+            # Errors _attempt does not map (decoding, redirects, ...) count against upstream
+            self._stats["failures"] += 1
+            self.circuit_breaker.record_failure()
+            raise
+
+    async def _attempt(self, path: str, payload: Dict[str, Any], stream: bool = False):
+        """Send one request; return the response on success or the error to handle"""
+        client = self._get_client()
+        try:
+            response = await client.send(client.build_request("POST", path, json=payload), stream=stream)
+            if response.status_code >= 400:
+                await response.aread()
+                await response.aclose()
+                return LLMError(f"Model returned HTTP {response.status_code}: {response.text[:200]}", response.status_code)
+        except httpx.TimeoutException as e:
+            return LLMError(f"Model request timed out: {type(e).__name__}")
+        except httpx.TransportError as e:
+            return LLMError(f"Error contacting model: {e}")
+        return response
+
+    @staticmethod
+    def _backoff(attempt: int, base: float = 0.25, cap: float = 4.0) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "circuit_state": self.circuit_breaker.state,
+            **self._stats,
+            **self.retry_budget.get_stats(),
+        }
@@ -0,0 +1,262 @@
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Recording costs a bisect and two additions under a lock; set to false to make every timer a no-op
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds, from cache hits to slow model calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bytes, from small JSON bodies to audio uploads
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Items per batch or queue
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Timer:
+    """Context manager that observes its elapsed time into a histogram child"""
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram:
+    """Fixed-bucket histogram, one series per combination of label values"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> _HistogramChild:
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {list(self.labelnames)}")
+            with self._lock:
+                child = self._children.setdefault(key, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float, *label_values):
+        self.labels(*label_values).observe(value)
+
+    def time(self, *label_values) -> _Timer:
+        return self.labels(*label_values).time()
+
+    def collect(self) -> List[str]:
+        lines = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for key, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = 'le="' + bound + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time value; either set directly or read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values):
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, *label_values):
+        self.inc(-amount, *label_values)
+
+    def collect(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                values = {tuple(str(v) for v in key): value for key, value in self.callback().items()}
+            except Exception as e:
+                print(f"Metrics callback for {self.name} failed: {e}")
+                return []
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-imports and repeated registration share the original series
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames, callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            help_text = metric.help_text.replace("\\", "\\\\").replace("\n", "\\n")
+            lines.append(f"# HELP {metric.name} {help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+# Shared instruments; modules time their own stages with these
+STAGE_SECONDS = metrics.histogram(
+    "chatbot_stage_duration_seconds", "Time spent in one stage of request handling", ["stage"]
+)
+MODEL_INFERENCE_SECONDS = metrics.histogram(
+    "chatbot_model_inference_seconds", "Time of one model forward pass or transcription", ["model"]
+)
+QUEUE_DEPTH = metrics.histogram(
+    "chatbot_queue_depth", "Items already waiting when a new one is queued", ["queue"], buckets=COUNT_BUCKETS
+)
+MODEL_BATCH_SIZE = metrics.histogram(
+    "chatbot_model_batch_size", "Inputs per model forward pass", ["model"], buckets=COUNT_BUCKETS
+)
+
+
+def stage_timer(stage: str) -> _Timer:
+    """Time a block as one request stage: `with stage_timer("llm_completion"): ...`"""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and payload sizes per route template"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.duration = registry.histogram(
+            "chatbot_http_request_duration_seconds", "Time until the last response byte was sent",
+            ["method", "route", "status"]
+        )
+        self.request_size = registry.histogram(
+            "chatbot_http_request_size_bytes", "Declared request body size", ["route"], buckets=SIZE_BUCKETS
+        )
+        self.response_size = registry.histogram(
+            "chatbot_http_response_size_bytes", "Response body bytes sent, including streamed bodies",
+            ["route"], buckets=SIZE_BUCKETS
+        )
+        self.in_progress = registry.gauge("chatbot_http_requests_in_progress", "Requests being handled")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        self.in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_progress.dec()
+            # The router stores the matched route in the scope; label by its template to bound cardinality
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            self.duration.observe(time.perf_counter() - start, scope["method"], path, status)
+            self.response_size.observe(sent, path)
+            for name, value in scope.get("headers", ()):
+                if name == b"content-length":
+                    self.request_size.observe(int(value), path)
+                    break
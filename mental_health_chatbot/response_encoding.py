@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = 1024
+
+
+def _accepted_encodings(request: Request) -> set:
+    header = request.headers.get("accept-encoding", "")
+    encodings = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            encodings.add(name.lower())
+    return encodings
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored on both sides
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def compact_json_response(request: Request, payload: Any, status_code: int = 200,
+                          headers: Optional[dict] = None, etag: bool = False) -> Response:
+    """Serialize without whitespace and compress with brotli or gzip when the client accepts it
+
+    With etag=True the response carries a weak ETag of the uncompressed body and
+    becomes a bodiless 304 when it matches the request's If-None-Match.
+    """
+    body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    response_headers = {"Vary": "Accept-Encoding", **(headers or {})}
+
+    if etag:
+        # Weak because the same entity may be sent with different content encodings
+        response_headers["ETag"] = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if status_code == 200 and _etag_matches(request, response_headers["ETag"]):
+            return Response(status_code=304, headers=response_headers)
+
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        accepted = _accepted_encodings(request)
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=5)
+            response_headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            response_headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=response_headers)
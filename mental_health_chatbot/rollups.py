@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Daily Rollups
+Queries over the per-user, per-day mood aggregates, and a backfill command for existing databases
+
+Usage:
+    python rollups.py --backfill                 # rebuild every user's rollups
+    python rollups.py --backfill --user alice    # rebuild one user's rollups
+"""
+
+import argparse
+import math
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from database import DailyMoodRollup, DailyEmotionRollup, engine, rebuild_rollups
+
+
+def recent_days(days: int) -> Tuple[date, date]:
+    """First and last day of a window of whole days ending today; rollup days are UTC dates, so is today"""
+    today = datetime.utcnow().date()
+    return today - timedelta(days=days - 1), today
+
+
+def mood_days_query(user_id: str, start_day: Optional[date] = None, end_day: Optional[date] = None):
+    """Daily mood aggregates of one user, oldest day first"""
+    stmt = select(
+        DailyMoodRollup.day,
+        DailyMoodRollup.entry_count,
+        DailyMoodRollup.rating_count,
+        DailyMoodRollup.rating_sum,
+        DailyMoodRollup.rating_sq_sum
+    ).where(DailyMoodRollup.user_id == user_id)
+    if start_day is not None:
+        stmt = stmt.where(DailyMoodRollup.day >= start_day)
+    if end_day is not None:
+        stmt = stmt.where(DailyMoodRollup.day <= end_day)
+    return stmt.order_by(DailyMoodRollup.day)
+
+
+def emotion_totals_query(user_id: str, start_day: Optional[date] = None, end_day: Optional[date] = None):
+    """Per-emotion entry counts and score sums of one user, highest score first"""
+    score_sum = func.sum(DailyEmotionRollup.score_sum).label("score_sum")
+    stmt = select(
+        DailyEmotionRollup.emotion,
+        func.sum(DailyEmotionRollup.entry_count).label("entry_count"),
+        score_sum
+    ).where(DailyEmotionRollup.user_id == user_id)
+    if start_day is not None:
+        stmt = stmt.where(DailyEmotionRollup.day >= start_day)
+    if end_day is not None:
+        stmt = stmt.where(DailyEmotionRollup.day <= end_day)
+    return stmt.group_by(DailyEmotionRollup.emotion).order_by(score_sum.desc())
+
+
+def total_entries_query(user_id: str):
+    return select(func.coalesce(func.sum(DailyMoodRollup.entry_count), 0)).where(DailyMoodRollup.user_id == user_id)
+
+
+def summarize_days(days: List[Any]) -> Dict[str, Any]:
+    """Entry count, mean and sample standard deviation of ratings across daily rollup rows"""
+    entries = sum(row.entry_count for row in days)
+    n = sum(row.rating_count for row in days)
+    total = sum(row.rating_sum for row in days)
+    squares = sum(row.rating_sq_sum for row in days)
+    average = total / n if n else 0
+    variance = (squares - total * total / n) / (n - 1) if n > 1 else 0
+    return {
+        "entries": entries,
+        "rating_count": n,
+        "average": average,
+        "std_dev": math.sqrt(max(variance, 0)),
+    }
+
+
+def split_halves(days: List[Any]) -> Optional[Tuple[List[Any], List[Any]]]:
+    """Split rated days into an earlier and a later half of roughly equal rating counts"""
+    rated = [row for row in days if row.rating_count]
+    if len(rated) < 2:
+        return None
+    half = sum(row.rating_count for row in rated) / 2
+    seen = 0
+    for i, row in enumerate(rated[:-1]):
+        seen += row.rating_count
+        if seen >= half:
+            return rated[:i + 1], rated[i + 1:]
+    return rated[:-1], rated[-1:]
+
+
+def backfill(user_id: Optional[str] = None) -> int:
+    """Rebuild rollups from mood_entries, e.g. after bulk loads that bypassed the ORM"""
+    with engine.begin() as conn:
+        return rebuild_rollups(conn, user_id=user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily mood rollup tables")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild rollups from mood_entries")
+    parser.add_argument("--user", help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    if not args.backfill:
+        parser.print_help()
+        return
+
+    start = time.perf_counter()
+    processed = backfill(args.user)
+    target = f"user '{args.user}'" if args.user else "all users"
+    print(f"Rolled up {processed} mood entries for {target} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
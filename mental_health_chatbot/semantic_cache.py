@@ -0,0 +1,239 @@
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Off by default: a cached reply is shared between requests that only mean the same thing
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# "global" shares replies across users, "user" only reuses a user's own earlier replies
+SEMANTIC_CACHE_SCOPE = os.getenv("SEMANTIC_CACHE_SCOPE", "global")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+SEMANTIC_CACHE_MAX_WORDS = int(os.getenv("SEMANTIC_CACHE_MAX_WORDS", "20"))
+# Messages scoring at least this on a distress emotion always get a fresh reply
+SEMANTIC_CACHE_MAX_DISTRESS = float(os.getenv("SEMANTIC_CACHE_MAX_DISTRESS", "0.5"))
+
+SEMANTIC_CACHE_SCOPES = ("global", "user")
+DISTRESS_EMOTIONS = ("sadness", "fear", "anger", "pessimism", "disgust")
+
+# Anything that may signal risk needs a considered, individual reply
+RISK_PATTERN = re.compile(
+    r"\b(suicid\w*|kill\w*|die|dies|dying|dead|death|deadly|lethal|self[- ]?harm\w*|harm\w*|hurt\w*|"
+    r"injur\w*|cut(s|ting)?|blades?|razors?|burn(ing)?|bleed\w*|overdos\w*|pills?|tablets?|meds|medication\w*|"
+    r"poison\w*|hang(ing)?|noose|rope|jump\w*|bridge|ledge|gun|weapon\w*|drown\w*|starv\w*|purg\w*|"
+    r"abus\w*|assault\w*|rape\w*|violen\w*|crisis|emergency|hopeless\w*|worthless\w*|helpless\w*|burden|"
+    r"pointless|unbearable|trapped|alone|end (it|things|everything)|give up|giving up|no way out|"
+    r"disappear\w*|vanish|alive|living|live|life|lives|wake up|not wake|never wake|sleep forever|"
+    r"worth it|point of|reason to|too many|too much|how much|how many|stop (existing|wanting|being))\b"
+)
+# Disclosures about the user's own life make the reply personal
+PERSONAL_PATTERN = re.compile(
+    r"\b(my|mine|myself|i'm|im|i am|i was|i've|i have|i had|i feel|i felt|i'll|i will|i did|i didn't)\b|\d|@"
+)
+# Follow-ups only make sense against the earlier conversation
+FOLLOW_UP_PATTERN = re.compile(r"\b(that|this|it|those|these|more|another|again|else|above|earlier|before|you said)\b")
+
+# Generic self-care intents whose replies suit anyone; only messages close to one of these use the cache
+CACHEABLE_INTENTS = {
+    "breathing": ["Can you suggest some breathing exercises?", "How do I do box breathing?",
+                  "What is a breathing technique to calm down?"],
+    "sleep": ["How can I sleep better?", "What are some tips for falling asleep faster?",
+              "What is good sleep hygiene?"],
+    "stress": ["How can I manage stress better?", "What are quick ways to reduce stress?",
+               "How do I relax after a busy day?"],
+    "mindfulness": ["How do I start practicing mindfulness?", "What is a grounding technique for anxiety?",
+                    "How does meditation help with anxiety?"],
+    "cbt": ["What is cognitive behavioral therapy?", "What are cognitive distortions?",
+            "How do I challenge negative thoughts?"],
+    "self_care": ["What are some good self-care habits?", "How does exercise help your mood?",
+                  "How can I build a healthy daily routine?"],
+}
+SEMANTIC_CACHE_INTENT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_INTENT_THRESHOLD", "0.8"))
+
+
+def _mean_pool(last_hidden_state, attention_mask) -> np.ndarray:
+    mask = attention_mask.unsqueeze(-1).float()
+    pooled = (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    return pooled.numpy()
+
+
+class SemanticCache:
+    """Serve stored replies to generic questions whose embeddings are close to an earlier one"""
+
+    def __init__(self, model_name: str = SEMANTIC_CACHE_MODEL, scope: str = SEMANTIC_CACHE_SCOPE,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_SIZE,
+                 ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS, enabled: bool = SEMANTIC_CACHE_ENABLED,
+                 intent_threshold: float = SEMANTIC_CACHE_INTENT_THRESHOLD):
+        if scope not in SEMANTIC_CACHE_SCOPES:
+            raise ValueError(f"Unknown semantic cache scope '{scope}', expected one of {list(SEMANTIC_CACHE_SCOPES)}")
+        self.model_name = model_name
+        self.scope = scope
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.intent_threshold = intent_threshold
+        self.tokenizer = None
+        self.model = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # Unit-length embeddings, one row per slot, so a lookup is a single matrix-vector product
+        self._vectors: Optional[np.ndarray] = None
+        self._replies = [None] * self.max_entries
+        self._owners = [None] * self.max_entries
+        self._created_at = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+        self._size = 0
+        # One unit-length embedding per allowlisted example question, filled in when the model loads
+        self._intent_vectors: Optional[np.ndarray] = None
+        self._intent_names = [name for name, examples in CACHEABLE_INTENTS.items() for _ in examples]
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0,
+                       "ineligible": 0, "off_intent": 0, "lookup_ms_total": 0.0, "hit_similarity_total": 0.0}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def load_model(self):
+        """Load the sentence embedding model"""
+        with self._load_lock:
+            if self.model is not None or not self.enabled:
+                return
+            try:
+                from transformers import AutoModel, AutoTokenizer
+
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                self.model = AutoModel.from_pretrained(self.model_name).eval()
+                self._intent_vectors = np.stack([self.embed(example) for examples in CACHEABLE_INTENTS.values()
+                                                 for example in examples])
+                print(f"Semantic cache embedding model loaded ({self.model_name})")
+            except Exception as e:
+                print(f"Error loading semantic cache model: {e}")
+                print("Semantic cache disabled")
+                self.model = None
+                self._intent_vectors = None
+
+    def is_cacheable(self, message: str, emotions: Optional[Dict[str, float]] = None) -> bool:
+        """Text checks before embedding: short, impersonal, no risk words and no strong distress"""
+        text = message.lower().replace("’", "'")
+        cacheable = (
+            len(text.split()) <= SEMANTIC_CACHE_MAX_WORDS
+            and not RISK_PATTERN.search(text)
+            and not PERSONAL_PATTERN.search(text)
+            and not FOLLOW_UP_PATTERN.search(text)
+            and max((emotions or {}).get(name, 0.0) for name in DISTRESS_EMOTIONS) < SEMANTIC_CACHE_MAX_DISTRESS
+        )
+        if not cacheable:
+            with self._lock:
+                self._stats["ineligible"] += 1
+        return cacheable
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit-length sentence embedding (mean-pooled token states)"""
+        import torch
+
+        inputs = self.tokenizer(" ".join(text.split()), return_tensors="pt", truncation=True, max_length=128)
+        with torch.no_grad():
+            output = self.model(**inputs)
+        vector = _mean_pool(output.last_hidden_state, inputs["attention_mask"])[0].astype(np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def match_intent(self, vector: np.ndarray) -> Optional[str]:
+        """Name of the allowlisted intent the message is close to, or None if it may not use the cache"""
+        intent = None
+        if self._intent_vectors is not None:
+            similarities = self._intent_vectors @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.intent_threshold:
+                intent = self._intent_names[best]
+        if intent is None:
+            with self._lock:
+                self._stats["off_intent"] += 1
+        return intent
+
+    def _owner(self, user_id: str) -> Optional[str]:
+        return user_id if self.scope == "user" else None
+
+    def lookup(self, vector: np.ndarray, user_id: str) -> Optional[str]:
+        """Cached reply of the most similar live entry at or above the threshold"""
+        started = time.perf_counter()
+        owner = self._owner(user_id)
+        now = time.time()
+        with self._lock:
+            self._stats["lookups"] += 1
+            reply = None
+            if self._size:
+                similarities = self._vectors[:self._size] @ vector
+                expired = self._created_at[:self._size] < now - self.ttl_seconds
+                similarities[expired] = -1.0
+                if owner is not None:
+                    foreign = np.array([slot_owner != owner for slot_owner in self._owners[:self._size]])
+                    similarities[foreign] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    reply = self._replies[best]
+                    self._last_used[best] = now
+                    self._stats["hit_similarity_total"] += float(similarities[best])
+            self._stats["hits" if reply is not None else "misses"] += 1
+            self._stats["lookup_ms_total"] += (time.perf_counter() - started) * 1000
+        return reply
+
+    def store(self, vector: np.ndarray, user_id: str, reply: str):
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                # Reuse an expired slot if there is one, otherwise the least recently used
+                expired = np.flatnonzero(self._created_at < now - self.ttl_seconds)
+                if len(expired):
+                    slot = int(expired[0])
+                    self._stats["expirations"] += 1
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self._stats["evictions"] += 1
+            self._vectors[slot] = vector
+            self._replies[slot] = reply
+            self._owners[slot] = self._owner(user_id)
+            self._created_at[slot] = now
+            self._last_used[slot] = now
+            self._stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._replies = [None] * self.max_entries
+            self._owners = [None] * self.max_entries
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+        lookup_ms_total = stats.pop("lookup_ms_total")
+        hit_similarity_total = stats.pop("hit_similarity_total")
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0
+        stats["avg_lookup_ms"] = round(lookup_ms_total / stats["lookups"], 3) if stats["lookups"] else 0
+        stats["avg_hit_similarity"] = round(hit_similarity_total / stats["hits"], 4) if stats["hits"] else None
+        stats.update({
+            "enabled": self.enabled,
+            "loaded": self.is_loaded,
+            "model": self.model_name,
+            "scope": self.scope,
+            "threshold": self.threshold,
+            "intent_threshold": self.intent_threshold,
+            "intents": list(CACHEABLE_INTENTS),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        })
+        return stats
+
+# Global semantic response cache
+semantic_cache = SemanticCache()
@@ -0,0 +1,179 @@
+import os
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Whisper expects 16 kHz mono float32 input
+WHISPER_SAMPLE_RATE = 16000
+STREAM_ENCODINGS = ("pcm16", "f32")
+
+# Voice activity detection and windowing
+STREAM_VAD_THRESHOLD_DB = float(os.getenv("STREAM_VAD_THRESHOLD_DB", "-45"))
+STREAM_SILENCE_MS = int(os.getenv("STREAM_SILENCE_MS", "700"))
+STREAM_MIN_SPEECH_MS = int(os.getenv("STREAM_MIN_SPEECH_MS", "250"))
+STREAM_PARTIAL_INTERVAL_MS = int(os.getenv("STREAM_PARTIAL_INTERVAL_MS", "1000"))
+# Whisper pads every input to 30 s, so a window costs the same up to that length
+STREAM_MAX_UTTERANCE_SECONDS = float(os.getenv("STREAM_MAX_UTTERANCE_SECONDS", "28"))
+FRAME_MS = 30
+PRE_ROLL_MS = 300
+
+
+def frame_energy_db(frame: np.ndarray) -> float:
+    """RMS level of a frame in dBFS"""
+    rms = float(np.sqrt(np.mean(np.square(frame)))) if len(frame) else 0.0
+    return 20 * np.log10(rms + 1e-10)
+
+
+def resample(audio: np.ndarray, rate: int, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Linear-interpolation resampling; adequate for speech going into Whisper"""
+    if rate == target_rate or len(audio) == 0:
+        return audio
+    duration = len(audio) / rate
+    target_length = int(round(duration * target_rate))
+    positions = np.linspace(0, len(audio) - 1, num=target_length)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+class StreamResampler:
+    """Linear-interpolation resampling of a stream chunk by chunk, continuous across chunk boundaries
+
+    Output sample k sits at input position k * rate / target_rate from the start of the stream, so chunk
+    sizes neither drop nor repeat samples and the output length does not drift.
+    """
+
+    def __init__(self, rate: int, target_rate: int = WHISPER_SAMPLE_RATE):
+        self.rate = rate
+        self.target_rate = target_rate
+        self._tail = np.zeros(0, dtype=np.float32)  # last input sample, to interpolate across the boundary
+        self._consumed = 0  # stream index of _tail[0]
+        self._emitted = 0  # output samples produced so far
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.rate == self.target_rate:
+            return samples
+        data = np.concatenate([self._tail, samples])
+        if len(data) == 0:
+            return data
+        last = len(data) - 1
+        # Every output sample whose position falls at or before the newest input sample
+        end = (self._consumed + last) * self.target_rate // self.rate + 1
+        indices = np.arange(self._emitted, end)
+        positions = indices * self.rate / self.target_rate - self._consumed
+        output = np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+        self._emitted = max(self._emitted, end)
+        self._consumed += last
+        self._tail = data[last:]
+        return output
+
+
+class StreamingTranscriber:
+    """Turn a stream of raw audio chunks into utterance windows ready for Whisper
+
+    feed() returns ("partial", audio) while someone is speaking, every partial interval, and
+    ("final", audio) once an utterance ends in silence or reaches the maximum window length.
+    """
+
+    def __init__(self, sample_rate: int = WHISPER_SAMPLE_RATE, encoding: str = "pcm16",
+                 threshold_db: float = STREAM_VAD_THRESHOLD_DB, silence_ms: int = STREAM_SILENCE_MS,
+                 min_speech_ms: int = STREAM_MIN_SPEECH_MS, partial_interval_ms: int = STREAM_PARTIAL_INTERVAL_MS,
+                 max_utterance_seconds: float = STREAM_MAX_UTTERANCE_SECONDS):
+        if encoding not in STREAM_ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}', expected one of {list(STREAM_ENCODINGS)}")
+        if not 8000 <= sample_rate <= 96000:
+            raise ValueError(f"Unsupported sample rate {sample_rate}")
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.threshold_db = threshold_db
+        self.silence_ms = silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.partial_interval_ms = partial_interval_ms
+        self.max_utterance_ms = int(max_utterance_seconds * 1000)
+
+        self._sample_width = 2 if encoding == "pcm16" else 4
+        self._frame_samples = WHISPER_SAMPLE_RATE * FRAME_MS // 1000
+        self._remainder = b""  # bytes of a sample split across chunks
+        self._resampler = StreamResampler(sample_rate)
+        self._pending = np.zeros(0, dtype=np.float32)  # resampled audio short of a full frame
+        self._pre_roll: deque = deque(maxlen=PRE_ROLL_MS // FRAME_MS)
+        self._reset_utterance()
+        self.received_seconds = 0.0
+
+    def _reset_utterance(self):
+        self._utterance: List[np.ndarray] = []
+        self._in_speech = False
+        self._speech_ms = 0
+        self._silence_ms = 0
+        self._since_partial_ms = 0
+
+    def _decode(self, chunk: bytes) -> np.ndarray:
+        data = self._remainder + chunk
+        usable = len(data) - len(data) % self._sample_width
+        self._remainder = data[usable:]
+        if self.encoding == "pcm16":
+            samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        else:
+            samples = np.frombuffer(data[:usable], dtype="<f4").astype(np.float32)
+        self.received_seconds += len(samples) / self.sample_rate
+        return self._resampler.process(samples)
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, np.ndarray]]:
+        """Add raw audio and return the windows that became ready"""
+        self._pending = np.concatenate([self._pending, self._decode(chunk)])
+        events = []
+        while len(self._pending) >= self._frame_samples:
+            frame = self._pending[:self._frame_samples]
+            self._pending = self._pending[self._frame_samples:]
+            event = self._process_frame(frame)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _process_frame(self, frame: np.ndarray) -> Optional[Tuple[str, np.ndarray]]:
+        is_speech = frame_energy_db(frame) >= self.threshold_db
+
+        if not self._in_speech:
+            if not is_speech:
+                self._pre_roll.append(frame)
+                return None
+            # Keep a little audio from before the onset so the first syllable is not clipped
+            self._in_speech = True
+            self._utterance = list(self._pre_roll) + [frame]
+            self._pre_roll.clear()
+            self._speech_ms = FRAME_MS
+            return None
+
+        self._utterance.append(frame)
+        self._since_partial_ms += FRAME_MS
+        if is_speech:
+            self._speech_ms += FRAME_MS
+            self._silence_ms = 0
+        else:
+            self._silence_ms += FRAME_MS
+
+        utterance_ms = len(self._utterance) * FRAME_MS
+        if self._silence_ms >= self.silence_ms or utterance_ms >= self.max_utterance_ms:
+            return self._finalize()
+        if self._since_partial_ms >= self.partial_interval_ms:
+            self._since_partial_ms = 0
+            return ("partial", np.concatenate(self._utterance))
+        return None
+
+    def _finalize(self) -> Optional[Tuple[str, np.ndarray]]:
+        # Drop the trailing silence that ended the utterance, except for a short tail
+        keep = len(self._utterance) - max(0, self._silence_ms - PRE_ROLL_MS) // FRAME_MS
+        audio = np.concatenate(self._utterance[:max(keep, 1)])
+        long_enough = self._speech_ms >= self.min_speech_ms
+        self._reset_utterance()
+        # Clicks and breaths shorter than the minimum are not worth a Whisper pass
+        return ("final", audio) if long_enough else None
+
+    def finish(self) -> Optional[np.ndarray]:
+        """Flush the utterance in progress when the client ends the stream"""
+        if self._in_speech and len(self._pending):
+            self._utterance.append(self._pending)
+        self._pending = np.zeros(0, dtype=np.float32)
+        if not self._in_speech:
+            return None
+        event = self._finalize()
+        return event[1] if event is not None else None
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The backend modules import each other by bare name, as when run from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing database creates the schema; keep it away from the real mental_health.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='chatbot-tests-')}/test.db")
@@ -0,0 +1,224 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("aiosqlite")
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from database import ChatMessage, MoodEntry, SessionLocal, get_db, get_read_db
+from llm_client import LLMError
+
+USER = "listing_test_user"
+SERIES_USER = "series_test_user"
+# async def handlers that hand their sync session to a worker pool instead of querying on the event loop
+SYNC_SESSION_OFFLOADED = {"/visualizations/comprehensive_report"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    from chatbot_api import app
+
+    db = SessionLocal()
+    try:
+        start = datetime(2024, 5, 1, 9, 0)
+        db.add_all([MoodEntry(user_id=USER, mood_text=f"entry {i}", mood_rating=5,
+                              date=start + timedelta(hours=i // 2)) for i in range(5)])
+        db.add(MoodEntry(user_id=USER, mood_text="legacy", mood_rating=5))
+        now = datetime.now()
+        db.add_all([MoodEntry(user_id=SERIES_USER, mood_text=f"series {i}", mood_rating=1 + i % 10,
+                              detected_emotions={"joy": round(i % 7 / 10, 2), "sadness": round(i % 5 / 10, 2)},
+                              date=now - timedelta(days=i % 28, hours=i % 3)) for i in range(60)])
+        db.commit()
+        db.execute(update(MoodEntry).where(MoodEntry.user_id == USER, MoodEntry.mood_text == "legacy")
+                   .values(date=None))
+        db.commit()
+    finally:
+        db.close()
+    # Not used as a context manager, so the model warm-up does not start
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 5, 6, 10])
+def test_keyset_pages_skip_entries_without_date(client, page_size):
+    # With six rows, a page of six used to end on the undated row and fail building the cursor
+    seen, params = [], {"limit": page_size, "fields": "id,date"}
+    while True:
+        response = client.get("/mood-entries", params=params, headers={"X-User-Id": USER})
+        assert response.status_code == 200
+        seen.extend(response.json())
+        if "X-Next-Before-Date" not in response.headers:
+            break
+        params = {**params, "before_date": response.headers["X-Next-Before-Date"],
+                  "before_id": response.headers["X-Next-Before-Id"]}
+    dates = [entry["date"] for entry in seen]
+    assert len(seen) == 5 and None not in dates
+    assert dates == sorted(dates, reverse=True)
+    assert len({entry["id"] for entry in seen}) == 5
+
+
+def test_sync_by_id_still_includes_entries_without_date(client):
+    response = client.get("/mood-entries", params={"limit": 100, "after_id": 0, "fields": "id,date,mood_text"},
+                          headers={"X-User-Id": USER})
+    assert response.status_code == 200
+    assert [entry["mood_text"] for entry in response.json()][-1] == "legacy"
+
+
+def test_async_handlers_do_not_query_through_a_sync_session():
+    from chatbot_api import app
+
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or route.path in SYNC_SESSION_OFFLOADED:
+            continue
+        if asyncio.iscoroutinefunction(route.endpoint):
+            dependencies = {dependency.call for dependency in route.dependant.dependencies}
+            assert not dependencies & {get_db, get_read_db}, f"{route.path} blocks the event loop on a sync session"
+
+
+@pytest.mark.parametrize("path", ["/chat", "/chat/stream"])
+def test_chat_without_api_key_is_unavailable(client, monkeypatch, path):
+    import chatbot_api
+
+    monkeypatch.setattr(chatbot_api, "OPENROUTER_API_KEY", None)
+    response = client.post(path, json={"message": "hello"})
+    assert response.status_code == 503
+    assert "OPENROUTER_API_KEY" in response.json()["error"]
+
+    component = chatbot_api.warmup_manager._components["openrouter_api_key"]
+    assert component["required"] and component["fallback"] is None
+    with pytest.raises(RuntimeError):
+        component["loader"]()
+
+
+def stream_chat(client, monkeypatch, tokens, error=None):
+    import chatbot_api
+
+    async def fake_stream(messages, model=None):
+        for token in tokens:
+            yield token
+        if error is not None:
+            raise error
+
+    queued = []
+    monkeypatch.setattr(chatbot_api, "OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(chatbot_api.write_behind, "enqueue", lambda model, **values: queued.append((model, values)))
+    monkeypatch.setattr(chatbot_api.llm_client, "stream_chat_completion", fake_stream)
+    response = client.post("/chat/stream", json={"message": "I feel anxious today"},
+                           headers={"X-User-Id": "stream_test_user"})
+    return response, [(model, values["role"], values["content"]) for model, values in queued]
+
+
+def test_stream_saves_user_message_then_reply(client, monkeypatch):
+    response, queued = stream_chat(client, monkeypatch, ["Let's ", "breathe."])
+    assert "event: done" in response.text
+    assert queued == [(ChatMessage, "user", "I feel anxious today"), (ChatMessage, "bot", "Let's breathe.")]
+
+
+@pytest.mark.parametrize("tokens, error", [
+    (["Let's "], LLMError("upstream closed the stream")),
+    ([], None),
+])
+def test_failed_or_empty_stream_still_saves_user_message(client, monkeypatch, tokens, error):
+    response, queued = stream_chat(client, monkeypatch, tokens, error)
+    assert "event: error" in response.text
+    assert queued == [(ChatMessage, "user", "I feel anxious today")]
+
+
+def test_voice_stream_reports_transcription_failures(client, monkeypatch):
+    np = pytest.importorskip("numpy")
+    import chatbot_api
+
+    calls = []
+
+    async def failing_window(audio, initial_prompt=None):
+        calls.append(len(audio))
+        raise RuntimeError("worker process died")
+
+    monkeypatch.setattr(chatbot_api.transcription_service, "_loaded", True)
+    monkeypatch.setattr(chatbot_api.transcription_service, "transcribe_window", failing_window)
+    # 1.5 s of a loud tone: long enough for a partial window and a final utterance
+    tone = (0.5 * np.sin(2 * np.pi * 220 * np.arange(24000) / 16000) * 32767).astype("<i2")
+    with client.websocket_connect("/ws/voice_to_text") as websocket:
+        for start in range(0, len(tone), 1600):
+            websocket.send_bytes(tone[start:start + 1600].tobytes())
+        websocket.send_text('{"event": "end"}')
+        messages = [websocket.receive_json(), websocket.receive_json()]
+    assert calls
+    assert messages[0] == {"type": "error", "error": "Transcription failed: worker process died"}
+    assert messages[1]["type"] == "end" and messages[1]["text"] == ""
+
+
+def get_series(client, path, **headers):
+    return client.get(f"/analytics/series/{path}", headers={"X-User-Id": SERIES_USER, **headers})
+
+
+@pytest.mark.parametrize("series", ["mood_trend", "emotion_distribution"])
+def test_series_records_and_columnar_hold_the_same_data(client, series):
+    records = get_series(client, f"{series}?format=records").json()
+    columnar = get_series(client, f"{series}?format=columnar").json()
+    assert records["format"] == "records" and columnar["format"] == "columnar"
+    assert records["data"]
+    keys = list(records["data"][0])
+    assert list(columnar["data"]) == keys
+    rebuilt = [dict(zip(keys, values)) for values in zip(*columnar["data"].values())]
+    assert rebuilt == records["data"]
+
+
+def test_series_report_matches_the_single_series(client):
+    report = get_series(client, "report?format=records").json()["data"]
+    for series in ("mood_trend", "emotion_distribution", "mood_emotion_correlation"):
+        assert report[series] == get_series(client, f"{series}?format=records").json()["data"]
+    assert sum(point["count"] for point in report["mood_trend"]) == 60
+
+
+def test_series_rejects_unknown_format(client):
+    response = get_series(client, "mood_trend?format=csv")
+    assert response.status_code == 422
+    assert "format" in response.json()["error"]
+
+
+def test_series_etag_revalidates_with_304(client):
+    response = get_series(client, "mood_trend")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    for if_none_match in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        revalidated = get_series(client, "mood_trend", **{"If-None-Match": if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["ETag"] == etag
+
+    assert get_series(client, "mood_trend", **{"If-None-Match": '"other"'}).status_code == 200
+    # Another representation of the series has its own tag
+    assert get_series(client, "mood_trend?format=records").headers["ETag"] != etag
+
+
+def test_series_gzip_negotiation(client, monkeypatch):
+    import response_encoding
+
+    # Without brotli installed "br" is ignored and gzip is used
+    monkeypatch.setattr(response_encoding, "brotli", None)
+    plain = get_series(client, "report?format=records", **{"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert len(plain.content) >= response_encoding.COMPRESSION_MIN_BYTES
+
+    compressed = get_series(client, "report?format=records", **{"Accept-Encoding": "br, gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert compressed.json() == plain.json()
+
+    refused = get_series(client, "report?format=records", **{"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in refused.headers
+
+
+def test_series_brotli_negotiation(client):
+    pytest.importorskip("brotli")
+    response = get_series(client, "report?format=records", **{"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.json() == get_series(client, "report?format=records",
+                                         **{"Accept-Encoding": "identity"}).json()
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher
+from execution import ServiceOverloadedError
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.001)
+
+
+class BlockingBatch:
+    """process_batch that records its batches and holds each one until released"""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        assert self.release.wait(5)
+        return [item * 2 for item in items]
+
+
+def test_items_queued_during_a_batch_are_collected_together():
+    process = BlockingBatch()
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+    try:
+        first = batcher.submit(1)
+        wait_until(first.running)
+        rest = [batcher.submit(item) for item in range(2, 12)]
+        process.release.set()
+        assert first.result(timeout=5) == 2
+        assert [future.result(timeout=5) for future in rest] == [item * 2 for item in range(2, 12)]
+        # Ten waiting items split at max_batch_size
+        assert process.batches == [[1], list(range(2, 10)), [10, 11]]
+        stats = batcher.get_stats()
+        assert stats["batches"] == 3
+        assert stats["items"] == 11
+        assert stats["largest_batch"] == 8
+    finally:
+        process.release.set()
+        batcher.stop()
+
+
+def test_partial_batch_is_sent_when_the_wait_window_closes():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(list(items)) or list(items), max_batch_size=16,
+                           max_wait_ms=50)
+    try:
+        started = time.perf_counter()
+        futures = [batcher.submit(item) for item in range(3)]
+        assert [future.result(timeout=5) for future in futures] == [0, 1, 2]
+        assert time.perf_counter() - started >= 0.04
+        assert batches == [[0, 1, 2]]
+    finally:
+        batcher.stop()
+
+
+def test_submit_rejects_when_max_pending_is_reached():
+    process = BlockingBatch()
+    batcher = MicroBatcher(process, max_batch_size=1, max_wait_ms=0, max_pending=2, name="test-batcher")
+    try:
+        first = batcher.submit(1)
+        wait_until(first.running)
+        queued = [batcher.submit(2), batcher.submit(3)]
+        with pytest.raises(ServiceOverloadedError) as excinfo:
+            batcher.submit(4)
+        assert excinfo.value.pool_name == "test-batcher"
+        assert batcher.get_stats()["rejected"] == 1
+
+        process.release.set()
+        assert [future.result(timeout=5) for future in [first] + queued] == [2, 4, 6]
+        assert batcher.submit(5).result(timeout=5) == 10
+    finally:
+        process.release.set()
+        batcher.stop()
+
+
+def test_exception_result_fails_only_its_item():
+    def process(items):
+        return [ValueError(f"bad item {item}") if item < 0 else item for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(item) for item in (1, -1, 2)]
+        assert futures[0].result(timeout=5) == 1
+        with pytest.raises(ValueError, match="bad item -1"):
+            futures[1].result(timeout=5)
+        assert futures[2].result(timeout=5) == 2
+    finally:
+        batcher.stop()
+
+
+def test_process_batch_error_fails_the_whole_batch_and_worker_keeps_running():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        if len(calls) == 1:
+            raise RuntimeError("model crashed")
+        return list(items)
+
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(item) for item in (1, 2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(timeout=5)
+        assert batcher.submit(3).result(timeout=5) == 3
+    finally:
+        batcher.stop()
+
+
+def test_wrong_result_count_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(item) for item in (1, 2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="expected 2 results, got 1"):
+                future.result(timeout=5)
+    finally:
+        batcher.stop()
+
+
+def test_cancelled_items_are_skipped():
+    process = BlockingBatch()
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=0)
+    try:
+        first = batcher.submit(1)
+        wait_until(first.running)
+        cancelled = batcher.submit(2)
+        kept = batcher.submit(3)
+        assert cancelled.cancel()
+        process.release.set()
+        assert kept.result(timeout=5) == 6
+        assert process.batches == [[1], [3]]
+    finally:
+        process.release.set()
+        batcher.stop()
+
+
+def test_stop_processes_queued_items_first():
+    process = BlockingBatch()
+    batcher = MicroBatcher(process, max_batch_size=1, max_wait_ms=0)
+    first = batcher.submit(1)
+    wait_until(first.running)
+    queued = batcher.submit(2)
+    process.release.set()
+    batcher.stop()
+    assert first.result(timeout=0) == 2
+    assert queued.result(timeout=0) == 4
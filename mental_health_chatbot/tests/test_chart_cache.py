@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import update
+
+from chart_cache import ChartCache
+from database import MoodEntry, SessionLocal
+
+
+class Renderer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"chart #{self.calls}"
+
+
+def render_both(cache, renders):
+    return [cache.get_or_render("mood_trend", {"days": 30, "user_id": user}, renders[user]) for user in renders]
+
+
+def test_commit_invalidates_only_the_writing_users_charts():
+    cache = ChartCache()
+    renders = {"chart_user_a": Renderer(), "chart_user_b": Renderer()}
+    assert render_both(cache, renders) == ["chart #1", "chart #1"]
+    assert render_both(cache, renders) == ["chart #1", "chart #1"]
+
+    db = SessionLocal()
+    try:
+        db.add(MoodEntry(user_id="chart_user_a", mood_rating=7, date=datetime.utcnow()))
+        db.flush()
+        # Nothing is committed yet, so the cached chart is still current
+        assert render_both(cache, renders) == ["chart #1", "chart #1"]
+        db.commit()
+    finally:
+        db.close()
+    assert render_both(cache, renders) == ["chart #2", "chart #1"]
+    assert cache.get_stats()["size"] == 2  # the stale render of user A was dropped
+
+
+def test_rollback_and_bulk_update_versions():
+    cache = ChartCache()
+    renders = {"chart_user_c": Renderer()}
+    render_both(cache, renders)
+
+    db = SessionLocal()
+    try:
+        db.add(MoodEntry(user_id="chart_user_c", mood_rating=3, date=datetime.utcnow()))
+        db.rollback()
+        assert render_both(cache, renders) == ["chart #1"]
+
+        db.add(MoodEntry(user_id="chart_user_c", mood_rating=3, date=datetime.utcnow()))
+        db.commit()
+        assert render_both(cache, renders) == ["chart #2"]
+
+        db.execute(update(MoodEntry).where(MoodEntry.user_id == "chart_user_c").values(mood_rating=8))
+        db.commit()
+        assert render_both(cache, renders) == ["chart #3"]
+    finally:
+        db.close()
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import conversation_context as context_module
+from conversation_context import ConversationContext
+from database import ChatMessage, SessionLocal
+from write_behind import WriteBehindBuffer
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def turns(count, length=40):
+    """Alternating user/bot rows; each message costs 15 tokens with the default length"""
+    return [("user" if i % 2 == 0 else "bot", f"{i:02d}" + "x" * (length - 2)) for i in range(count)]
+
+
+def make_context(rows, **kwargs):
+    kwargs.setdefault("refresh_seconds", 0)
+    context = ConversationContext(**kwargs)
+
+    async def load_recent(user_id):
+        return list(rows)
+
+    context._load_recent = load_recent
+    return context
+
+
+def test_history_fills_budget_newest_first():
+    context = make_context(turns(10), token_budget=100, summaries_enabled=False)
+    messages = run(context.build_messages("alice", "system", "hi"))
+    history = messages[1:-1]
+    # 100 tokens minus 5 for the new message leaves room for six 15-token turns
+    assert [m["content"][:2] for m in history] == ["04", "05", "06", "07", "08", "09"]
+    assert history[0]["role"] == "user" and history[1]["role"] == "assistant"
+    assert messages[-1] == {"role": "user", "content": "hi"}
+
+
+def test_long_message_pushes_out_turns_and_orphan_reply_is_dropped():
+    context = make_context(turns(10), token_budget=100, summaries_enabled=False)
+    messages = run(context.build_messages("alice", "system", "y" * 200))
+    history = messages[1:-1]
+    # 45 tokens fit three turns (07 bot, 08 user, 09 bot); the leading reply has no question, so it goes
+    assert [(m["role"], m["content"][:2]) for m in history] == [("user", "08"), ("assistant", "09")]
+
+
+def test_summary_is_included_and_counted():
+    context = make_context(turns(4), token_budget=100, summary_share=0.25)
+    conversation = run(context._get("alice"))
+    conversation.summary = "User talked about exams"
+    conversation.summary_tokens = 30
+    messages = run(context.build_messages("alice", "system", "hi"))
+    assert messages[1]["content"].endswith("User talked about exams")
+    # 100 - 30 summary - 5 new message leaves 65 tokens: four turns
+    assert len(messages) == 2 + 4 + 1
+
+
+def test_failed_summary_requeues_messages():
+    calls = []
+
+    async def failing(summary, messages, max_tokens):
+        calls.append(messages)
+        raise RuntimeError("model down")
+
+    async def succeeding(summary, messages, max_tokens):
+        calls.append(messages)
+        return "summary"
+
+    context = make_context(turns(6), token_budget=100, max_messages=4, summary_share=0.25, summary_trigger_tokens=1)
+    context.set_summarizer(failing)
+
+    async def scenario():
+        conversation = await context._get("alice")
+        await asyncio.gather(*list(context._tasks))
+        assert [m["content"][:2] for m in conversation.unsummarized] == ["00", "01"]
+        assert not conversation.summarizing
+
+        context.set_summarizer(succeeding)
+        context.record_turn("alice", "next question", "next answer")
+        await asyncio.gather(*list(context._tasks))
+        return conversation
+
+    conversation = run(scenario())
+    assert len(calls) == 2
+    # The retry folds the requeued messages in first, followed by those pushed out since
+    assert [m["content"][:2] for m in calls[1]] == ["00", "01", "02", "03"]
+    assert conversation.summary == "summary"
+    assert conversation.unsummarized == []
+    stats = context.get_stats()
+    assert stats["summary_failures"] == 1 and stats["summaries"] == 1
+
+
+def test_stale_conversation_is_reloaded_with_its_summary():
+    rows = turns(2)
+    context = make_context(rows, token_budget=100, refresh_seconds=60)
+    conversation = run(context._get("alice"))
+    conversation.summary = "earlier"
+    conversation.loaded_at -= 120
+    rows.extend([("user", "from another worker"), ("bot", "reply")])
+
+    refreshed = run(context._get("alice"))
+    assert refreshed is not conversation
+    assert refreshed.summary == "earlier"
+    assert refreshed.messages[-2]["content"] == "from another worker"
+    assert context.get_stats()["refreshes"] == 1
+
+
+class BlockingBuffer(WriteBehindBuffer):
+    def __init__(self):
+        super().__init__(flush_ms=0)
+        self.release = threading.Event()
+
+    def _commit(self, items):
+        self.release.wait(5)
+        return list(range(len(items)))
+
+
+def test_unflushed_rows_cover_queued_inserts_until_committed():
+    buffer = BlockingBuffer()
+    try:
+        first = buffer.submit(ChatMessage, user_id="alice", role="user", content="queued")
+        buffer.submit(ChatMessage, user_id="bob", role="user", content="other user")
+        assert [row["content"] for row in buffer.unflushed_rows(ChatMessage, user_id="alice")] == ["queued"]
+        buffer.release.set()
+        first.result(timeout=5)
+        assert buffer.unflushed_rows(ChatMessage, user_id="alice") == []
+    finally:
+        buffer.release.set()
+        buffer.stop()
+
+
+def test_load_recent_includes_rows_still_in_write_behind(monkeypatch):
+    pytest.importorskip("aiosqlite")
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.add(ChatMessage(user_id="load_recent_user", role="user", content="stored question",
+                           timestamp=now - timedelta(seconds=2)))
+        db.add(ChatMessage(user_id="load_recent_user", role="bot", content="stored answer",
+                           timestamp=now - timedelta(seconds=1)))
+        db.commit()
+    finally:
+        db.close()
+    queued = [
+        # Committed meanwhile; must not appear twice
+        {"user_id": "load_recent_user", "role": "bot", "content": "stored answer", "timestamp": now - timedelta(seconds=1)},
+        {"user_id": "load_recent_user", "role": "user", "content": "queued question", "timestamp": now},
+    ]
+    monkeypatch.setattr(context_module.write_behind, "unflushed_rows", lambda model, **filters: queued)
+
+    rows = run(ConversationContext()._load_recent("load_recent_user"))
+    assert rows == [("user", "stored question"), ("bot", "stored answer"), ("user", "queued question")]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import update
+
+from data_export import make_cursor, ndjson_export, parse_cursor
+from database import ChatMessage, MoodEntry, SessionLocal
+
+USER = "export_test_user"
+START = datetime(2024, 1, 1, 8, 0)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def export_rows():
+    db = SessionLocal()
+    try:
+        # Two legacy rows without a date, then rows sharing timestamps so ids break the ties
+        db.add_all([MoodEntry(user_id=USER, mood_text="legacy", mood_rating=5, date=None) for _ in range(2)])
+        for index in range(5):
+            db.add(MoodEntry(user_id=USER, mood_text=f"entry {index}", mood_rating=6,
+                             date=START + timedelta(hours=index // 2)))
+        for index in range(4):
+            db.add(ChatMessage(user_id=USER, role="user", content=f"message {index}",
+                               timestamp=START + timedelta(minutes=index)))
+        db.commit()
+        # The column default fills in a missing date on insert, so clear it afterwards like a legacy row
+        db.execute(update(MoodEntry).where(MoodEntry.user_id == USER, MoodEntry.mood_text == "legacy")
+                   .values(date=None))
+        db.commit()
+    finally:
+        db.close()
+
+
+def export(**kwargs):
+    async def collect():
+        return b"".join([chunk async for chunk in ndjson_export(USER, **kwargs)])
+
+    lines = [json.loads(line) for line in asyncio.run(collect()).decode().splitlines()]
+    return lines[1:-1], lines[-1]
+
+
+def test_cursor_round_trip():
+    assert parse_cursor(make_cursor("chat_message", "2024-01-01T08:00:00", 7)) == (1, START, 7)
+    assert parse_cursor(make_cursor("mood_entry", None, 3)) == (0, None, 3)
+    with pytest.raises(ValueError):
+        parse_cursor("unknown:2024-01-01T08:00:00:1")
+
+
+def test_full_export_is_complete():
+    records, trailer = export()
+    assert len(records) == 11
+    assert trailer == {"type": "end", "total_records": 11, "complete": True, "next_cursor": None}
+
+
+def test_exact_limit_reports_complete():
+    records, trailer = export(limit=11)
+    assert len(records) == 11
+    assert trailer["complete"] is True and trailer["next_cursor"] is None
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4])
+def test_paging_resumes_through_null_times_without_gaps(page_size):
+    full, _ = export()
+    paged, cursor = [], None
+    while True:
+        records, trailer = export(cursor=cursor, limit=page_size)
+        paged.extend(records)
+        if trailer["complete"]:
+            break
+        cursor = trailer["next_cursor"]
+        parse_cursor(cursor)
+    assert [(r["type"], r["id"]) for r in paged] == [(r["type"], r["id"]) for r in full]
+    # Rows without a date come first
+    assert [r["date"] for r in paged[:2]] == [None, None]
+
+
+def test_since_skips_rows_without_time():
+    records, trailer = export(since=START + timedelta(hours=1))
+    assert [r["date"] for r in records if r["type"] == "mood_entry"] == [
+        (START + timedelta(hours=1)).isoformat(), (START + timedelta(hours=1)).isoformat(),
+        (START + timedelta(hours=2)).isoformat()]
+    assert all(r["type"] == "mood_entry" for r in records)
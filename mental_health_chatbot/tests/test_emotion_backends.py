@@ -0,0 +1,64 @@
+import sys
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import emotion_backends
+from emotion_backends import check_parity, compare_scores, load_backend
+
+LABELS = ["anger", "joy", "sadness"]
+
+
+class FixedBackend:
+    tensor_type = "np"
+
+    def __init__(self, name, logits):
+        self.name = name
+        self._logits = np.asarray(logits, dtype=np.float32)
+
+    def logits(self, inputs):
+        return self._logits[:len(inputs["input_ids"])]
+
+
+def tokenizer(texts, **kwargs):
+    return {"input_ids": [[1] for _ in texts], "attention_mask": [[1] for _ in texts]}
+
+
+def test_parity_passes_for_matching_scores():
+    reference = FixedBackend("torch", [[2.0, -1.0, 0.0], [-3.0, 1.0, 0.5]])
+    candidate = FixedBackend("onnx_int8", [[2.01, -1.0, 0.0], [-3.0, 1.02, 0.5]])
+    result = check_parity(reference, candidate, tokenizer, ["a", "b"], LABELS)
+    assert result["passed"] and result["top_label_agreement"] == 1.0
+    assert (result["reference"], result["candidate"], result["texts"]) == ("torch", "onnx_int8", 2)
+    assert set(result["per_label_max_abs_diff"]) == set(LABELS)
+
+
+def test_parity_fails_beyond_tolerance_and_reports_the_label():
+    expected = [[0.9, 0.1, 0.2], [0.1, 0.8, 0.3]]
+    actual = [[0.9, 0.1, 0.2], [0.1, 0.2, 0.7]]
+    result = compare_scores(expected, actual, LABELS, tolerance=0.05)
+    assert not result["passed"]
+    assert result["max_abs_diff"] == pytest.approx(0.6)
+    assert result["per_label_max_abs_diff"]["anger"] == 0
+    assert result["top_label_agreement"] == 0.5
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        load_backend("tensorrt", "some/model")
+
+
+@pytest.mark.parametrize("kind, fallback", [("onnx", "TorchBackend"), ("onnx_int8", "QuantizedTorchBackend")])
+def test_onnx_backends_fall_back_to_torch_without_onnxruntime(monkeypatch, kind, fallback):
+    # None in sys.modules makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)
+    transformers = types.ModuleType("transformers")
+    transformers.AutoModelForSequenceClassification = types.SimpleNamespace(from_pretrained=lambda name: "model")
+    monkeypatch.setitem(sys.modules, "transformers", transformers)
+    for name in ("TorchBackend", "QuantizedTorchBackend"):
+        monkeypatch.setattr(emotion_backends, name, lambda model, name=name: (name, model))
+    monkeypatch.setattr(emotion_backends, "export_onnx", lambda *args, **kwargs: pytest.fail("exported without onnxruntime"))
+
+    assert load_backend(kind, "some/model") == (fallback, "model")
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from emotion_cache import EmotionCache
+from emotion_detection import EmotionDetector
+
+SCORES = {"joy": 0.75, "sadness": 0.25}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmotionCache("model:1:torch", max_entries=2)
+    cache.put("first", SCORES)
+    cache.put("second", SCORES)
+    assert cache.get("first") == SCORES  # now the most recently used
+    cache.put("third", SCORES)
+    assert cache.get("second") is None
+    assert cache.get("first") == SCORES and cache.get("third") == SCORES
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = EmotionCache("model:1:torch", ttl_seconds=0.05)
+    cache.put("I feel fine", SCORES)
+    assert cache.get("I feel fine") == SCORES
+    time.sleep(0.1)
+    assert cache.get("I feel fine") is None
+    stats = cache.get_stats()
+    assert stats["expirations"] == 1 and stats["size"] == 0
+
+
+def test_normalized_text_shares_an_entry():
+    cache = EmotionCache("model:1:torch")
+    cache.put("I feel  FINE", SCORES)
+    assert cache.get("i feel fine") == SCORES
+
+
+def test_namespaces_do_not_share_results(tmp_path):
+    db_path = str(tmp_path / "emotions.db")
+    torch_cache = EmotionCache("model:1:torch", db_path=db_path)
+    torch_cache.put("I feel fine", SCORES)
+    for namespace in ("model:2:torch", "model:1:onnx_int8", "other-model:1:torch"):
+        assert EmotionCache(namespace, db_path=db_path).get("I feel fine") is None
+    # Same namespace after a restart: served from the persistent tier
+    restarted = EmotionCache("model:1:torch", db_path=db_path)
+    assert restarted.get("I feel fine") == SCORES
+    assert restarted.get_stats()["disk_hits"] == 1
+
+
+def test_memory_only_lookup_leaves_the_persistent_tier_to_the_caller(tmp_path):
+    db_path = str(tmp_path / "emotions.db")
+    EmotionCache("model:1:torch", db_path=db_path).put("I feel fine", SCORES)
+    cache = EmotionCache("model:1:torch", db_path=db_path)
+    assert cache.get("I feel fine", memory_only=True) is None
+    assert cache.get_persistent("I feel fine") == SCORES
+    assert cache.get("I feel fine", memory_only=True) == SCORES
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["disk_hits"]) == (2, 0, 1)
+
+
+def test_async_detection_keeps_sqlite_off_the_event_loop(tmp_path, monkeypatch):
+    detector = EmotionDetector(batching=True, max_wait_ms=0)
+    detector.backend = object()  # Loaded, as far as the detector can tell
+    monkeypatch.setattr(detector, "_predict", lambda texts: [dict(SCORES) for _ in texts])
+    detector.cache = EmotionCache("model:1:torch", db_path=str(tmp_path / "emotions.db"))
+
+    disk_threads = []
+    for name in ("get", "put"):
+        method = getattr(detector.cache._disk, name)
+
+        def record(*args, _method=method):
+            disk_threads.append(threading.current_thread())
+            return _method(*args)
+        monkeypatch.setattr(detector.cache._disk, name, record)
+
+    async def detect_twice():
+        first = await detector.detect_emotions_async("I feel fine")
+        second = await detector.detect_emotions_async("I feel fine")
+        return first, second, threading.current_thread()
+
+    try:
+        first, second, loop_thread = asyncio.run(detect_twice())
+    finally:
+        detector.batcher.stop()
+    assert first == second == SCORES
+    assert len(disk_threads) == 2  # one lookup and one write, both on the batcher thread
+    assert loop_thread not in disk_threads
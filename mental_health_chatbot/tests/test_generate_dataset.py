@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import func, select
+
+from database import ChatMessage, DailyMoodRollup, MoodEntry, SelfHelpActivity, engine
+from generate_dataset import generate, generate_user, remove_users
+from rollups import backfill
+
+END = datetime(2024, 6, 1)
+MODELS = {"mood": MoodEntry, "chat": ChatMessage, "activity": SelfHelpActivity}
+
+
+def count_rows(model, prefix):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(model).where(model.user_id.startswith(prefix, autoescape=True))
+        ).scalar()
+
+
+def test_generate_user_is_deterministic_per_seed_and_user():
+    rows = generate_user("gen_user_0", seed=7, days=60, end=END)
+    assert rows == generate_user("gen_user_0", seed=7, days=60, end=END)
+    assert rows != generate_user("gen_user_0", seed=8, days=60, end=END)
+    assert rows != generate_user("gen_user_1", seed=7, days=60, end=END)
+    assert rows["mood"] and rows["chat"]
+
+    for entry in rows["mood"]:
+        assert entry["user_id"] == "gen_user_0"
+        assert 1 <= entry["mood_rating"] <= 10
+        assert entry["date"] < END
+    bots = [message for message in rows["chat"] if message["role"] == "bot"]
+    assert len(bots) * 2 == len(rows["chat"])
+
+
+def stored_rows(prefix):
+    with engine.connect() as conn:
+        return {
+            name: sorted(
+                tuple(str(value) for key, value in row._mapping.items() if key != "id")
+                for row in conn.execute(select(model.__table__).where(model.user_id.startswith(prefix, autoescape=True)))
+            )
+            for name, model in MODELS.items()
+        }
+
+
+def test_batch_and_transaction_sizes_do_not_change_the_data():
+    counts = generate(4, 30, seed=3, prefix="gen_batch_", batch_size=7, rows_per_transaction=20, end=END)
+    expected = {name: 0 for name in MODELS}
+    for index in range(4):
+        for name, rows in generate_user(f"gen_batch_{index}", 3, 30, END).items():
+            expected[name] += len(rows)
+    assert counts == expected
+    small_batches = stored_rows("gen_batch_")
+    assert {name: len(rows) for name, rows in small_batches.items()} == expected
+
+    # With the same seed a rerun reproduces the dataset, whatever the batching
+    remove_users("gen_batch_")
+    assert generate(4, 30, seed=3, prefix="gen_batch_", batch_size=10000, rows_per_transaction=200000,
+                    end=END) == counts
+    assert stored_rows("gen_batch_") == small_batches
+
+
+def test_remove_users_only_deletes_the_prefix_and_its_rollups():
+    counts = generate(2, 20, seed=5, prefix="gen_rm_", batch_size=100, rows_per_transaction=1000, end=END)
+    # "_" is a LIKE wildcard; this user must survive removing "gen_rm_"
+    kept = generate(1, 20, seed=5, prefix="gen-rm-", batch_size=100, rows_per_transaction=1000, end=END)
+    backfill()
+    assert count_rows(DailyMoodRollup, "gen_rm_") > 0
+
+    assert remove_users("gen_rm_") == sum(counts.values())
+    for name, model in MODELS.items():
+        assert count_rows(model, "gen_rm_") == 0
+        assert count_rows(model, "gen-rm-") == kept[name]
+    assert count_rows(DailyMoodRollup, "gen_rm_") == 0
+    assert count_rows(DailyMoodRollup, "gen-rm-") > 0
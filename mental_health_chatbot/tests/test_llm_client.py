@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from llm_client import LLMClient, LLMError, CircuitBreaker, CircuitOpenError, RetryBudget
+
+
+def make_client(handler, max_retries=2, failure_threshold=2, reset_seconds=0.05):
+    client = LLMClient(api_key="test", base_url="http://upstream.test/api/v1", max_retries=max_retries)
+    client.circuit_breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_seconds=reset_seconds)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    client._backoff = lambda attempt: 0
+    return client
+
+
+def completion(text="hello"):
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.before_request()
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_breaker_allows_one_probe_when_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_request()
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0)
+    for _ in range(5):
+        breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_retry_budget_limits_retries_to_ratio():
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0, window_seconds=60)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+
+
+def test_retryable_status_is_retried_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(json.loads(request.content))
+        return httpx.Response(503) if len(calls) == 1 else completion("ok")
+
+    client = make_client(handler)
+    client.retry_budget = RetryBudget(ratio=1.0, min_retries_per_second=0, window_seconds=60)
+    result = run(client.chat_completion([{"role": "user", "content": "hi"}], model="m"))
+    assert result["choices"][0]["message"]["content"] == "ok"
+    assert len(calls) == 2
+    assert client.get_stats()["retries"] == 1
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_exhausted_retry_budget_stops_retrying():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(502)
+
+    client = make_client(handler, failure_threshold=10)
+    client.retry_budget = RetryBudget(ratio=0, min_retries_per_second=0, window_seconds=60)
+    with pytest.raises(LLMError) as error:
+        run(client.chat_completion([{"role": "user", "content": "hi"}], model="m"))
+    assert error.value.status_code == 502
+    assert len(calls) == 1
+    assert client.get_stats()["retry_budget_exhausted"] == 1
+
+
+def test_client_error_is_not_retried_and_keeps_breaker_closed():
+    client = make_client(lambda request: httpx.Response(400, text="bad request"), failure_threshold=1)
+    with pytest.raises(LLMError) as error:
+        run(client.chat_completion([], model="m"))
+    assert error.value.status_code == 400
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_transport_error_message_has_single_prefix():
+    def handler(request):
+        raise httpx.ConnectError("connection refused")
+
+    client = make_client(handler, max_retries=0)
+    with pytest.raises(LLMError) as error:
+        run(client.chat_completion([], model="m"))
+    assert str(error.value) == "Error contacting model: connection refused"
+
+
+def test_cancelled_half_open_probe_releases_breaker():
+    release = asyncio.Event()
+
+    async def handler(request):
+        await release.wait()
+        return completion()
+
+    client = make_client(handler, failure_threshold=1, reset_seconds=0)
+    client.circuit_breaker.record_failure()
+
+    async def scenario():
+        probe = asyncio.create_task(client.chat_completion([], model="m"))
+        await asyncio.sleep(0.01)
+        assert client.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # Another request may probe instead of being rejected until restart
+        release.set()
+        return await client.chat_completion([], model="m")
+
+    result = run(scenario())
+    assert result["choices"][0]["message"]["content"] == "hello"
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unmapped_http_error_during_probe_reopens_breaker():
+    def handler(request):
+        raise httpx.TooManyRedirects("redirect loop", request=request)
+
+    client = make_client(handler, failure_threshold=1, reset_seconds=0)
+    client.circuit_breaker.record_failure()
+    with pytest.raises(httpx.TooManyRedirects):
+        run(client.chat_completion([], model="m"))
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+    assert not client.circuit_breaker._probe_in_flight
+
+
+def test_in_band_stream_error_counts_against_breaker():
+    body = b'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\ndata: {"error": {"message": "overloaded"}}\n\n'
+    client = make_client(lambda request: httpx.Response(200, content=body), failure_threshold=1)
+
+    async def consume():
+        tokens = []
+        async for token in client.stream_chat_completion([], model="m"):
+            tokens.append(token)
+        return tokens
+
+    with pytest.raises(LLMError):
+        run(consume())
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+
+
+def test_stream_yields_tokens_until_done():
+    body = (b'data: {"choices": [{"delta": {"content": "Hello"}}]}\n\n'
+            b': keep-alive\n\n'
+            b'data: {"choices": [{"delta": {"content": " there"}}]}\n\n'
+            b'data: [DONE]\n\n')
+    client = make_client(lambda request: httpx.Response(200, content=body))
+
+    async def consume():
+        return [token async for token in client.stream_chat_completion([], model="m")]
+
+    assert run(consume()) == ["Hello", " there"]
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
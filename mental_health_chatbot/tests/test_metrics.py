@@ -0,0 +1,93 @@
+import re
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from metrics import MetricsMiddleware, MetricsRegistry
+
+DURATION = "chatbot_http_request_duration_seconds"
+
+
+def series_count(text, metric, **labels):
+    """Observation count of the one series of metric whose labels include labels"""
+    counts = []
+    for line in text.splitlines():
+        match = re.fullmatch(rf"{metric}_count\{{(.*)\}} (\d+)", line)
+        if match and all(f'{name}="{value}"' in match.group(1) for name, value in labels.items()):
+            counts.append(int(match.group(2)))
+    assert len(counts) <= 1, f"several {metric} series match {labels}"
+    return counts[0] if counts else 0
+
+
+@pytest.fixture
+def scrape():
+    registry = MetricsRegistry()
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    @app.post("/echo")
+    async def echo(payload: dict):
+        return payload
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"x" * 300, b"y" * 300]), media_type="text/plain")
+
+    client = TestClient(app)
+    return client, registry.render
+
+
+def test_requests_are_labelled_by_route_template(scrape):
+    client, render = scrape
+    for item_id in (1, 2, 3):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    assert client.get("/items/not-a-number").status_code == 422
+
+    text = render()
+    assert series_count(text, DURATION, method="GET", route="/items/{item_id}", status=200) == 3
+    assert series_count(text, DURATION, method="GET", route="/items/{item_id}", status=422) == 1
+    assert 'route="/items/1"' not in text and 'route="/items/not-a-number"' not in text
+
+
+def test_unmatched_paths_share_one_label(scrape):
+    client, render = scrape
+    for path in ("/missing", "/also/missing", "/items"):
+        assert client.get(path).status_code == 404
+
+    text = render()
+    assert series_count(text, DURATION, method="GET", route="unmatched", status=404) == 3
+    assert "/missing" not in text
+
+
+def test_payload_sizes_include_streamed_bodies(scrape):
+    client, render = scrape
+    assert client.post("/echo", json={"message": "hello"}).status_code == 200
+    assert len(client.get("/stream").content) == 600
+
+    text = render()
+    assert series_count(text, "chatbot_http_request_size_bytes", route="/echo") == 1
+    assert 'chatbot_http_response_size_bytes_sum{route="/stream"} 600' in text
+    assert "chatbot_http_requests_in_progress 0" in text
+
+
+def test_api_labels_path_parameters_by_template():
+    pytest.importorskip("aiosqlite")
+    from chatbot_api import app
+
+    client = TestClient(app)
+    before = series_count(client.get("/metrics").text, DURATION, route="/transcriptions/{job_id}", status=404)
+    assert client.get("/transcriptions/no-such-job").status_code == 404
+
+    text = client.get("/metrics").text
+    assert series_count(text, DURATION, route="/transcriptions/{job_id}", status=404) == before + 1
+    assert "no-such-job" not in text
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import delete, insert, select, update
+
+import rollups
+from database import DailyEmotionRollup, DailyMoodRollup, MoodEntry, SessionLocal, engine, rebuild_rollups
+
+USER = "rollup_test_user"
+
+
+def rollup_rows(user=USER):
+    with engine.connect() as conn:
+        moods = conn.execute(
+            select(DailyMoodRollup.day, DailyMoodRollup.entry_count, DailyMoodRollup.rating_count,
+                   DailyMoodRollup.rating_sum, DailyMoodRollup.rating_sq_sum)
+            .where(DailyMoodRollup.user_id == user).order_by(DailyMoodRollup.day)
+        ).all()
+        emotions = conn.execute(
+            select(DailyEmotionRollup.day, DailyEmotionRollup.emotion, DailyEmotionRollup.entry_count,
+                   DailyEmotionRollup.score_sum)
+            .where(DailyEmotionRollup.user_id == user)
+            .order_by(DailyEmotionRollup.day, DailyEmotionRollup.emotion)
+        ).all()
+    return [tuple(row) for row in moods], [tuple(row) for row in emotions]
+
+
+def test_orm_increments_match_rebuild():
+    start = datetime(2024, 3, 1, 23, 30)
+    db = SessionLocal()
+    try:
+        entries = [
+            MoodEntry(user_id=USER, date=start + timedelta(hours=hours), mood_rating=rating,
+                      detected_emotions=emotions, mood_text="entry")
+            for hours, rating, emotions in [
+                (0, 4, {"sadness": 0.7, "fear": 0.2}),
+                (1, 6, {"joy": 0.5}),  # next UTC day
+                (2, None, {"joy": 0.25, "sadness": 0.1}),
+                (26, 8, None),
+                (27, 7, ["optimism"]),
+            ]
+        ]
+        db.add_all(entries[:3])
+        db.commit()
+        db.add_all(entries[3:])
+        db.commit()
+        # Edits and deletes go through the recompute path
+        entries[1].mood_rating = 9
+        entries[1].date = start + timedelta(hours=25)
+        db.delete(entries[4])
+        db.commit()
+    finally:
+        db.close()
+
+    incremental = rollup_rows()
+    with engine.begin() as conn:
+        rebuild_rollups(conn, user_id=USER)
+    rebuilt = rollup_rows()
+
+    assert [row[:3] for row in incremental[0]] == [row[:3] for row in rebuilt[0]]
+    assert [row[3:] for row in incremental[0]] == pytest.approx([row[3:] for row in rebuilt[0]])
+    assert [row[:3] for row in incremental[1]] == [row[:3] for row in rebuilt[1]]
+    assert [row[3] for row in incremental[1]] == pytest.approx([row[3] for row in rebuilt[1]])
+    assert [row[0] for row in rebuilt[0]] == [start.date(), (start + timedelta(days=1)).date(),
+                                              (start + timedelta(days=2)).date()]
+
+
+def test_recent_days_is_a_window_of_whole_utc_days():
+    start_day, end_day = rollups.recent_days(7)
+    assert end_day == datetime.utcnow().date()
+    assert (end_day - start_day).days == 6
+
+
+def test_bulk_update_and_delete_recompute_rollups():
+    user = "rollup_bulk_user"
+    day = datetime(2024, 4, 2, 9)
+    db = SessionLocal()
+    try:
+        db.add(MoodEntry(user_id=user, date=day, mood_rating=2, detected_emotions={"sadness": 0.8}))
+        db.commit()
+        assert rollup_rows(user)[0] == [(day.date(), 1, 1, 2.0, 4.0)]
+
+        db.execute(update(MoodEntry).where(MoodEntry.user_id == user).values(mood_rating=9))
+        db.commit()
+        assert rollup_rows(user)[0] == [(day.date(), 1, 1, 9.0, 81.0)]
+
+        db.query(MoodEntry).filter(MoodEntry.user_id == user).update({"mood_rating": 5})
+        db.commit()
+        assert rollup_rows(user)[0] == [(day.date(), 1, 1, 5.0, 25.0)]
+
+        db.execute(delete(MoodEntry).where(MoodEntry.user_id == user))
+        db.commit()
+        assert rollup_rows(user) == ([], [])
+    finally:
+        db.close()
+
+
+def test_bulk_insert_and_reassignment_recompute_rollups():
+    user, other = "rollup_bulk_insert_user", "rollup_bulk_other_user"
+    day = datetime(2024, 4, 5, 18)
+    db = SessionLocal()
+    try:
+        db.execute(insert(MoodEntry), [
+            {"user_id": user, "date": day, "mood_rating": 4, "detected_emotions": {"joy": 0.5}},
+            {"user_id": user, "date": day, "mood_rating": 6, "detected_emotions": None},
+        ])
+        db.commit()
+        assert rollup_rows(user)[0] == [(day.date(), 2, 2, 10.0, 52.0)]
+        assert rollup_rows(user)[1] == [(day.date(), "joy", 1, 0.5)]
+
+        # Moving entries to another user fixes the rollups of both
+        db.execute(update(MoodEntry).where(MoodEntry.user_id == user, MoodEntry.mood_rating == 6)
+                   .values(user_id=other))
+        db.commit()
+        assert rollup_rows(user)[0] == [(day.date(), 1, 1, 4.0, 16.0)]
+        assert rollup_rows(other)[0] == [(day.date(), 1, 1, 6.0, 36.0)]
+    finally:
+        db.close()
+
+
+def test_rolled_back_bulk_update_leaves_rollups_unchanged():
+    user = "rollup_bulk_rollback_user"
+    day = datetime(2024, 4, 8, 12)
+    db = SessionLocal()
+    try:
+        db.add(MoodEntry(user_id=user, date=day, mood_rating=3))
+        db.commit()
+        db.execute(update(MoodEntry).where(MoodEntry.user_id == user).values(mood_rating=10))
+        db.rollback()
+        assert rollup_rows(user)[0] == [(day.date(), 1, 1, 3.0, 9.0)]
+    finally:
+        db.close()
@@ -0,0 +1,78 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from semantic_cache import SemanticCache, CACHEABLE_INTENTS
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache(enabled=False, scope="global", threshold=0.9, max_entries=4, intent_threshold=0.8)
+    # Two allowlisted intents along the first two axes
+    cache._intent_vectors = np.stack([unit(1, 0, 0), unit(0, 1, 0)])
+    cache._intent_names = ["breathing", "sleep"]
+    return cache
+
+
+@pytest.mark.parametrize("message", [
+    "Is life worth living?",
+    "What is the point of living?",
+    "How many pills are too many?",
+    "How do people stop wanting to wake up?",
+    "Why does everything feel so pointless?",
+    "How do you end it all?",
+    "How can I hurt less?",
+])
+def test_risk_messages_are_not_cacheable(cache, message):
+    assert not cache.is_cacheable(message)
+
+
+@pytest.mark.parametrize("message", [
+    "I feel anxious about tomorrow, any breathing tips?",
+    "How can my partner sleep better?",
+    "Can you explain that again?",
+    "Tell me more",
+    "Call me at 555 0100",
+])
+def test_personal_and_follow_up_messages_are_not_cacheable(cache, message):
+    assert not cache.is_cacheable(message)
+
+
+def test_long_messages_are_not_cacheable(cache):
+    assert not cache.is_cacheable("How can I sleep better " * 10)
+
+
+def test_distress_emotion_blocks_cache(cache):
+    assert cache.is_cacheable("How can I sleep better?", {"joy": 0.9})
+    assert not cache.is_cacheable("How can I sleep better?", {"sadness": 0.7})
+
+
+def test_allowlist_examples_pass_text_checks(cache):
+    for examples in CACHEABLE_INTENTS.values():
+        for example in examples:
+            assert cache.is_cacheable(example), example
+
+
+def test_match_intent_requires_closeness_to_allowlist(cache):
+    assert cache.match_intent(unit(0.95, 0.1, 0.05)) == "breathing"
+    assert cache.match_intent(unit(0.05, 1, 0)) == "sleep"
+    assert cache.match_intent(unit(0, 0, 1)) is None
+    assert cache.match_intent(unit(1, 1, 0.2)) is None
+    assert cache.get_stats()["off_intent"] == 2
+
+
+def test_match_intent_rejects_everything_before_model_loads():
+    cache = SemanticCache(enabled=False)
+    assert cache.match_intent(unit(1, 0, 0)) is None
+
+
+def test_user_scope_keeps_replies_private(cache):
+    cache.scope = "user"
+    cache.store(unit(1, 0, 0), "alice", "Try box breathing")
+    assert cache.lookup(unit(1, 0, 0), "alice") == "Try box breathing"
+    assert cache.lookup(unit(1, 0, 0), "bob") is None
@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from streaming_stt import StreamResampler, StreamingTranscriber, WHISPER_SAMPLE_RATE
+
+
+def feed_in_chunks(resampler, audio, sizes):
+    parts, start, index = [], 0, 0
+    while start < len(audio):
+        size = sizes[index % len(sizes)]
+        parts.append(resampler.process(audio[start:start + size]))
+        start += size
+        index += 1
+    return np.concatenate(parts)
+
+
+@pytest.mark.parametrize("rate", [8000, 22050, 44100, 48000])
+def test_chunked_resampling_matches_one_pass(rate):
+    audio = np.sin(np.linspace(0, 400, rate * 2)).astype(np.float32)
+    whole = StreamResampler(rate).process(audio)
+    chunked = feed_in_chunks(StreamResampler(rate), audio, [1, 7, 333, 1024, 4095])
+    assert len(chunked) == len(whole)
+    np.testing.assert_allclose(chunked, whole, atol=1e-6)
+
+
+@pytest.mark.parametrize("rate", [8000, 22050, 44100])
+def test_resampled_length_does_not_drift(rate):
+    resampler = StreamResampler(rate)
+    total = 0
+    for _ in range(500):
+        total += len(resampler.process(np.zeros(rate // 50 + 3, dtype=np.float32)))
+    received = 500 * (rate // 50 + 3)
+    assert abs(total - received * WHISPER_SAMPLE_RATE / rate) <= 1
+
+
+def test_resampled_values_follow_the_signal():
+    rate = 44100
+    t = np.arange(rate) / rate
+    resampler = StreamResampler(rate)
+    output = feed_in_chunks(resampler, np.sin(2 * np.pi * 220 * t).astype(np.float32), [441, 1000])
+    expected = np.sin(2 * np.pi * 220 * np.arange(len(output)) / WHISPER_SAMPLE_RATE)
+    np.testing.assert_allclose(output, expected, atol=1e-3)
+
+
+def test_native_rate_passes_through():
+    audio = np.arange(10, dtype=np.float32)
+    assert StreamResampler(WHISPER_SAMPLE_RATE).process(audio) is audio
+
+
+def test_transcriber_frames_do_not_depend_on_chunking():
+    rate = 44100
+    pcm = (np.sin(np.linspace(0, 2000, rate * 3)) * 12000).astype("<i2").tobytes()
+
+    def received_samples(chunk_bytes):
+        transcriber = StreamingTranscriber(sample_rate=rate)
+        for start in range(0, len(pcm), chunk_bytes):
+            transcriber.feed(pcm[start:start + chunk_bytes])
+        return transcriber._resampler._emitted
+
+    assert received_samples(882) == received_samples(4097) == received_samples(len(pcm))
@@ -0,0 +1,66 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("gtts")
+
+import transcription
+from metrics import MODEL_INFERENCE_SECONDS
+from transcription import TranscriptionService
+
+
+class UnloadableProcessor:
+    def __init__(self, model_size, num_threads):
+        self.is_loaded = False
+
+    def load_whisper_model(self):
+        pass
+
+
+def test_worker_initializer_raises_when_model_fails_to_load(monkeypatch):
+    monkeypatch.setattr(transcription, "VoiceProcessor", UnloadableProcessor)
+    with pytest.raises(RuntimeError):
+        transcription._init_worker("base", 1)
+
+
+def test_cancelled_job_reports_failure():
+    service = TranscriptionService(workers=1)
+    future = Future()
+    future.cancel()
+    service._jobs["job"] = {"user_id": "alice", "future": future, "created_at": 0.0}
+    status = service.get_job("job", "alice")
+    assert status["status"] == "failed"
+    assert service.get_job("job", "bob") is None
+
+
+def test_finished_job_reports_result():
+    service = TranscriptionService(workers=1)
+    future = Future()
+    future.set_result({"text": "hello", "audio_seconds": 1.0, "processing_seconds": 0.1, "real_time_factor": 0.1})
+    service._jobs["job"] = {"user_id": "alice", "future": future, "created_at": 0.0}
+    status = service.get_job("job", "alice")
+    assert status["status"] == "completed"
+    assert status["text"] == "hello"
+
+
+class WindowProcessor:
+    def transcribe_window(self, audio, initial_prompt=None):
+        return "hello there"
+
+
+def test_window_transcriptions_record_inference_time(monkeypatch):
+    monkeypatch.setattr(transcription, "_worker_processor", WindowProcessor())
+    pool = ThreadPoolExecutor(max_workers=1)
+    service = TranscriptionService(workers=1)
+    monkeypatch.setattr(service, "_get_pool", lambda: pool)
+    observed = sum(MODEL_INFERENCE_SECONDS.labels("whisper").snapshot()[0])
+    try:
+        text = asyncio.run(service.transcribe_window(np.zeros(16000, dtype=np.float32)))
+    finally:
+        pool.shutdown()
+    assert text == "hello there"
+    assert sum(MODEL_INFERENCE_SECONDS.labels("whisper").snapshot()[0]) == observed + 1
+    stats = service.get_stats()
+    assert stats["completed"] == 1 and stats["audio_seconds"] == 1.0 and stats["in_flight"] == 0
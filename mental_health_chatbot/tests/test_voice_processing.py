@@ -0,0 +1,120 @@
+import base64
+import io
+import os
+import subprocess
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("gtts")
+
+import voice_processing
+from voice_processing import VoiceProcessor, decode_audio
+
+
+def wav_bytes(samples, rate=8000, channels=1, sample_width=2):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class FakeFfmpeg:
+    """Stand-in for subprocess.run that records each ffmpeg call"""
+
+    def __init__(self, fail_on_pipe=False):
+        self.fail_on_pipe = fail_on_pipe
+        self.calls = []
+
+    def __call__(self, cmd, input=None, capture_output=False, check=False):
+        source = cmd[cmd.index("-i") + 1]
+        self.calls.append({"source": source, "input": input,
+                           "exists": source == "pipe:0" or os.path.exists(source)})
+        if source == "pipe:0" and self.fail_on_pipe:
+            raise subprocess.CalledProcessError(1, cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=np.array([16384, -16384], dtype="<i2").tobytes())
+
+
+@pytest.fixture
+def no_temp_files(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("audio should not touch the disk")
+    monkeypatch.setattr(voice_processing.tempfile, "NamedTemporaryFile", fail)
+
+
+def test_wav_is_decoded_in_memory_to_16k_mono(no_temp_files, monkeypatch):
+    monkeypatch.setattr(voice_processing.subprocess, "run", FakeFfmpeg())
+    left = np.full(800, 16384, dtype="<i2")
+    right = np.full(800, -8192, dtype="<i2")
+    stereo = np.column_stack([left, right]).ravel()
+
+    audio = decode_audio(wav_bytes(stereo, rate=8000, channels=2), "wav")
+    assert audio.dtype == np.float32
+    assert len(audio) == 1600  # 0.1 s at 16 kHz
+    assert np.allclose(audio, (0.5 - 0.25) / 2)
+    assert voice_processing.subprocess.run.calls == []
+
+
+def test_wav_that_is_not_16_bit_pcm_goes_through_ffmpeg(no_temp_files, monkeypatch):
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(voice_processing.subprocess, "run", ffmpeg)
+    data = wav_bytes(np.full(100, 200, dtype=np.uint8), sample_width=1)
+
+    assert np.allclose(decode_audio(data, "wav"), [0.5, -0.5])
+    assert ffmpeg.calls == [{"source": "pipe:0", "input": data, "exists": True}]
+
+
+def test_other_formats_are_piped_to_ffmpeg(no_temp_files, monkeypatch):
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(voice_processing.subprocess, "run", ffmpeg)
+
+    assert np.allclose(decode_audio(b"ogg bytes", "ogg"), [0.5, -0.5])
+    assert ffmpeg.calls == [{"source": "pipe:0", "input": b"ogg bytes", "exists": True}]
+
+
+def test_pipe_failures_are_raised_for_streamable_formats(no_temp_files, monkeypatch):
+    monkeypatch.setattr(voice_processing.subprocess, "run", FakeFfmpeg(fail_on_pipe=True))
+    with pytest.raises(subprocess.CalledProcessError):
+        decode_audio(b"broken mp3", "mp3")
+
+
+def test_mp4_family_falls_back_to_a_temp_file_that_is_removed(monkeypatch):
+    ffmpeg = FakeFfmpeg(fail_on_pipe=True)
+    monkeypatch.setattr(voice_processing.subprocess, "run", ffmpeg)
+
+    assert np.allclose(decode_audio(b"moov last", "m4a"), [0.5, -0.5])
+    pipe_call, file_call = ffmpeg.calls
+    assert pipe_call["source"] == "pipe:0"
+    assert file_call["source"].endswith(".m4a") and file_call["exists"] and file_call["input"] is None
+    assert not os.path.exists(file_call["source"])
+
+
+def test_text_to_speech_is_written_to_a_buffer(monkeypatch):
+    class FakeTTS:
+        def __init__(self, text, lang, slow):
+            self.text = text
+
+        def write_to_fp(self, fp):
+            fp.write(b"ID3" + self.text.encode())
+
+        def save(self, path):
+            raise AssertionError("speech should not touch the disk")
+
+    monkeypatch.setattr(voice_processing, "gTTS", FakeTTS)
+    processor = VoiceProcessor()
+
+    assert processor.text_to_speech_bytes("hello") == b"ID3hello"
+    assert base64.b64decode(processor.text_to_speech("hello")) == b"ID3hello"
+
+
+def test_upload_transcribes_the_decoded_array(no_temp_files, monkeypatch):
+    processor = VoiceProcessor()
+    received = []
+    monkeypatch.setattr(processor, "transcribe_array", lambda audio: received.append(audio) or "hi")
+
+    assert processor.process_audio_upload(wav_bytes(np.zeros(1600, dtype="<i2"), rate=16000)) == "hi"
+    assert len(received) == 1 and len(received[0]) == 1600
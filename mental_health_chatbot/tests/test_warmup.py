@@ -0,0 +1,46 @@
+from warmup import WarmupManager
+
+
+def failing_loader():
+    raise RuntimeError("model download failed")
+
+
+def test_required_component_failure_blocks_readiness():
+    manager = WarmupManager()
+    manager.register("whisper_workers", failing_loader)
+    manager._run()
+    status = manager.get_status()
+    assert not status["ready"]
+    assert status["components"]["whisper_workers"]["status"] == "failed"
+    assert status["components"]["whisper_workers"]["error"] == "model download failed"
+
+
+def test_component_with_fallback_is_degraded_but_ready():
+    manager = WarmupManager()
+    manager.register("emotion_model", failing_loader, fallback="keyword emotion detection")
+    manager.register("whisper_workers", lambda: None)
+    manager._run()
+    status = manager.get_status()
+    assert status["ready"]
+    assert status["degraded"] == ["emotion_model"]
+    component = status["components"]["emotion_model"]
+    assert component["status"] == "degraded"
+    assert component["error"] == "model download failed"
+    assert component["fallback"] == "keyword emotion detection"
+
+
+def test_loader_that_swallows_errors_is_caught_by_is_loaded():
+    manager = WarmupManager()
+    manager.register("emotion_model", lambda: None, is_loaded=lambda: False, fallback="keyword emotion detection")
+    manager._run()
+    component = manager.get_status()["components"]["emotion_model"]
+    assert component["status"] == "degraded"
+    assert component["error"]
+
+
+def test_pending_components_are_not_ready():
+    manager = WarmupManager()
+    manager.register("emotion_model", lambda: None, fallback="keyword emotion detection")
+    assert not manager.is_ready()
+    manager._run()
+    assert manager.is_ready() and manager.get_status()["degraded"] == []
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from database import ChatMessage
+from write_behind import WriteBehindBuffer
+
+
+class FailingBuffer(WriteBehindBuffer):
+    def _commit(self, items):
+        raise RuntimeError("database is locked")
+
+
+def test_enqueued_insert_failure_is_counted(capsys):
+    buffer = FailingBuffer(flush_ms=0)
+    try:
+        buffer.enqueue(ChatMessage, user_id="alice", role="user", content="hello")
+        buffer.stop()
+        stats = buffer.get_stats()
+        assert stats["failed_rows"] == 1
+        assert stats["unobserved_failures"] == 1
+        assert "was not saved" in capsys.readouterr().out
+    finally:
+        buffer.stop()
+
+
+def test_stop_flushes_queued_rows():
+    committed = []
+
+    class RecordingBuffer(WriteBehindBuffer):
+        def _commit(self, items):
+            committed.extend(values["content"] for _, values in items)
+            return list(range(len(items)))
+
+    buffer = RecordingBuffer(flush_ms=50)
+    for index in range(5):
+        buffer.enqueue(ChatMessage, user_id="alice", role="user", content=str(index))
+    buffer.stop()
+    assert committed == ["0", "1", "2", "3", "4"]
+    assert buffer.get_stats()["unobserved_failures"] == 0
@@ -0,0 +1,232 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from execution import ServiceOverloadedError
+from metrics import MODEL_INFERENCE_SECONDS
+from streaming_stt import WHISPER_SAMPLE_RATE
+from voice_processing import VoiceProcessor, WHISPER_MODEL_SIZE, decode_audio
+
+# Worker processes each hold their own Whisper model; threads are split between them
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+TRANSCRIBE_THREADS_PER_WORKER = int(os.getenv(
+    "TRANSCRIBE_THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // max(1, TRANSCRIBE_WORKERS)))
+))
+# Queued plus running transcriptions accepted before callers get a 503
+TRANSCRIBE_MAX_JOBS = int(os.getenv("TRANSCRIBE_MAX_JOBS", "32"))
+# Uploads larger than this are transcribed as background jobs that clients poll
+TRANSCRIBE_SYNC_MAX_BYTES = int(os.getenv("TRANSCRIBE_SYNC_MAX_BYTES", str(2 * 1024 * 1024)))
+TRANSCRIBE_JOB_TTL_SECONDS = float(os.getenv("TRANSCRIBE_JOB_TTL_SECONDS", "3600"))
+
+_worker_processor: Optional[VoiceProcessor] = None
+
+
+def _init_worker(model_size: str, num_threads: int):
+    """Process initializer: pin the thread count, then load this worker's model"""
+    global _worker_processor
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["MKL_NUM_THREADS"] = str(num_threads)
+    _worker_processor = VoiceProcessor(model_size=model_size, num_threads=num_threads)
+    _worker_processor.load_whisper_model()
+    if not _worker_processor.is_loaded:
+        # Failing the initializer breaks the pool, instead of leaving a worker that fails its share of jobs
+        raise RuntimeError(f"Whisper '{model_size}' model failed to load")
+
+
+def _worker_pid(hold_seconds: float) -> int:
+    # Holding the worker briefly makes concurrent probes land on different workers
+    time.sleep(hold_seconds)
+    return os.getpid()
+
+
+def _transcribe_upload(audio_data: bytes, file_format: str) -> Dict[str, Any]:
+    audio = decode_audio(audio_data, file_format)
+    started = time.perf_counter()
+    text = _worker_processor.transcribe_array(audio)
+    if text is None:
+        raise RuntimeError("Failed to transcribe audio")
+    processing_seconds = time.perf_counter() - started
+    audio_seconds = len(audio) / WHISPER_SAMPLE_RATE
+    return {
+        "text": text,
+        "audio_seconds": round(audio_seconds, 2),
+        "processing_seconds": round(processing_seconds, 3),
+        "real_time_factor": round(processing_seconds / audio_seconds, 3) if audio_seconds else None,
+    }
+
+
+def _transcribe_window(audio: np.ndarray, initial_prompt: Optional[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    text = _worker_processor.transcribe_window(audio, initial_prompt)
+    return {
+        "text": text,
+        "audio_seconds": round(len(audio) / WHISPER_SAMPLE_RATE, 2),
+        "processing_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+class TranscriptionService:
+    """Queue transcriptions onto a pool of worker processes, each with its own Whisper model"""
+
+    def __init__(self, model_size: str = WHISPER_MODEL_SIZE, workers: int = TRANSCRIBE_WORKERS,
+                 threads_per_worker: int = TRANSCRIBE_THREADS_PER_WORKER, max_jobs: int = TRANSCRIBE_MAX_JOBS,
+                 job_ttl_seconds: float = TRANSCRIBE_JOB_TTL_SECONDS):
+        self.model_size = model_size
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.max_jobs = max(1, max_jobs)
+        self.job_ttl_seconds = job_ttl_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._in_flight = 0
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0, "audio_seconds": 0.0, "processing_seconds": 0.0}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_size, self.threads_per_worker)
+                )
+            return self._pool
+
+    def load(self):
+        """Start every worker and wait until each has its model loaded"""
+        pool = self._get_pool()
+        pids = set()
+        try:
+            # A task only runs once its worker's initializer has loaded the model, so every worker must answer
+            while len(pids) < self.workers:
+                probes = [pool.submit(_worker_pid, 0.2) for _ in range(self.workers)]
+                pids.update(probe.result() for probe in probes)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            print("Transcription workers failed to load the Whisper model")
+            raise
+        self._loaded = True
+
+    def _submit(self, func, *args) -> Future:
+        with self._lock:
+            if self._in_flight >= self.max_jobs:
+                self._stats["rejected"] += 1
+                raise ServiceOverloadedError("transcription", retry_after=5)
+            self._in_flight += 1
+        try:
+            future = self._get_pool().submit(func, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: Optional[Future]):
+        with self._lock:
+            self._in_flight -= 1
+            if future is None:
+                return
+            error = future.exception() if not future.cancelled() else None
+            if isinstance(error, BrokenProcessPool):
+                # A worker died (e.g. out of memory); the next submission starts a fresh pool
+                self._pool = None
+            if error is not None:
+                self._stats["failed"] += 1
+            elif not future.cancelled() and isinstance(future.result(), dict):
+                # Uploads and live-streaming windows both report their audio and processing time
+                result = future.result()
+                self._stats["completed"] += 1
+                self._stats["audio_seconds"] += result["audio_seconds"]
+                self._stats["processing_seconds"] += result["processing_seconds"]
+                # Workers are separate processes, so their inference time is recorded here
+                MODEL_INFERENCE_SECONDS.observe(result["processing_seconds"], "whisper")
+
+    async def transcribe(self, audio_data: bytes, file_format: str) -> Dict[str, Any]:
+        """Transcribe an upload and wait for the result"""
+        return await asyncio.wrap_future(self._submit(_transcribe_upload, audio_data, file_format))
+
+    async def transcribe_window(self, audio: np.ndarray, initial_prompt: Optional[str] = None) -> Optional[str]:
+        """Transcribe one live-streaming window"""
+        result = await asyncio.wrap_future(self._submit(_transcribe_window, audio, initial_prompt))
+        return result["text"]
+
+    def submit_job(self, audio_data: bytes, file_format: str, user_id: str) -> str:
+        """Queue an upload for background transcription and return the job id to poll"""
+        self._prune_jobs()
+        future = self._submit(_transcribe_upload, audio_data, file_format)
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"user_id": user_id, "future": future, "created_at": time.time()}
+        return job_id
+
+    def get_job(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Status and, once finished, result of a job; None if unknown or owned by another user"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+
+        future = job["future"]
+        status = {"job_id": job_id, "created_at": job["created_at"]}
+        if not future.done():
+            status["status"] = "running" if future.running() else "queued"
+        elif future.cancelled():
+            status["status"] = "failed"
+            status["error"] = "Transcription was cancelled"
+        elif future.exception() is not None:
+            status["status"] = "failed"
+            status["error"] = str(future.exception())
+        else:
+            status["status"] = "completed"
+            status.update(future.result())
+        return status
+
+    def _prune_jobs(self):
+        cutoff = time.time() - self.job_ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["future"].done() and job["created_at"] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["jobs_tracked"] = len(self._jobs)
+        stats["real_time_factor"] = (
+            round(stats["processing_seconds"] / stats["audio_seconds"], 3) if stats["audio_seconds"] else None
+        )
+        stats.update({
+            "model_size": self.model_size,
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "max_jobs": self.max_jobs,
+            "loaded": self._loaded,
+        })
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+# Global transcription service
+transcription_service = TranscriptionService()
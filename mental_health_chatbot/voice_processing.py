@@ -1,23 +1,103 @@
-import whisper
 from gtts import gTTS
 import tempfile
 import os
-from pydub import AudioSegment
 import io
 import base64
+import subprocess
+import threading
+import wave
 from typing import Optional
 
+import numpy as np
+
+from metrics import MODEL_INFERENCE_SECONDS, stage_timer
+from streaming_stt import WHISPER_SAMPLE_RATE, resample
+
+# Whisper checkpoint: tiny is fastest, small is most accurate of the sizes that run well on CPU
+WHISPER_MODEL_SIZES = ("tiny", "base", "small")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+
+# Greedy decoding without temperature fallback keeps per-window latency predictable when streaming
+STREAMING_DECODE_OPTIONS = {"temperature": 0.0, "condition_on_previous_text": False}
+# Containers whose index may sit at the end of the file; ffmpeg cannot read those from a pipe
+SEEKABLE_FORMATS = ("m4a", "mp4", "mov", "3gp")
+
+
+def _decode_wav(audio_data: bytes) -> Optional[np.ndarray]:
+    """Decode 16-bit PCM WAV with the standard library; None for anything else"""
+    try:
+        with wave.open(io.BytesIO(audio_data)) as wav:
+            if wav.getsampwidth() != 2 or wav.getcomptype() != "NONE":
+                return None
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return resample(samples, rate)
+
+
+def _ffmpeg_decode(source: str, audio_data: Optional[bytes] = None) -> np.ndarray:
+    """Decode any format ffmpeg understands to 16 kHz mono float32; source is 'pipe:0' or a path"""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-threads", "0",
+        "-i", source,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(WHISPER_SAMPLE_RATE),
+        "pipe:1"
+    ]
+    result = subprocess.run(cmd, input=audio_data, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def decode_audio(audio_data: bytes, file_format: str = "wav") -> np.ndarray:
+    """Decode uploaded audio bytes straight to the 16 kHz float32 array Whisper consumes"""
+    if file_format.lower() == "wav":
+        samples = _decode_wav(audio_data)
+        if samples is not None:
+            return samples
+    try:
+        return _ffmpeg_decode("pipe:0", audio_data)
+    except subprocess.CalledProcessError:
+        if file_format.lower() not in SEEKABLE_FORMATS:
+            raise
+    # Fallback for MP4-family files whose moov atom comes last: they need a seekable input
+    with tempfile.NamedTemporaryFile(suffix=f".{file_format}", delete=False) as tmp_file:
+        tmp_file.write(audio_data)
+    try:
+        return _ffmpeg_decode(tmp_file.name)
+    finally:
+        os.unlink(tmp_file.name)
+
 class VoiceProcessor:
-    def __init__(self):
+    def __init__(self, model_size: str = WHISPER_MODEL_SIZE, num_threads: Optional[int] = None):
+        if model_size not in WHISPER_MODEL_SIZES:
+            raise ValueError(f"Unknown Whisper model size '{model_size}', expected one of {list(WHISPER_MODEL_SIZES)}")
+        self.model_size = model_size
+        self.num_threads = num_threads
         self.whisper_model = None
-        self.load_whisper_model()
-    
+        # Whisper installs decoding hooks on the model, so transcriptions must not overlap
+        self._model_lock = threading.Lock()
+        # The model is loaded by the transcription workers so importing this module stays cheap
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.whisper_model is not None
+
     def load_whisper_model(self):
         """Load Whisper model for speech-to-text"""
+        if self.whisper_model is not None:
+            return
         try:
-            # Load smaller model for faster processing
-            self.whisper_model = whisper.load_model("base")
-            print("Whisper model loaded successfully")
+            import torch
+            import whisper
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            self.whisper_model = whisper.load_model(self.model_size)
+            print(f"Whisper '{self.model_size}' model loaded successfully")
         except Exception as e:
             print(f"Error loading Whisper model: {e}")
             self.whisper_model = None
@@ -28,52 +108,57 @@ class VoiceProcessor:
             return None
         
         try:
-            result = self.whisper_model.transcribe(audio_file_path)
+            with self._model_lock:
+                result = self.whisper_model.transcribe(audio_file_path)
             return result["text"].strip()
         except Exception as e:
             print(f"Error in speech-to-text: {e}")
             return None
     
-    def text_to_speech(self, text: str, language: str = "en") -> Optional[str]:
-        """Convert text to speech using gTTS and return base64 encoded audio"""
+    def transcribe_array(self, audio: np.ndarray, initial_prompt: Optional[str] = None,
+                         **decode_options) -> Optional[str]:
+        """Transcribe 16 kHz mono float32 samples already in memory"""
+        if not self.whisper_model:
+            return None
+
+        try:
+            with self._model_lock, MODEL_INFERENCE_SECONDS.time("whisper"):
+                result = self.whisper_model.transcribe(
+                    audio,
+                    initial_prompt=initial_prompt,
+                    fp16=self.whisper_model.device.type == "cuda",
+                    **decode_options
+                )
+            return result["text"].strip()
+        except Exception as e:
+            print(f"Error in speech-to-text: {e}")
+            return None
+
+    def transcribe_window(self, audio: np.ndarray, initial_prompt: Optional[str] = None) -> Optional[str]:
+        """Transcribe one live-streaming window"""
+        return self.transcribe_array(audio, initial_prompt, **STREAMING_DECODE_OPTIONS)
+
+    def text_to_speech_bytes(self, text: str, language: str = "en") -> Optional[bytes]:
+        """Convert text to speech using gTTS and return the MP3 bytes"""
         try:
-            # Create gTTS object
-            tts = gTTS(text=text, lang=language, slow=False)
-            
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tts.save(tmp_file.name)
-                
-                # Read the file and encode as base64
-                with open(tmp_file.name, "rb") as audio_file:
-                    audio_data = audio_file.read()
-                    audio_base64 = base64.b64encode(audio_data).decode()
-                
-                # Clean up temporary file
-                os.unlink(tmp_file.name)
-                
-                return audio_base64
-                
+            with stage_timer("tts"):
+                tts = gTTS(text=text, lang=language, slow=False)
+                buffer = io.BytesIO()
+                tts.write_to_fp(buffer)
+            return buffer.getvalue()
         except Exception as e:
             print(f"Error in text-to-speech: {e}")
             return None
+
+    def text_to_speech(self, text: str, language: str = "en") -> Optional[str]:
+        """Convert text to speech using gTTS and return base64 encoded audio"""
+        audio_data = self.text_to_speech_bytes(text, language)
+        return base64.b64encode(audio_data).decode() if audio_data else None
     
     def process_audio_upload(self, audio_data: bytes, file_format: str = "wav") -> Optional[str]:
         """Process uploaded audio data and convert to text"""
         try:
-            # Save uploaded audio to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_format}") as tmp_file:
-                tmp_file.write(audio_data)
-                tmp_file.flush()
-                
-                # Convert to text
-                transcribed_text = self.speech_to_text(tmp_file.name)
-                
-                # Clean up
-                os.unlink(tmp_file.name)
-                
-                return transcribed_text
-                
+            return self.transcribe_array(decode_audio(audio_data, file_format))
         except Exception as e:
             print(f"Error processing audio upload: {e}")
             return None
@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class WarmupManager:
+    """Load heavy components in a background thread and record how long each took"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._components: Dict[str, Dict[str, Any]] = {}
+        self._order: List[str] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.ready_at: Optional[float] = None
+
+    def register(self, name: str, loader: Callable[[], Any], required: bool = True,
+                 is_loaded: Optional[Callable[[], bool]] = None, fallback: Optional[str] = None):
+        """Add a component; required components gate readiness
+
+        fallback names what keeps serving if loading fails; such a component ends up "degraded"
+        instead of "failed" and does not hold back readiness.
+        """
+        with self._lock:
+            self._components[name] = {
+                "loader": loader,
+                "required": required,
+                "is_loaded": is_loaded,
+                "fallback": fallback,
+                "status": "pending",
+                "seconds": None,
+                "error": None,
+            }
+            self._order.append(name)
+
+    def start(self):
+        """Begin loading registered components without blocking the caller"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for name in list(self._order):
+            component = self._components[name]
+            component["status"] = "loading"
+            started = time.perf_counter()
+            try:
+                component["loader"]()
+                loaded = component["is_loaded"]() if component["is_loaded"] else True
+                if not loaded:
+                    component["error"] = "loader finished without loading the component"
+            except Exception as e:
+                loaded = False
+                component["error"] = str(e)
+            if loaded:
+                component["status"] = "ready"
+            else:
+                component["status"] = "degraded" if component["fallback"] else "failed"
+            component["seconds"] = round(time.perf_counter() - started, 3)
+            print(f"Warm-up: {name} {component['status']} in {component['seconds']}s")
+
+        self.ready_at = time.monotonic()
+        print(f"Warm-up finished {self.ready_at - self.started_at:.2f}s after process start")
+
+    def is_finished(self) -> bool:
+        return self.ready_at is not None
+
+    def is_ready(self) -> bool:
+        """True once every required component has loaded or fallen back to a degraded mode"""
+        return all(
+            component["status"] in ("ready", "degraded")
+            for component in self._components.values()
+            if component["required"]
+        )
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "degraded": [name for name in self._order if self._components[name]["status"] == "degraded"],
+            "finished": self.is_finished(),
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "seconds_to_ready": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            "components": {
+                name: {
+                    "status": component["status"],
+                    "required": component["required"],
+                    "fallback": component["fallback"],
+                    "seconds": component["seconds"],
+                    "error": component["error"],
+                }
+                for name, component in ((name, self._components[name]) for name in self._order)
+            },
+        }
+
+# Global warm-up manager instance
+warmup_manager = WarmupManager()
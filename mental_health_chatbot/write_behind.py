@@ -0,0 +1,149 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple, Type
+
+from batching import MicroBatcher
+from database import SessionLocal
+from metrics import COUNT_BUCKETS, metrics, stage_timer
+
+# Inserts are committed together once this many rows are queued or the oldest has waited this long
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_SHUTDOWN_TIMEOUT = float(os.getenv("WRITE_BEHIND_SHUTDOWN_TIMEOUT", "30"))
+
+FLUSH_ROWS = metrics.histogram(
+    "chatbot_write_behind_flush_rows", "Rows committed in one write-behind transaction", buckets=COUNT_BUCKETS
+)
+
+
+class WriteBehindBuffer:
+    """Queue ORM inserts and commit them in bulk transactions on a background thread"""
+
+    def __init__(self, session_factory=SessionLocal, max_batch_size: int = WRITE_BEHIND_MAX_BATCH,
+                 flush_ms: float = WRITE_BEHIND_FLUSH_MS, max_pending: int = WRITE_BEHIND_MAX_PENDING):
+        self.session_factory = session_factory
+        self._batcher = MicroBatcher(
+            self._write_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=flush_ms,
+            max_pending=max_pending,
+            name="write-behind"
+        )
+        self._stats_lock = threading.Lock()
+        # Rows submitted but not yet committed, so reads of recent data can include them
+        self._unflushed: Dict[Future, Tuple[Type, Dict[str, Any]]] = {}
+        self._unflushed_lock = threading.Lock()
+        self._rows_written = 0
+        self._failed_rows = 0
+        self._bulk_failures = 0
+        self._unobserved_failures = 0
+
+    def submit(self, model: Type, **values) -> Future:
+        """Queue one insert; the future resolves to the new row's primary key once committed"""
+        future = self._batcher.submit((model, values))
+        with self._unflushed_lock:
+            self._unflushed[future] = (model, values)
+        future.add_done_callback(self._forget_unflushed)
+        return future
+
+    def enqueue(self, model: Type, **values):
+        """Queue an insert nobody waits for; a failure is logged and counted instead of vanishing"""
+        self.submit(model, **values).add_done_callback(self._report_failure)
+
+    def _report_failure(self, future: Future):
+        error = future.exception() if not future.cancelled() else None
+        if future.cancelled() or error is not None:
+            print(f"Write-behind insert was not saved: {error or 'cancelled'}")
+            with self._stats_lock:
+                self._unobserved_failures += 1
+
+    def _forget_unflushed(self, future: Future):
+        with self._unflushed_lock:
+            self._unflushed.pop(future, None)
+
+    def unflushed_rows(self, model: Type, **filters) -> List[Dict[str, Any]]:
+        """Values of queued or committing rows of a model that match the given column values"""
+        with self._unflushed_lock:
+            entries = list(self._unflushed.values())
+        return [dict(values) for row_model, values in entries
+                if row_model is model and all(values.get(column) == value for column, value in filters.items())]
+
+    async def write(self, model: Type, **values) -> Any:
+        """Queue one insert and wait for its group commit, for callers that need the id"""
+        return await asyncio.wrap_future(self.submit(model, **values))
+
+    def _write_batch(self, items: List[Tuple[Type, Dict[str, Any]]]) -> List[Any]:
+        try:
+            ids = self._commit(items)
+        except Exception as e:
+            # One bad row must not lose the rest of the batch
+            print(f"Write-behind bulk commit of {len(items)} rows failed, retrying row by row: {e}")
+            with self._stats_lock:
+                self._bulk_failures += 1
+            ids = []
+            for item in items:
+                try:
+                    ids.extend(self._commit([item]))
+                except Exception as row_error:
+                    print(f"Write-behind dropped a {item[0].__name__} row: {row_error}")
+                    with self._stats_lock:
+                        self._failed_rows += 1
+                    ids.append(row_error)
+
+        with self._stats_lock:
+            self._rows_written += sum(1 for row_id in ids if not isinstance(row_id, Exception))
+        return ids
+
+    def _commit(self, items: List[Tuple[Type, Dict[str, Any]]]) -> List[Any]:
+        # Rows are built here rather than by callers so a retry always starts from fresh objects
+        rows = [model(**values) for model, values in items]
+        db = self.session_factory()
+        try:
+            with stage_timer("db_commit"):
+                db.add_all(rows)
+                db.flush()
+                ids = [row.id for row in rows]
+                db.commit()
+            FLUSH_ROWS.observe(len(rows))
+            return ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def pending(self) -> int:
+        return self._batcher.pending()
+
+    def stop(self, timeout: float = WRITE_BEHIND_SHUTDOWN_TIMEOUT):
+        """Flush everything still queued and stop the writer thread"""
+        pending = self.pending()
+        if pending:
+            print(f"Write-behind flushing {pending} queued rows")
+        self._batcher.stop(timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        batcher_stats = self._batcher.get_stats()
+        with self._stats_lock:
+            return {
+                "queue_depth": batcher_stats["pending"],
+                "rejected": batcher_stats["rejected"],
+                "flushes": batcher_stats["batches"],
+                "rows_written": self._rows_written,
+                "failed_rows": self._failed_rows,
+                "bulk_failures": self._bulk_failures,
+                "unobserved_failures": self._unobserved_failures,
+                "avg_rows_per_flush": batcher_stats["avg_batch_size"],
+                "avg_queue_wait_ms": batcher_stats["avg_queue_wait_ms"],
+                "max_queue_wait_ms": batcher_stats["max_queue_wait_ms"],
+                "avg_flush_ms": batcher_stats["avg_batch_process_ms"],
+                "max_flush_ms": batcher_stats["max_batch_process_ms"],
+                "max_batch_size": batcher_stats["max_batch_size"],
+                "flush_interval_ms": batcher_stats["max_wait_ms"],
+            }
+
+# Global write-behind buffer
+write_behind = WriteBehindBuffer()